@@ -15,6 +15,8 @@ from abc import ABCMeta
 __all__ = []
 _modules = {'IPRoute': 'pyroute2.iproute',
             'RawIPRoute': 'pyroute2.iproute',
+            'IPBatch': 'pyroute2.iproute',
+            'AsyncIPRoute': 'pyroute2.aio',
             'IPSet': 'pyroute2.ipset',
             'IPDB': 'pyroute2.ipdb',
             'IW': 'pyroute2.iwutil',
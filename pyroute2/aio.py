@@ -0,0 +1,444 @@
+'''
+asyncio support
+===============
+
+`AsyncIPRoute` is an asyncio-native variant of `IPRoute`. It
+registers the netlink socket in the event loop with
+`loop.add_reader()`, so no threads are involved, and one process
+can run many concurrent netlink requests. The `IPRouteMixin`
+request methods are available as coroutines::
+
+    import asyncio
+    from pyroute2 import AsyncIPRoute
+
+    async def main():
+        ipr = AsyncIPRoute()
+        links = await ipr.get_links()
+        idx = (await ipr.link_lookup(ifname='eth0'))[0]
+        await ipr.addr('add', index=idx, address='10.0.0.2', mask=24)
+        ipr.close()
+
+    asyncio.get_event_loop().run_until_complete(main())
+
+Responses are matched to awaiting coroutines by the sequence
+number. Multicast messages, being received after `bind()`, are
+available as an async iterator::
+
+    async def monitor():
+        ipr = AsyncIPRoute()
+        ipr.bind()
+        async for msg in ipr:
+            print(msg['event'])
+
+The synchronous `IPRouteMixin` code is reused: a method is run
+again for every request it issues, with the responses collected
+so far, see `replay()`. So only the methods, that do nothing but
+netlink requests, are wrapped this way, see `replay_methods`;
+the methods, that issue a request per item, like `get_links()`
+with indices or `flush_routes()`, are reimplemented natively.
+`set_link_cache()` is a coroutine too, but it runs on the socket
+itself, since it changes the socket state::
+
+    await ipr.set_link_cache()
+    await ipr.link_lookup(ifname='lo')
+    assert ipr.link_cache['lo'] == 1
+
+Not supported:
+
+* `get_routes_iter()` and other `*_iter()` generators -- use
+  the list versions
+* any other `IPRouteMixin` method, that is not a coroutine in
+  `AsyncIPRoute`: methods, that change the socket state, must
+  not be replayed
+
+Dump requests on one netlink socket are serialized, since the
+kernel doesn't run several dumps on one socket at once. Other
+requests are sent as soon, as they are issued.
+
+The module requires Python >= 3.5.
+
+classes
+-------
+'''
+import errno
+import asyncio
+import logging
+from socket import AF_UNSPEC
+from socket import MSG_DONTWAIT
+
+from pyroute2.iproute import IPRouteMixin
+from pyroute2.iproute import DEFAULT_TABLE
+from pyroute2.netlink import nlmsg
+from pyroute2.netlink import NetlinkError
+from pyroute2.netlink import NLM_F_ACK
+from pyroute2.netlink import NLM_F_DUMP
+from pyroute2.netlink import NLM_F_REQUEST
+from pyroute2.netlink import NLM_F_CREATE
+from pyroute2.netlink import NLM_F_EXCL
+from pyroute2.netlink.nlsocket import NetlinkFuture
+from pyroute2.netlink.nlsocket import NetlinkSocket
+from pyroute2.netlink.rtnl import RTM_DELADDR
+from pyroute2.netlink.rtnl import RTM_DELROUTE
+from pyroute2.netlink.rtnl import RTM_DELRULE
+from pyroute2.netlink.rtnl.iprsocket import IPRSocketMixin
+
+
+class AsyncNetlinkFuture(NetlinkFuture):
+    '''
+    `NetlinkFuture`, that also completes an asyncio future,
+    so a coroutine can await the response.
+    '''
+
+    def __init__(self, loop, terminate=None):
+        super(AsyncNetlinkFuture, self).__init__(terminate)
+        self.aio = loop.create_future()
+
+    def complete(self):
+        super(AsyncNetlinkFuture, self).complete()
+        if not self.aio.done():
+            if self.error is not None:
+                self.aio.set_exception(self.error)
+            else:
+                self.aio.set_result(self.msgs)
+
+
+class AsyncNetlinkSocket(NetlinkSocket):
+    '''
+    Netlink socket for asyncio. The socket is read from the
+    event loop, and `nlm_request()` is a coroutine. The blocking
+    `get()` should not be used with this socket.
+
+    Not more than `max_requests` requests are sent at once
+    without a response, so responses do not overflow the socket
+    receive buffer.
+    '''
+
+    max_requests = 64
+
+    def __init__(self, *argv, **kwarg):
+        loop = kwarg.pop('loop', None) or getattr(self, 'loop', None)
+        super(AsyncNetlinkSocket, self).__init__(*argv, **kwarg)
+        self.loop = loop or asyncio.get_event_loop()
+        self.demux = True
+        self.events = asyncio.Queue(loop=self.loop)
+        self.dump_lock = asyncio.Lock(loop=self.loop)
+        self.window = asyncio.Semaphore(self.max_requests, loop=self.loop)
+        self.reader = None
+
+    def add_reader(self):
+        if self.reader is None:
+            self.reader = self.fileno()
+            self.loop.add_reader(self.reader, self.async_recv)
+
+    def remove_reader(self):
+        if self.reader is not None:
+            self.loop.remove_reader(self.reader)
+            self.reader = None
+
+    def bind(self, groups=0, pid=None, **kwarg):
+        # the socket can be recreated by bind(), see post_init()
+        self.remove_reader()
+        super(AsyncNetlinkSocket, self).bind(groups, pid)
+        self.add_reader()
+
+    def close(self):
+        self.remove_reader()
+        with self.backlog_lock:
+            for future in tuple(self.futures.values()):
+                future.fail(IOError('socket closed'))
+        super(AsyncNetlinkSocket, self).close()
+
+    def async_recv(self):
+        '''
+        The event loop reader: receive and parse messages,
+        complete futures and enqueue multicast messages.
+        '''
+        try:
+            data = self.recv(1024 * 1024, MSG_DONTWAIT)
+        except BlockingIOError:
+            return
+        except Exception as e:
+            # fail all the pending requests
+            with self.backlog_lock:
+                for future in tuple(self.futures.values()):
+                    future.fail(e)
+            return
+        msgs, dropped = self.parse(data)
+        with self.backlog_lock:
+            self.deliver(msgs, dropped)
+            events = self.backlog[0]
+            self.backlog[0] = []
+        for msg in events:
+            self.events.put_nowait(msg)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.events.get()
+
+    def nlm_request(self, msg, msg_type,
+                    msg_flags=NLM_F_REQUEST | NLM_F_DUMP,
+                    terminate=None,
+                    exception_catch=Exception,
+                    exception_handler=None,
+                    projection=None):
+        '''
+        Send the request and return a coroutine, that waits
+        for the response. The arguments are the same as for
+        `NetlinkMixin.nlm_request()`, except of the `projection`,
+        that is ignored.
+        '''
+        return self.request(msg, msg_type, msg_flags, terminate,
+                            exception_catch, exception_handler)
+
+    async def request(self, msg, msg_type,
+                      msg_flags=NLM_F_REQUEST | NLM_F_DUMP,
+                      terminate=None,
+                      exception_catch=Exception,
+                      exception_handler=None):
+        self.add_reader()
+        while True:
+            try:
+                if msg_flags & NLM_F_DUMP == NLM_F_DUMP:
+                    async with self.dump_lock:
+                        return await self.do_request(msg, msg_type,
+                                                     msg_flags, terminate)
+                else:
+                    async with self.window:
+                        return await self.do_request(msg, msg_type,
+                                                     msg_flags, terminate)
+            except exception_catch as e:
+                if exception_handler and not exception_handler(e):
+                    continue
+                raise
+
+    async def nlm_request_batch(self, msgs,
+                                msg_flags=NLM_F_REQUEST | NLM_F_ACK,
+                                window=None):
+        '''
+        Coroutine version of `NetlinkMixin.nlm_request_batch()`.
+        The `window` is ignored, requests share `max_requests`.
+        '''
+        async def call(request):
+            msg, msg_type = request[:2]
+            flags = request[2] if len(request) > 2 else msg_flags
+            if not isinstance(msg, nlmsg):
+                msg = self.marshal.msg_map[msg_type](msg)
+            try:
+                return await self.request(msg, msg_type, flags)
+            except NetlinkError as e:
+                return e
+
+        return await asyncio.gather(*[call(x) for x in msgs],
+                                    loop=self.loop)
+
+    async def do_request(self, msg, msg_type, msg_flags, terminate):
+        msg_seq = self.addr_pool.alloc()
+        future = AsyncNetlinkFuture(self.loop, terminate)
+        self.futures[msg_seq] = future
+        try:
+            msg.reset()
+            self.put(msg, msg_type, msg_flags, msg_seq=msg_seq)
+            try:
+                return await asyncio.wait_for(asyncio.shield(future.aio),
+                                              self.get_timeout,
+                                              loop=self.loop)
+            except asyncio.TimeoutError:
+                if self.get_timeout_exception:
+                    raise self.get_timeout_exception()
+                with future.lock:
+                    return list(future.msgs)
+        finally:
+            with self.backlog_lock:
+                self.futures.pop(msg_seq, None)
+            # see NetlinkMixin.nlm_request() on the ban
+            self.addr_pool.free(msg_seq, ban=0xff)
+
+
+class AsyncIPRSocket(IPRSocketMixin, AsyncNetlinkSocket):
+
+    def __init__(self, fileno=None, loop=None):
+        self.loop = loop
+        super(AsyncIPRSocket, self).__init__(fileno)
+
+
+class Replay(IPRouteMixin):
+    '''
+    Synchronous proxy to run `IPRouteMixin` methods for
+    `AsyncIPRoute`. All the attributes, except `nlm_request()`,
+    are taken from the socket, and attribute writes go to the
+    socket as well.
+
+    `nlm_request()` returns the collected responses in the
+    order of calls. When the responses are exhausted, it raises
+    `Deferred` with the request arguments, so the caller can
+    await the response and run the method again.
+    '''
+
+    def __init__(self, nl, responses):
+        self.__dict__['nl'] = nl
+        self.__dict__['responses'] = list(responses)
+
+    def __getattr__(self, key):
+        return getattr(self.nl, key)
+
+    def __setattr__(self, key, value):
+        # the proxy is thrown away after the run
+        setattr(self.nl, key, value)
+
+    @property
+    def link_cache(self):
+        # `IPRouteMixin.link_cache` is a class attribute, so
+        # `__getattr__()` would not get here
+        return self.nl.link_cache
+
+    def nlm_request(self, *argv, **kwarg):
+        if self.responses:
+            (error, ret) = self.responses.pop(0)
+            if error is not None:
+                raise error
+            return ret
+        raise Deferred(argv, kwarg)
+
+
+class Deferred(Exception):
+
+    def __init__(self, argv, kwarg):
+        super(Deferred, self).__init__()
+        self.argv = argv
+        self.kwarg = kwarg
+
+
+async def replay(nl, method, *argv, **kwarg):
+    # IPRouteMixin methods are synchronous, so run the
+    # method once for every netlink request it issues,
+    # replaying the collected responses
+    responses = []
+    while True:
+        try:
+            return method(Replay(nl, responses), *argv, **kwarg)
+        except Deferred as e:
+            request = e
+        try:
+            ret = await AsyncNetlinkSocket.request(nl,
+                                                   *request.argv,
+                                                   **request.kwarg)
+        except Exception as e:
+            responses.append((e, None))
+        else:
+            responses.append((None, ret))
+
+
+def replay_method(name):
+    method = getattr(IPRouteMixin, name)
+
+    async def call(self, *argv, **kwarg):
+        return await replay(self, method, *argv, **kwarg)
+
+    call.__name__ = name
+    call.__doc__ = method.__doc__
+    return call
+
+
+def native_method(call):
+    # take the docs from the synchronous version
+    call.__doc__ = getattr(IPRouteMixin, call.__name__).__doc__
+    return call
+
+
+class AsyncIPRoute(AsyncIPRSocket):
+    '''
+    asyncio-native `IPRoute`: the `IPRouteMixin` methods, listed
+    in `replay_methods`, are coroutines here. Request-only
+    instance needs no `bind()`; call `bind()` to receive
+    multicast messages.
+    '''
+    link_cache = None
+    _link_cache_drop = IPRouteMixin._link_cache_drop
+    _link_cache_update = IPRouteMixin._link_cache_update
+
+    @native_method
+    async def set_link_cache(self, value=True):
+        # not a request, so run it on the socket itself
+        return IPRouteMixin.set_link_cache(self, value)
+
+    @native_method
+    async def get_links(self, *argv, **kwarg):
+        result = []
+        for index in argv or ['all']:
+            result.extend(await replay(self, IPRouteMixin.get_links,
+                                       index, **kwarg))
+        return result
+
+    @native_method
+    async def get_stats(self, *argv, **kwarg):
+        result = []
+        for index in argv or ['all']:
+            result.extend(await replay(self, IPRouteMixin.get_stats,
+                                       index, **kwarg))
+        return result
+
+    @native_method
+    async def get_neighbors(self, family=AF_UNSPEC):
+        logging.warning('The `get_neighbors()` call is deprecated')
+        logging.warning('Use `get_neighbours() instead')
+        return await self.get_neighbours(family)
+
+    @native_method
+    async def flush_routes(self, *argv, **kwarg):
+        flags = NLM_F_ACK | NLM_F_CREATE | NLM_F_EXCL | NLM_F_REQUEST
+        ret = []
+        kwarg['table'] = kwarg.get('table', DEFAULT_TABLE)
+        for route in await self.get_routes(*argv, **kwarg):
+            ret.append(await self.request(route, RTM_DELROUTE, flags))
+        return ret
+
+    @native_method
+    async def flush_addr(self, *argv, **kwarg):
+        flags = NLM_F_ACK | NLM_F_CREATE | NLM_F_EXCL | NLM_F_REQUEST
+        ret = []
+        for addr in await self.get_addr(*argv, **kwarg):
+            try:
+                ret.append(await self.request(addr, RTM_DELADDR, flags))
+            except NetlinkError as e:
+                if e.code != errno.EADDRNOTAVAIL:
+                    raise
+        return ret
+
+    @native_method
+    async def flush_rules(self, *argv, **kwarg):
+        flags = NLM_F_REQUEST | NLM_F_ACK | NLM_F_CREATE | NLM_F_EXCL
+        ret = []
+        for rule in await self.get_rules(*argv, **kwarg):
+            ret.append(await self.request(rule, RTM_DELRULE, flags))
+        return ret
+
+
+# IPRouteMixin methods, that only issue netlink requests, and
+# issue not more than a couple of them: every deferred request
+# runs the method from the beginning, see `replay()`
+replay_methods = ('get_qdiscs',
+                  'get_filters',
+                  'get_classes',
+                  'get_neighbours',
+                  'get_ntables',
+                  'get_addr',
+                  'get_rules',
+                  'get_routes',
+                  'get_default_routes',
+                  'link_create',
+                  'link_up',
+                  'link_down',
+                  'link_rename',
+                  'link_remove',
+                  'link_lookup',
+                  'neigh',
+                  'link',
+                  'addr',
+                  'tc',
+                  'route',
+                  'rule')
+
+for name in replay_methods:
+    setattr(AsyncIPRoute, name, replay_method(name))
@@ -12,6 +12,7 @@ import types
 import struct
 import socket
 import threading
+import collections
 
 try:
     basestring = basestring
@@ -75,12 +76,18 @@ rate_suffixes = {'bit': 1,
 class View(object):
     '''
     A read-only view of a dictionary object.
+
+    With a constraint, the view filters the source dictionary
+    on every access, that costs O(N). Without a constraint it
+    is just a read-only facade for the source.
     '''
-    def __init__(self, src=None, constraint=lambda k, v: True):
+    def __init__(self, src=None, constraint=None):
         self.src = src if src is not None else {}
         self.constraint = constraint
 
     def __getitem__(self, key):
+        if self.constraint is None:
+            return self.src[key]
         if key in self.keys():
             return self.src[key]
         raise KeyError()
@@ -98,6 +105,8 @@ class View(object):
             return default
 
     def _filter(self):
+        if self.constraint is None:
+            return list(self.src.items())
         ret = []
         for (key, value) in tuple(self.src.items()):
             try:
@@ -108,14 +117,28 @@ class View(object):
         return ret
 
     def keys(self):
+        if self.constraint is None:
+            return list(self.src.keys())
         return [x[0] for x in self._filter()]
 
     def values(self):
+        if self.constraint is None:
+            return list(self.src.values())
         return [x[1] for x in self._filter()]
 
     def items(self):
         return self._filter()
 
+    def __contains__(self, key):
+        if self.constraint is None:
+            return key in self.src
+        return key in self.keys()
+
+    def __len__(self):
+        if self.constraint is None:
+            return len(self.src)
+        return len(self._filter())
+
     def __iter__(self):
         for key in self.keys():
             yield key
@@ -359,118 +382,104 @@ def load_dump(f, meta=None):
 class AddrPool(object):
     '''
     Address pool
+
+    Fresh addresses are allocated in order from `minaddr` (or
+    from `maxaddr` with `reverse=True`), freed addresses are
+    reused in the FIFO order, when the fresh ones are over. So
+    a freed address is reused as late as possible, and both
+    `alloc()` and `free()` are O(1).
+
+    `free(addr, ban=N)` keeps the address allocated for the
+    next N allocations. With `release=N` every allocated
+    address is freed with `ban=N` automatically.
     '''
-    cell = 0xffffffffffffffff
+    cell_size = 64  # in bits, see locate()
 
     def __init__(self,
                  minaddr=0xf,
                  maxaddr=0xffffff,
                  reverse=False,
                  release=False):
-        self.cell_size = 0  # in bits
-        mx = self.cell
         self.reverse = reverse
         self.release = release
         self.allocated = 0
         if self.release and not isinstance(self.release, int):
             raise TypeError()
-        self.ban = []
-        while mx:
-            mx >>= 8
-            self.cell_size += 1
-        self.cell_size *= 8
-        # calculate, how many ints we need to bitmap all addresses
-        self.cells = int((maxaddr - minaddr) / self.cell_size + 1)
-        # initial array
-        self.addr_map = [self.cell]
         self.minaddr = minaddr
         self.maxaddr = maxaddr
+        self.size = maxaddr - minaddr + 1
+        self.fresh = 0                      # fresh addresses offset
+        self.used = set()                   # allocated addresses
+        self.free_list = collections.deque()
+        self.ban = {}                       # {ban: deque((tick, addr))}
+        self.ticks = 0                      # alloc() counter
         self.lock = threading.RLock()
 
     def alloc(self):
         with self.lock:
-            # gc self.ban:
-            for item in tuple(self.ban):
-                if item['counter'] == 0:
-                    self.free(item['addr'])
-                    self.ban.remove(item)
-                else:
-                    item['counter'] -= 1
-
-            # iterate through addr_map
-            base = 0
-            for cell in self.addr_map:
-                if cell:
-                    # not allocated addr
-                    bit = 0
-                    while True:
-                        if (1 << bit) & self.addr_map[base]:
-                            self.addr_map[base] ^= 1 << bit
-                            break
-                        bit += 1
-                    ret = (base * self.cell_size + bit)
-
+            # release banned addresses
+            self.ticks += 1
+            for queue in tuple(self.ban.values()):
+                while queue and queue[0][0] <= self.ticks:
+                    self.unban(queue.popleft()[1])
+
+            while True:
+                if self.fresh < self.size:
                     if self.reverse:
-                        ret = self.maxaddr - ret
+                        ret = self.maxaddr - self.fresh
                     else:
-                        ret = ret + self.minaddr
+                        ret = self.minaddr + self.fresh
+                    self.fresh += 1
+                elif self.free_list:
+                    ret = self.free_list.popleft()
+                else:
+                    raise KeyError('no free address available')
+                # skip addresses allocated with setaddr()
+                if ret not in self.used:
+                    break
+
+            self.used.add(ret)
+            self.allocated += 1
+            if self.release:
+                self.free(ret, ban=self.release)
+            return ret
 
-                    if self.minaddr <= ret <= self.maxaddr:
-                        if self.release:
-                            self.free(ret, ban=self.release)
-                        self.allocated += 1
-                        return ret
-                    else:
-                        self.free(ret)
-                        raise KeyError('no free address available')
-
-                base += 1
-            # no free address available
-            if len(self.addr_map) < self.cells:
-                # create new cell to allocate address from
-                self.addr_map.append(self.cell)
-                return self.alloc()
-            else:
-                raise KeyError('no free address available')
+    def unban(self, addr):
+        if addr in self.used:
+            self.used.remove(addr)
+            self.allocated -= 1
+            self.free_list.append(addr)
 
     def locate(self, addr):
         if self.reverse:
-            addr = self.maxaddr - addr
+            offset = self.maxaddr - addr
         else:
-            addr -= self.minaddr
-        base = addr // self.cell_size
-        bit = addr % self.cell_size
-        try:
-            is_allocated = not self.addr_map[base] & (1 << bit)
-        except IndexError:
-            is_allocated = False
-        return (base, bit, is_allocated)
+            offset = addr - self.minaddr
+        base = offset // self.cell_size
+        bit = offset % self.cell_size
+        return (base, bit, addr in self.used)
 
     def setaddr(self, addr, value):
         if value not in ('free', 'allocated'):
             raise TypeError()
         with self.lock:
-            base, bit, is_allocated = self.locate(addr)
-            if value == 'free' and is_allocated:
-                self.allocated -= 1
-                self.addr_map[base] |= 1 << bit
-            elif value == 'allocated' and not is_allocated:
+            if value == 'free':
+                self.unban(addr)
+            elif addr not in self.used:
+                self.used.add(addr)
                 self.allocated += 1
-                self.addr_map[base] &= ~(1 << bit)
 
     def free(self, addr, ban=0):
         with self.lock:
             if ban != 0:
-                self.ban.append({'addr': addr,
-                                 'counter': ban})
+                # the address stays allocated for `ban` allocations
+                if ban not in self.ban:
+                    self.ban[ban] = collections.deque()
+                self.ban[ban].append((self.ticks + ban + 1, addr))
+            elif addr not in self.used:
+                raise KeyError('address is not allocated')
             else:
-                base, bit, is_allocated = self.locate(addr)
-                if len(self.addr_map) <= base:
-                    raise KeyError('address is not allocated')
-                if self.addr_map[base] & (1 << bit):
-                    raise KeyError('address is not allocated')
-                self.allocated -= 1
-                self.addr_map[base] ^= 1 << bit
+                self.unban(addr)
 
 
 def _fnv1_python2(data):
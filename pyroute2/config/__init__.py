@@ -8,6 +8,10 @@ MpPipe = multiprocessing.Pipe
 MpQueue = multiprocessing.Queue
 MpProcess = multiprocessing.Process
 ipdb_nl_async = True
+# IPDB post-callbacks thread pool, see IPDB.register_callback()
+ipdb_cb_workers = 4
+ipdb_cb_queue = 8192
+ipdb_cb_overflow = 'drop'
 
 commit_barrier = 0
 
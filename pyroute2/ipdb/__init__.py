@@ -313,6 +313,31 @@ It is possible to use dicts as specs::
 The dict is just the same as a route representation in the
 records list.
 
+Lookups by `dst` use an index, so they don't depend on the table
+size. To find the route to an address, like the kernel does, use
+the longest prefix match::
+
+    # the most specific route to the address in the main table
+    ip.routes.lookup('172.16.1.5')
+
+    # the same in the table 100
+    ip.routes.lookup('fc00::5', table=100)
+
+Among routes to the same prefix the one with the lowest priority
+is returned. Unlike `ip.routes[...]`, `lookup()` never asks the
+kernel, it uses only IPDB records.
+
+Routes can be also selected by other fields. Fields `oif`,
+`gateway`, `proto` and `priority` are indexed, so such queries
+don't scan the tables::
+
+    # all the routes via the interface, in all the tables;
+    # multipath routes match by any of their nexthops
+    ip.routes.filter(oif=ip.interfaces.eth0.index)
+
+    # routes installed by BIRD into the table 100
+    ip.routes.filter(proto='RTPROT_BIRD', table=100)
+
 **Route metrics**
 
 A special object is dedicated to route metrics, one can access it
@@ -370,17 +395,38 @@ for details.
 performance issues
 ------------------
 
-In the case of bursts of Netlink broadcast messages, all
-the activity of the pyroute2-based code in the async mode
-becomes suppressed to leave more CPU resources to the
-packet reader thread. So please be ready to cope with
-delays in the case of Netlink broadcast storms. It means
-also, that IPDB state will be synchronized with OS also
-after some delay.
+In the case of bursts of Netlink broadcast messages, IPDB
+state is synchronized with OS after some delay: the messages
+are buffered and processed one by one. If the buffers overflow,
+IPDB resyncs the state with `IPDB.resync()`, see also the
+`pyroute2.netlink.nlsocket` documentation.
+
+IPDB doesn't keep interface statistics, so it asks the kernel
+not to send per-family statistics in link dumps (`skip_stats`
+option). On hosts with thousands of interfaces it makes the
+startup and resync noticeably faster.
+
+`IPDB.by_name` and `IPDB.by_index` are read-only views of maps,
+that are updated along with `IPDB.interfaces`, so lookups there
+cost O(1), and iterations don't filter the whole interfaces dict.
+
+Post-callbacks are run by a thread pool, not by a thread per
+message, so event storms don't spawn threads. The pool size and
+the queue limit are set with `cb_workers`, `cb_queue` and
+`cb_overflow` IPDB parameters, or globally in `pyroute2.config`::
+
+    # up to 8 threads, up to 100000 pending events; when the queue
+    # is full, wait up to 1 second for the room, then drop the event
+    ip = IPDB(cb_workers=8, cb_queue=100000, cb_overflow='block')
+    ...
+    # queue depth, dropped and blocked events etc.
+    print(ip.callback_stats())
 
 classes
 -------
 '''
+import sys
+import errno
 import atexit
 import logging
 import traceback
@@ -394,8 +440,11 @@ from pyroute2.common import View
 from pyroute2.common import basestring
 from pyroute2.common import uuid32
 from pyroute2.iproute import IPRoute
+from pyroute2.netlink import NetlinkError
+from pyroute2.netlink import compile_match
 from pyroute2.netlink.rtnl import RTM_GETLINK
 from pyroute2.ipdb.common import CreateException
+from pyroute2.ipdb.callbacks import CallbackPool
 from pyroute2.ipdb.interface import Interface
 from pyroute2.ipdb.linkedset import LinkedSet
 from pyroute2.ipdb.linkedset import IPaddrSet
@@ -435,20 +484,22 @@ class Watchdog(object):
         self.is_set = False
         self.ipdb = ipdb
 
+        match = compile_match(kwarg)
+
         def cb(ipdb, msg, _action):
             if _action != action:
                 return
 
-            for key in kwarg:
-                if (msg.get(key, None) != kwarg[key]) and \
-                        (msg.get_attr(msg.name2nla(key)) != kwarg[key]):
-                    return
+            if not match(msg):
+                return
 
             self.is_set = True
             self.event.set()
         self.cb = cb
-        # register callback prior to other things
-        self.uuid = self.ipdb.register_callback(self.cb)
+        # register callback prior to other things; it must
+        # not wait in the callbacks queue, since the code that
+        # waits for the watchdog can be a callback itself
+        self.uuid = self.ipdb.register_callback(self.cb, mode='sync')
 
     def wait(self, timeout=SYNC_TIMEOUT):
         ret = self.event.wait(timeout=timeout)
@@ -456,7 +507,59 @@ class Watchdog(object):
         return ret
 
     def cancel(self):
-        self.ipdb.unregister_callback(self.uuid)
+        self.ipdb.unregister_callback(self.uuid, mode='sync')
+
+
+class Interfaces(Dotkeys):
+    '''
+    The interfaces dict, where both names and indices refer to
+    the interface objects. It keeps also separate name and index
+    maps in sync, `IPDB.by_name` and `IPDB.by_index` are views
+    of them.
+    '''
+    def __init__(self):
+        dict.__init__(self)
+        dict.__setattr__(self, '_by_name', {})
+        dict.__setattr__(self, '_by_index', {})
+
+    def _map(self, key):
+        if isinstance(key, basestring):
+            return self._by_name
+        elif isinstance(key, int):
+            return self._by_index
+        return {}
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._map(key)[key] = value
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._map(key).pop(key, None)
+
+    def pop(self, key, *argv):
+        ret = dict.pop(self, key, *argv)
+        self._map(key).pop(key, None)
+        return ret
+
+    def popitem(self):
+        (key, value) = dict.popitem(self)
+        self._map(key).pop(key, None)
+        return (key, value)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *argv, **kwarg):
+        for (key, value) in dict(*argv, **kwarg).items():
+            self[key] = value
+
+    def clear(self):
+        dict.clear(self)
+        self._by_name.clear()
+        self._by_index.clear()
 
 
 class IPDB(object):
@@ -468,12 +571,18 @@ class IPDB(object):
 
     def __init__(self, nl=None, mode='implicit',
                  restart_on_error=None, nl_async=None,
-                 debug=False, ignore_rtables=None):
+                 debug=False, ignore_rtables=None, skip_stats=True,
+                 cb_workers=None, cb_queue=None, cb_overflow=None):
         '''
         Parameters:
             - nl -- IPRoute() reference
             - mode -- (implicit, explicit, direct)
             - iclass -- the interface class type
+            - skip_stats -- don't dump interface statistics
+            - cb_workers -- post-callbacks threads limit
+            - cb_queue -- post-callbacks queue limit, events
+            - cb_overflow -- on the queue overflow: drop (default)
+              or block, i.e. wait up to 1 second, then drop
 
         If you do not provide iproute instance, ipdb will
         start it automatically.
@@ -487,12 +596,17 @@ class IPDB(object):
         else:
             self._ignore_rtables = []
         self.iclass = Interface
+        self._skip_stats = skip_stats
         self._nl_async = config.ipdb_nl_async if nl_async is None else True
         self._stop = False
         # see also 'register_callback'
         self._post_callbacks = {}
         self._pre_callbacks = {}
-        self._cb_threads = {}
+        self._sync_callbacks = {}
+        self._cb_pool = CallbackPool(
+            config.ipdb_cb_workers if cb_workers is None else cb_workers,
+            config.ipdb_cb_queue if cb_queue is None else cb_queue,
+            config.ipdb_cb_overflow if cb_overflow is None else cb_overflow)
 
         # locks and events
         self._links_event = threading.Event()
@@ -525,22 +639,22 @@ class IPDB(object):
         self.nl = nl or IPRoute()
 
         # resolvers
-        self.interfaces = Dotkeys()
+        self.interfaces = Interfaces()
         self.routes = RoutingTableSet(ipdb=self,
                                       ignore_rtables=self._ignore_rtables)
-        self.by_name = View(src=self.interfaces,
-                            constraint=lambda k, v: isinstance(k, basestring))
-        self.by_index = View(src=self.interfaces,
-                             constraint=lambda k, v: isinstance(k, int))
+        self.by_name = View(src=self.interfaces._by_name)
+        self.by_index = View(src=self.interfaces._by_index)
 
         # caches
         self.ipaddr = {}
         self.neighbours = {}
+        # port index -> master interface, see update_slaves()
+        self._port_master = {}
 
         try:
             self.nl.bind(async=self._nl_async)
             # load information
-            links = self.nl.get_links()
+            links = self.nl.get_links(skip_stats=self._skip_stats)
             for link in links:
                 self.device_put(link, skip_slaves=True)
             for link in links:
@@ -558,6 +672,52 @@ class IPDB(object):
                 pass
             raise e
 
+    def resync(self, kinds=('links', 'addr', 'neighbours', 'routes')):
+        '''
+        Re-dump given object kinds and merge the result into the
+        DB: update existing objects, add new and remove vanished
+        ones. Unlike `initdb()`, the DB is not rebuilt, so all the
+        object references stay valid.
+
+        IPDB calls it when the netlink socket reports ENOBUFS,
+        since some broadcast messages are lost.
+        '''
+        with self.exclusive:
+            if 'links' in kinds:
+                links = self.nl.get_links(skip_stats=self._skip_stats)
+                for link in links:
+                    self.device_put(link, skip_slaves=True)
+                for link in links:
+                    self.update_slaves(link)
+                seen = set([x['index'] for x in links])
+                for index in tuple(self.by_index):
+                    device = self.interfaces[index]
+                    if index not in seen and \
+                            device['ipdb_scope'] == 'system':
+                        self.detach(None, index)
+                self._links_event.set()
+            if 'addr' in kinds:
+                addrs = self.nl.get_addr()
+                self.update_addr(addrs)
+                seen = set([(x['index'], get_addr_nla(x), x['prefixlen'])
+                            for x in addrs])
+                for (index, ipaddr) in tuple(self.ipaddr.items()):
+                    for key in tuple(ipaddr):
+                        if (index, ) + tuple(key) not in seen:
+                            ipaddr.remove(key)
+            if 'neighbours' in kinds:
+                neighs = self.nl.get_neighbours()
+                self.update_neighbours(neighs)
+                seen = set([(x['ifindex'], x.get_attr('NDA_DST'))
+                            for x in neighs])
+                for (index, neighbours) in tuple(self.neighbours.items()):
+                    for key in tuple(neighbours):
+                        if (index, key) not in seen:
+                            neighbours.remove(key)
+            if 'routes' in kinds:
+                self.routes.resync(self.nl.get_routes(family=AF_INET) +
+                                   self.nl.get_routes(family=AF_INET6))
+
     def register_callback(self, callback, mode='post'):
         '''
         IPDB callbacks are routines executed on a RT netlink
@@ -572,11 +732,21 @@ class IPDB(object):
         callbacks you will access the most up-to-date state
         of the IP database.
 
-        "Post" callbacks are executed asynchronously in
-        separate threads. These threads can work as long
-        as you want them to. Callback threads are joined
-        occasionally, so for a short time there can exist
-        stopped threads.
+        "Post" callbacks are executed asynchronously by a
+        thread pool. Each callback gets the messages one by
+        one, in the order they arrive, but different callbacks
+        run in parallel, up to `cb_workers` threads (see IPDB
+        parameters). Pending messages are queued, up to
+        `cb_queue` messages in total. When the queue is full,
+        the message is dropped for post-callbacks
+        (`cb_overflow='drop'`, the default), or the main IPDB
+        loop waits up to 1 second for the room, and drops the
+        message then (`cb_overflow='block'`). The main loop never
+        waits longer, since callbacks often wait for it. The pool
+        counters are available via `IPDB.callback_stats()`.
+
+        A callback can work as long as you want it to, but
+        while it works, its next messages wait in the queue.
 
         ...
 
@@ -591,9 +761,15 @@ class IPDB(object):
 
         ...
 
+        "Sync" callbacks are run by the main loop just as "pre"
+        ones, but after the message is processed. They are
+        used by watchdogs, and should be as short as possible.
+
+        ...
+
         The routine, `register_callback()`, takes two arguments:
             - callback function
-            - mode (optional, default="post")
+            - mode (optional, default="post"; "pre", "sync")
 
         The callback should be a routine, that accepts three
         arguments::
@@ -628,22 +804,42 @@ class IPDB(object):
             self._post_callbacks[safe.uuid] = safe
         elif mode == 'pre':
             self._pre_callbacks[safe.uuid] = safe
+        elif mode == 'sync':
+            self._sync_callbacks[safe.uuid] = safe
+        else:
+            raise KeyError('Unknown callback mode')
         return safe.uuid
 
     def unregister_callback(self, cuid, mode='post'):
+        '''
+        Unregister the callback by the id returned from
+        `register_callback()`. For "post" callbacks wait up
+        to 3 seconds for the pending messages to be processed,
+        and return the number of messages that are still not
+        processed (the callback's running or queued calls).
+        '''
         if mode == 'post':
             cbchain = self._post_callbacks
         elif mode == 'pre':
             cbchain = self._pre_callbacks
+        elif mode == 'sync':
+            cbchain = self._sync_callbacks
         else:
             raise KeyError('Unknown callback mode')
         safe = cbchain[cuid]
         with safe.lock:
             cbchain.pop(cuid)
-        for t in tuple(self._cb_threads.get(cuid, ())):
-            t.join(3)
-        ret = self._cb_threads.get(cuid, ())
-        return ret
+        if mode == 'post':
+            self._cb_pool.join(cuid, 3)
+            return self._cb_pool.pending(cuid)
+        return 0
+
+    def callback_stats(self):
+        '''
+        Return post-callbacks pool counters, see
+        `pyroute2.ipdb.callbacks.CallbackPool.stats()`
+        '''
+        return self._cb_pool.stats()
 
     def release(self):
         '''
@@ -664,9 +860,8 @@ class IPDB(object):
 
                 self._stop = True
                 # collect all the callbacks
-                for cuid in tuple(self._cb_threads):
-                    for t in tuple(self._cb_threads[cuid]):
-                        t.join()
+                self._cb_pool.join()
+                self._cb_pool.stop()
                 # terminate the main loop
                 try:
                     for t in range(3):
@@ -991,6 +1186,7 @@ class IPDB(object):
             target.sync()
             self.interfaces.pop(name, None)
             self.interfaces.pop(idx, None)
+            self._port_master.pop(idx, None)
             self.ipaddr.pop(idx, None)
             self.neighbours.pop(idx, None)
             target.set_item('ipdb_scope', 'detached')
@@ -1027,6 +1223,19 @@ class IPDB(object):
         # of IFLA_INFO_OVS_MASTER lookup is done via ifname
         return self.interfaces.get(master, None)
 
+    def _release_port(self, index, keep=None):
+        # remove the port from the master it is registered
+        # with, unless the master is `keep`
+        master = self._port_master.get(index)
+        if master is None or master is keep:
+            return
+        del self._port_master[index]
+        if index in master['ports']:
+            try:
+                master.del_port(index, direct=True)
+            except KeyError:
+                pass
+
     def update_slaves(self, msg):
         # Update slaves list -- only after update IPDB!
 
@@ -1042,29 +1251,20 @@ class IPDB(object):
                 # no 'RTM_DELLINK', only 'RTM_NEWLINK', and
                 # we can end up in a broken state, when two
                 # masters refers to the same slave
-                for device in self.by_index:
-                    if index in self.interfaces[device]['ports']:
-                        try:
-                            self.interfaces[device].del_port(
-                                index, direct=True)
-                        except KeyError:
-                            pass
+                self._release_port(index, keep=master)
                 master.add_port(index, direct=True)
+                self._port_master[index] = master
             elif msg['event'] == 'RTM_DELLINK':
                 if index in master['ports']:
                     master.del_port(index, direct=True)
+                if self._port_master.get(index) is master:
+                    del self._port_master[index]
         # there is NO masters for the interface, clean them if any
         else:
             device = self.interfaces[msg['index']]
 
             # clean device from ports
-            for master in self.by_index:
-                if index in self.interfaces[master]['ports']:
-                    try:
-                        self.interfaces[master].del_port(
-                            index, direct=True)
-                    except KeyError:
-                        pass
+            self._release_port(index)
             master = device.if_master
             if master is not None:
                 if 'master' in device:
@@ -1134,6 +1334,24 @@ class IPDB(object):
                 if self._stop:
                     break
             except:
+                e = sys.exc_info()[1]
+                # socket.error is IOError on Python 2
+                if isinstance(e, (IOError, OSError)) and \
+                        e.errno == errno.ENOBUFS:
+                    # some messages are lost, but the socket
+                    # is still valid
+                    logging.warning('netlink socket overflow, '
+                                    'resync IPDB')
+                    try:
+                        self.resync()
+                        continue
+                    except (NetlinkError, IOError, OSError):
+                        # the dump failed, restart from scratch
+                        logging.error('Error on IPDB resync:\n%s',
+                                      traceback.format_exc())
+                    except Exception:
+                        logging.exception('IPDB resync failed')
+                        raise
                 logging.error('Restarting IPDB instance after '
                               'error:\n%s', traceback.format_exc())
                 if self.restart_on_error:
@@ -1173,25 +1391,16 @@ class IPDB(object):
                                                     'RTM_DELROUTE'):
                         self.update_routes([msg])
 
+                # run sync callbacks, e.g. watchdogs
+                for (cuid, cb) in tuple(self._sync_callbacks.items()):
+                    try:
+                        cb(self, msg, msg['event'])
+                    except Exception:
+                        logging.error('IPDB sync callback error:\n%s',
+                                      traceback.format_exc())
+
                 # run post-callbacks
                 # NOTE: post-callbacks are asynchronous
                 for (cuid, cb) in tuple(self._post_callbacks.items()):
-                    t = threading.Thread(name="callback %s" % (id(cb)),
-                                         target=cb,
-                                         args=(self, msg, msg['event']))
-                    t.start()
-                    if cuid not in self._cb_threads:
-                        self._cb_threads[cuid] = set()
-                    self._cb_threads[cuid].add(t)
-
-                # occasionally join cb threads
-                for cuid in tuple(self._cb_threads):
-                    for t in tuple(self._cb_threads.get(cuid, ())):
-                        t.join(0)
-                        if not t.is_alive():
-                            try:
-                                self._cb_threads[cuid].remove(t)
-                            except KeyError:
-                                pass
-                            if len(self._cb_threads.get(cuid, ())) == 0:
-                                del self._cb_threads[cuid]
+                    self._cb_pool.submit(cuid, cb,
+                                         (self, msg, msg['event']))
@@ -0,0 +1,184 @@
+import time
+import logging
+import threading
+import traceback
+from collections import deque
+
+
+class CallbackPool(object):
+    '''
+    Fixed size thread pool to run IPDB post-callbacks.
+
+    Every callback has its own FIFO of pending events, so one
+    callback gets events strictly in the arrival order, one by
+    one, while different callbacks run in parallel on up to
+    `workers` threads. Threads are started on demand.
+
+    The total number of pending events is limited by `maxsize`.
+    When the limit is reached, `submit()` either drops the event
+    (`overflow='drop'`), or waits up to `timeout` seconds for the
+    room, and drops the event then (`overflow='block'`). Dropped
+    events and waits are counted, see `stats()`.
+
+    `submit()` never waits longer than `timeout`: it is called by
+    the IPDB main loop, while callbacks often wait for the main
+    loop themselves, e.g. in `commit()`.
+    '''
+
+    def __init__(self, workers=4, maxsize=8192, overflow='drop',
+                 timeout=1):
+        if overflow not in ('block', 'drop'):
+            raise ValueError('unknown overflow policy: %s' % (overflow, ))
+        self.workers = max(int(workers), 1)
+        self.maxsize = max(int(maxsize), 1)
+        self.overflow = overflow
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.work = threading.Condition(self.lock)
+        self.space = threading.Condition(self.lock)
+        self.done = threading.Condition(self.lock)
+        # cuid -> deque((callback, argv)), cuids ready to run,
+        # cuids being run right now
+        self.queues = {}
+        self.ready = deque()
+        self.running = set()
+        self.threads = []
+        self.idle = 0
+        self.size = 0
+        self.stopped = False
+        self.counters = {'submitted': 0,
+                         'executed': 0,
+                         'errors': 0,
+                         'dropped': 0,
+                         'blocked': 0,
+                         'max_queued': 0}
+
+    def submit(self, cuid, callback, argv):
+        '''
+        Queue `callback(*argv)` after all the pending calls
+        with the same `cuid`. Return `False` if the event
+        is dropped.
+        '''
+        with self.lock:
+            if self.size >= self.maxsize and self.overflow == 'block':
+                self.counters['blocked'] += 1
+                deadline = time.time() + self.timeout
+                while self.size >= self.maxsize and not self.stopped:
+                    left = deadline - time.time()
+                    if left <= 0:
+                        break
+                    self.space.wait(left)
+            if self.size >= self.maxsize or self.stopped:
+                self.counters['dropped'] += 1
+                return False
+            queue = self.queues.get(cuid)
+            if queue is None:
+                queue = self.queues[cuid] = deque()
+            queue.append((callback, argv))
+            if len(queue) == 1 and cuid not in self.running:
+                self.ready.append(cuid)
+            self.size += 1
+            self.counters['submitted'] += 1
+            if self.size > self.counters['max_queued']:
+                self.counters['max_queued'] = self.size
+            if not self.idle and len(self.threads) < self.workers:
+                t = threading.Thread(name='IPDB callbacks %i' %
+                                     len(self.threads),
+                                     target=self._worker)
+                t.setDaemon(True)
+                self.threads.append(t)
+                t.start()
+            else:
+                self.work.notify()
+            return True
+
+    def _worker(self):
+        with self.lock:
+            while True:
+                while not self.ready and not self.stopped:
+                    self.idle += 1
+                    self.work.wait()
+                    self.idle -= 1
+                if not self.ready:
+                    return
+                cuid = self.ready.popleft()
+                queue = self.queues[cuid]
+                (callback, argv) = queue.popleft()
+                self.running.add(cuid)
+                self.lock.release()
+                try:
+                    callback(*argv)
+                except Exception:
+                    logging.error('IPDB callback error:\n%s',
+                                  traceback.format_exc())
+                    with self.lock:
+                        self.counters['errors'] += 1
+                finally:
+                    self.lock.acquire()
+                self.running.discard(cuid)
+                if queue:
+                    self.ready.append(cuid)
+                else:
+                    del self.queues[cuid]
+                self.size -= 1
+                self.counters['executed'] += 1
+                self.space.notify()
+                self.done.notify_all()
+
+    def pending(self, cuid=None):
+        '''
+        Return the number of not yet processed events of the
+        callback `cuid`, or of all the callbacks, including the
+        running ones.
+        '''
+        with self.lock:
+            if cuid is None:
+                return self.size
+            return len(self.queues.get(cuid, ())) + \
+                int(cuid in self.running)
+
+    def join(self, cuid=None, timeout=None):
+        '''
+        Wait until the pending events of the callback `cuid`,
+        or all the pending events, are processed. Return `True`
+        on success, `False` on timeout.
+        '''
+        if timeout is not None:
+            deadline = time.time() + timeout
+        with self.lock:
+            while True:
+                if cuid is None:
+                    if not self.size:
+                        return True
+                elif cuid not in self.queues:
+                    return True
+                if timeout is None:
+                    self.done.wait()
+                else:
+                    left = deadline - time.time()
+                    if left <= 0:
+                        return False
+                    self.done.wait(left)
+
+    def stop(self):
+        '''
+        Stop the workers. Events that are already queued are
+        still processed, new ones are dropped.
+        '''
+        with self.lock:
+            self.stopped = True
+            self.work.notify_all()
+            self.space.notify_all()
+
+    def stats(self):
+        '''
+        Return a dict of counters: the number of running
+        `workers`, `queued` events and the `max_queued` peak,
+        `submitted`, `executed`, `errors` raised by callbacks,
+        `dropped` events and `blocked` submits.
+        '''
+        with self.lock:
+            ret = dict(self.counters)
+            ret['workers'] = len(self.threads)
+            ret['queued'] = self.size
+            return ret
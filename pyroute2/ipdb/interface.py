@@ -799,7 +799,8 @@ class Interface(Transactional):
                 # getting RuntimeError() from commit(), take a seat
                 # and rest for a while. It is an extremal case, it
                 # should not became at all, and there is no sync.
-                for link in self.nl.get_links():
+                skip_stats = self.ipdb._skip_stats
+                for link in self.nl.get_links(skip_stats=skip_stats):
                     self.ipdb.device_put(link)
                 self.ipdb.update_addr(self.nl.get_addr())
                 x = RuntimeError()
@@ -1,8 +1,14 @@
 import logging
 import threading
+from binascii import hexlify
+from operator import itemgetter
+from socket import AF_INET
+from socket import AF_INET6
 from socket import AF_UNSPEC
+from socket import inet_pton
 from pyroute2.common import basestring
 from pyroute2.netlink import nlmsg
+from pyroute2.netlink.rtnl import rtprotos
 from pyroute2.netlink.rtnl.rtmsg import rtmsg
 from pyroute2.netlink.rtnl.req import IPRouteRequest
 from pyroute2.ipdb.transactional import Transactional
@@ -98,6 +104,109 @@ def RouteKey(msg):
     return (src, dst, iif, oif)
 
 
+def _parse_prefix(prefix, family=None):
+    '''
+    Parse `addr[/len]` or `default` into a tuple
+    (family, address width, prefix length, address as int).
+    Return None for anything else, e.g. MPLS labels.
+    '''
+    if not isinstance(prefix, basestring):
+        return None
+    if prefix == 'default':
+        family = family if family in (AF_INET, AF_INET6) else AF_INET
+        return (family, 128 if family == AF_INET6 else 32, 0, 0)
+    addr, _, length = prefix.partition('/')
+    family = AF_INET6 if addr.find(':') >= 0 else AF_INET
+    width = 128 if family == AF_INET6 else 32
+    try:
+        value = int(hexlify(inet_pton(family, addr)), 16)
+        length = int(length) if length else width
+    except (IOError, OSError, ValueError):
+        # socket.error is IOError on Python 2
+        return None
+    if not 0 <= length <= width:
+        return None
+    return (family, width, length, value)
+
+
+class PrefixIndex(object):
+    '''
+    Longest prefix match index of route keys. Prefixes are kept
+    in hash tables, one per family and prefix length, so a lookup
+    costs one dict access per used prefix length, starting from
+    the longest one::
+
+        {family: {dst_len: {network: set(keys)}}}
+    '''
+
+    def __init__(self):
+        self.tables = {}
+        self.lengths = {}
+        self.prefixes = {}
+
+    def add(self, key, dst, family=None):
+        self.remove(key)
+        prefix = _parse_prefix(dst, family)
+        if prefix is None:
+            return
+        (family, width, length, value) = prefix
+        network = value >> (width - length)
+        table = self.tables.setdefault(family, {})
+        if length not in table:
+            table[length] = {}
+            self.lengths[family] = sorted(table, reverse=True)
+        table[length].setdefault(network, set()).add(key)
+        self.prefixes[key] = (family, length, network)
+
+    def remove(self, key):
+        if key not in self.prefixes:
+            return
+        (family, length, network) = self.prefixes.pop(key)
+        table = self.tables[family]
+        keys = table[length][network]
+        keys.discard(key)
+        if not keys:
+            del table[length][network]
+            if not table[length]:
+                del table[length]
+                self.lengths[family] = sorted(table, reverse=True)
+
+    def lookup(self, addr):
+        '''
+        Return keys of the longest prefix, that covers `addr`.
+        '''
+        prefix = _parse_prefix(addr)
+        if prefix is None:
+            raise ValueError('unsupported address: %s' % (addr, ))
+        (family, width, length, value) = prefix
+        table = self.tables.get(family, {})
+        for dst_len in self.lengths.get(family, ()):
+            if dst_len > length:
+                continue
+            keys = table[dst_len].get(value >> (width - dst_len))
+            if keys:
+                return keys
+        return set()
+
+
+def _route_attrs(route):
+    '''
+    Return a set of (field, value) pairs to index the route by.
+    Multipath nexthops are indexed as `oif` and `gateway` too.
+    '''
+    ret = set()
+    for field in RoutingTable.indexed:
+        value = route.get(field)
+        if value is not None:
+            ret.add((field, value))
+    for nh in route.get('multipath') or ():
+        if nh.get('ifindex'):
+            ret.add(('oif', nh['ifindex']))
+        if nh.get('gateway') is not None:
+            ret.add(('gateway', nh['gateway']))
+    return ret
+
+
 class Route(Transactional):
     '''
     Persistent transactional route object
@@ -279,11 +388,53 @@ class Route(Transactional):
 
 class RoutingTable(object):
 
+    # fields with secondary indices, see filter()
+    indexed = ('oif', 'gateway', 'proto', 'priority')
+
     def __init__(self, ipdb, prime=None):
         self.ipdb = ipdb
         self.lock = threading.Lock()
         self.idx = {}
         self.kdx = {}
+        # dst -> {key: serial}, the serial reflects the
+        # `self.idx` insertion order, see describe()
+        self.ddx = {}
+        self.serial = 0
+        # longest prefix match
+        self.lpm = PrefixIndex()
+        # (field, value) -> {key: None}, and key -> (field, value) set
+        self.sdx = {}
+        self.sdx_attrs = {}
+
+    def _index_attrs(self, key, attrs):
+        for attr in self.sdx_attrs.pop(key, ()):
+            keys = self.sdx[attr]
+            keys.pop(key, None)
+            if not keys:
+                del self.sdx[attr]
+        if attrs:
+            for attr in attrs:
+                self.sdx.setdefault(attr, {})[key] = None
+            self.sdx_attrs[key] = attrs
+
+    def _add_record(self, key, record):
+        # keep indices in sync with `self.idx`
+        if key not in self.idx:
+            self.serial += 1
+            self.ddx.setdefault(key[1], {})[key] = self.serial
+        self.idx[key] = record
+        self.lpm.add(key, key[1], record['route'].get('family'))
+        self._index_attrs(key, _route_attrs(record['route']))
+
+    def _del_record(self, key):
+        record = self.idx.pop(key)
+        keys = self.ddx.get(key[1], {})
+        keys.pop(key, None)
+        if not keys:
+            self.ddx.pop(key[1], None)
+        self.lpm.remove(key)
+        self._index_attrs(key, None)
+        return record
 
     def __repr__(self):
         return repr([x['route'] for x in self.idx.values()])
@@ -322,7 +473,17 @@ class RoutingTable(object):
         # match the route by dict spec
         if not isinstance(target, dict):
             raise TypeError('unsupported key type')
-        for record in self.idx.values():
+        if target.get('dst') is not None:
+            # only routes with the same dst or without
+            # dst at all can match, see below; check them
+            # in the insertion order, as the full scan does
+            keys = list(self.ddx.get(target['dst'], {}).items())
+            keys.extend(self.ddx.get(None, {}).items())
+            keys.sort(key=itemgetter(1))
+            records = [self.idx[x[0]] for x in keys]
+        else:
+            records = self.idx.values()
+        for record in records:
             for key in target:
                 # skip non-existing keys
                 #
@@ -361,7 +522,7 @@ class RoutingTable(object):
     def __delitem__(self, key):
         with self.lock:
             item = self.describe(key, forward=False)
-            del self.idx[RouteKey(item['route'])]
+            self._del_record(RouteKey(item['route']))
 
     def __setitem__(self, key, value):
         with self.lock:
@@ -381,12 +542,12 @@ class RoutingTable(object):
 
             key = RouteKey(record['route'])
             if record['key'] is None:
-                self.idx[key] = {'route': record['route'],
-                                 'key': key}
+                self._add_record(key, {'route': record['route'],
+                                       'key': key})
             else:
-                self.idx[key] = record
+                self._add_record(key, record)
                 if record['key'] != key:
-                    del self.idx[record['key']]
+                    self._del_record(record['key'])
                     record['key'] = key
 
     def __getitem__(self, key):
@@ -401,6 +562,38 @@ class RoutingTable(object):
         except KeyError:
             return False
 
+    def lookup(self, addr):
+        '''
+        Return the route to the address: the longest prefix
+        match, with the lowest priority among the routes to
+        the same prefix. Raise KeyError, if there is no route.
+        '''
+        with self.lock:
+            routes = [self.idx[x]['route'] for x in self.lpm.lookup(addr)]
+        if not routes:
+            raise KeyError('route not found')
+        return min(routes, key=lambda x: x.get('priority') or 0)
+
+    def filter(self, **spec):
+        '''
+        Return routes that match all the fields of the spec.
+        Indexed fields are resolved without scanning the table,
+        the rest is checked only against the matched routes.
+        '''
+        with self.lock:
+            indexed = [self.sdx.get(x, {}) for x in spec.items()
+                       if x[0] in self.indexed]
+            if indexed:
+                indexed.sort(key=len)
+                keys = [x for x in indexed[0]
+                        if all([x in y for y in indexed[1:]])]
+            else:
+                keys = list(self.idx.keys())
+            routes = [self.idx[x]['route'] for x in keys]
+        rest = [x for x in spec.items() if x[0] not in self.indexed]
+        return [x for x in routes
+                if all([x.get(k) == v for (k, v) in rest])]
+
 
 class RoutingTableSet(object):
 
@@ -469,6 +662,27 @@ class RoutingTableSet(object):
         self.tables[table][key] = msg
         return self.tables[table][key]
 
+    def resync(self, msgs):
+        '''
+        Load a full routes dump and remove system routes, that
+        are not in the dump. Other routes, as well as existing
+        `Route` objects, are kept.
+        '''
+        seen = set()
+        for msg in msgs:
+            route = self.load_netlink(msg)
+            if route is not None:
+                seen.add((msg.get('table', 254), RouteKey(route)))
+        for (table, rtable) in tuple(self.tables.items()):
+            with rtable.lock:
+                for (key, record) in tuple(rtable.idx.items()):
+                    route = record['route']
+                    if route['ipdb_scope'] == 'system' and \
+                            (table, key) not in seen:
+                        rtable._del_record(key)
+                        route.set_item('ipdb_scope', 'detached')
+                        route.sync()
+
     def remove(self, route, table=None):
         if isinstance(route, Route):
             table = route.get('table', 254) or 254
@@ -484,6 +698,49 @@ class RoutingTableSet(object):
         table = table or 254
         return self.tables[table][dst]
 
+    def lookup(self, addr, table=None):
+        '''
+        Longest prefix match in the routing table::
+
+            ipdb.routes.lookup('10.1.2.3')
+            ipdb.routes.lookup('fc00::1', table=100)
+
+        Unlike `get()`, never asks the kernel.
+        '''
+        table = table or 254
+        if table not in self.tables:
+            raise KeyError('route not found')
+        return self.tables[table].lookup(addr)
+
+    def filter(self, table=None, **spec):
+        '''
+        Return routes that match the spec, from all the tables
+        or only from the specified one::
+
+            # all routes via the interface, including multipath
+            # routes with a nexthop via the interface
+            ipdb.routes.filter(oif=ipdb.interfaces.eth0.index)
+
+            # routes installed by BIRD in the table 100
+            ipdb.routes.filter(proto='RTPROT_BIRD', table=100)
+
+        Fields `oif`, `gateway`, `proto` and `priority` are
+        indexed; other fields are compared one by one against
+        the routes matched by the indexed ones.
+        '''
+        if isinstance(spec.get('proto'), basestring):
+            spec['proto'] = rtprotos[spec['proto']]
+        if table is None:
+            tables = tuple(self.tables.values())
+        elif table in self.tables:
+            tables = (self.tables[table], )
+        else:
+            tables = ()
+        ret = []
+        for rtable in tables:
+            ret.extend(rtable.filter(**spec))
+        return ret
+
     def keys(self, table=254, family=AF_UNSPEC):
         return [x['dst'] for x in self.tables[table]
                 if (x.get('family') == family) or
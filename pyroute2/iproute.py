@@ -40,6 +40,89 @@ the programmer's perspective. Please read also
 `NetlinkSocket` documentation to know more about async
 mode.
 
+streaming dumps
+---------------
+
+Dump methods return lists, so the whole dump is held in memory.
+For big tables use generator versions, `get_routes_iter()`,
+`get_addr_iter()` and `get_neighbours_iter()`: they yield
+messages as they are received and parsed, applying filters on
+the fly::
+
+    for route in ip.get_routes_iter(family=AF_INET6, table=254):
+        ...
+
+kernel-side filtering
+---------------------
+
+Since Linux 4.20 the kernel can filter dumps itself, when the
+socket has NETLINK_GET_STRICT_CHK on. `IPRoute(strict_check=True)`
+turns it on, if possible, and then passes some filters to the
+kernel in the dump request:
+
+    - `get_routes()`: `table`, `proto`, `type`, `oif`
+    - `get_addr()`: `index`
+    - `get_neighbours()`: `ifindex`, `master`
+
+So reading one table out of a full-table router doesn't cost
+a full dump::
+
+    ip = IPRoute(strict_check=True)
+    ip.get_routes(family=AF_INET, table=100)
+
+All the filters are applied also in Python, so the result is
+the same on older kernels.
+
+Strict checks are off by default: with them the kernel treats
+every non-zero header field of a dump request as a filter, so
+low-level calls like `ip.route((RTM_GETROUTE, NLM_F_DUMP | ...))`,
+that fill the header with defaults, would return filtered dumps.
+
+Link dumps can be made slimmer with `IFLA_EXT_MASK`: the
+`skip_stats` option of `get_links()` asks the kernel to omit
+the IPv6 and ICMPv6 statistics in `IFLA_AF_SPEC` and the VF
+statistics, that are the bulk of every `RTM_NEWLINK` message.
+`IFLA_STATS` and `IFLA_STATS64` are sent anyway::
+
+    ip.get_links(skip_stats=True)
+
+interface lookups
+-----------------
+
+`link_lookup(ifname=...)` asks the kernel for the interface by
+name with one `RTM_GETLINK` request, without a dump. If the
+program looks up names very often, turn on the name -> index
+cache, that is kept up to date with `RTM_NEWLINK` and
+`RTM_DELLINK` messages::
+
+    ip = IPRoute()
+    ip.bind()
+    ip.set_link_cache()
+    ip.link_lookup(ifname='eth0')
+
+interface statistics
+--------------------
+
+Since Linux 4.7 interface counters can be fetched with
+`RTM_GETSTATS`, without the rest of the link info. The
+`get_stats()` call returns `ifstatsmsg` messages, by default
+only with `IFLA_STATS_LINK_64`::
+
+    for msg in ip.get_stats():
+        print(msg['ifindex'],
+              msg.get_attr('IFLA_STATS_LINK_64')['rx_bytes'])
+
+To poll counters regularly, use `StatsSampler`: it keeps the
+last two samples in preallocated arrays indexed by ifindex
+and computes deltas and rates for all the interfaces at once::
+
+    sampler = StatsSampler(ip, fields=('rx_bytes', 'tx_bytes'))
+    while True:
+        sampler.sample()
+        rates = sampler.rate('rx_bytes')
+        print(rates[2])
+        time.sleep(1)
+
 think about IPDB
 ----------------
 
@@ -55,16 +138,17 @@ less.
 classes
 -------
 '''
+import time
 import errno
 import types
 import logging
+from array import array
 from socket import htons
 from socket import AF_INET
 from socket import AF_INET6
 from socket import AF_UNSPEC
-from types import FunctionType
-from types import MethodType
 from pyroute2.netlink import NetlinkError
+from pyroute2.netlink import compile_match
 from pyroute2.netlink import NLMSG_ERROR
 from pyroute2.netlink import NLM_F_ATOMIC
 from pyroute2.netlink import NLM_F_ROOT
@@ -74,6 +158,7 @@ from pyroute2.netlink import NLM_F_ACK
 from pyroute2.netlink import NLM_F_DUMP
 from pyroute2.netlink import NLM_F_CREATE
 from pyroute2.netlink import NLM_F_EXCL
+from pyroute2.netlink import NLM_F_DUMP_FILTERED
 from pyroute2.netlink.rtnl import RTM_NEWADDR
 from pyroute2.netlink.rtnl import RTM_GETADDR
 from pyroute2.netlink.rtnl import RTM_DELADDR
@@ -100,8 +185,10 @@ from pyroute2.netlink.rtnl import RTM_GETNEIGH
 from pyroute2.netlink.rtnl import RTM_DELNEIGH
 from pyroute2.netlink.rtnl import RTM_SETLINK
 from pyroute2.netlink.rtnl import RTM_GETNEIGHTBL
+from pyroute2.netlink.rtnl import RTM_GETSTATS
 from pyroute2.netlink.rtnl import TC_H_INGRESS
 from pyroute2.netlink.rtnl import TC_H_ROOT
+from pyroute2.netlink.rtnl import RTEXT_FILTER_SKIP_STATS
 from pyroute2.netlink.rtnl import rtprotos
 from pyroute2.netlink.rtnl import rtypes
 from pyroute2.netlink.rtnl import rtscopes
@@ -123,6 +210,9 @@ from pyroute2.netlink.rtnl.fibmsg import fibmsg
 from pyroute2.netlink.rtnl.fibmsg import FR_ACT_NAMES
 from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
 from pyroute2.netlink.rtnl.ifaddrmsg import ifaddrmsg
+from pyroute2.netlink.rtnl.ifstatsmsg import ifstatsmsg
+from pyroute2.netlink.rtnl.ifstatsmsg import IFLA_STATS_FILTER_LINK_64
+from pyroute2.netlink.rtnl.ifinfmsg import stats_names
 from pyroute2.netlink.rtnl.iprsocket import IPRSocket
 from pyroute2.netlink.rtnl.iprsocket import RawIPRSocket
 from pyroute2.protocols import ETH_P_ALL
@@ -133,6 +223,17 @@ from pyroute2.common import getbroadcast
 DEFAULT_TABLE = 254
 
 
+def _skip_enoent(msgs):
+    # a strict AF_INET dump of a non-existing table fails
+    # with ENOENT, while the result should be just empty
+    try:
+        for msg in msgs:
+            yield msg
+    except NetlinkError as e:
+        if e.code != errno.ENOENT:
+            raise
+
+
 def transform_handle(handle):
     if isinstance(handle, basestring):
         (major, minor) = [int(x if x else '0', 16) for x in handle.split(':')]
@@ -175,32 +276,19 @@ class IPRouteMixin(object):
         # bring it up
         ipr.link('set', index=dev, state='up')
     '''
+    # ifname -> index, see `set_link_cache()`
+    link_cache = None
 
     def _match(self, match, msgs):
         # filtered results
-        f_ret = []
+        return list(self._filter(match, msgs))
+
+    def _filter(self, match, msgs):
+        # filter generator
+        match = compile_match(match)
         for msg in msgs:
-            if isinstance(match, (FunctionType, MethodType)):
-                if match(msg):
-                    f_ret.append(msg)
-            elif isinstance(match, dict):
-                matches = []
-                for key in match:
-                    KEY = msg.name2nla(key)
-                    if isinstance(match[key], types.FunctionType):
-                        if msg.get(key) is not None:
-                            matches.append(match[key](msg.get(key)))
-                        elif msg.get_attr(KEY) is not None:
-                            matches.append(match[key](msg.get_attr(KEY)))
-                        else:
-                            matches.append(False)
-                    else:
-                        matches.append(msg.get(key) == match[key] or
-                                       msg.get_attr(KEY) ==
-                                       match[key])
-                if all(matches):
-                    f_ret.append(msg)
-        return f_ret
+            if match(msg):
+                yield msg
 
     # 8<---------------------------------------------------------------
     #
@@ -253,19 +341,67 @@ class IPRouteMixin(object):
 
             interfaces = [1, 2, 3]
             ip.get_links(*interfaces)
+
+        Keyword arguments:
+
+            - family -- address family, `AF_UNSPEC` by default
+            - ext_mask -- `IFLA_EXT_MASK` value, `RTEXT_FILTER_*`
+            - skip_stats -- add `RTEXT_FILTER_SKIP_STATS` to the mask
+
+        With `skip_stats` the kernel doesn't send per-family
+        and VF statistics, so the dump is much smaller::
+
+            ip.get_links(skip_stats=True)
         '''
         result = []
         links = argv or ['all']
         msg_flags = NLM_F_REQUEST | NLM_F_DUMP
+        ext_mask = kwarg.get('ext_mask', 0)
+        if kwarg.get('skip_stats'):
+            ext_mask |= RTEXT_FILTER_SKIP_STATS
         for index in links:
             msg = ifinfmsg()
             msg['family'] = kwarg.get('family', AF_UNSPEC)
+            if ext_mask:
+                msg['attrs'] = [['IFLA_EXT_MASK', ext_mask]]
             if index != 'all':
                 msg['index'] = index
                 msg_flags = NLM_F_REQUEST
             result.extend(self.nlm_request(msg, RTM_GETLINK, msg_flags))
         return result
 
+    def get_stats(self, *argv, **kwarg):
+        '''
+        Get interface statistics with `RTM_GETSTATS`.
+
+        Like `get_links()`, returns all interfaces by default,
+        or only ones from the arguments vector::
+
+            ip.get_stats()
+            ip.get_stats(1, 2, 3)
+
+        Keyword arguments:
+
+            - family -- address family, `AF_UNSPEC` by default
+            - filter_mask -- `IFLA_STATS_FILTER_*` bits, by default
+              only `IFLA_STATS_LINK_64` is requested
+
+        Requires Linux >= 4.7.
+        '''
+        result = []
+        links = argv or ['all']
+        msg_flags = NLM_F_REQUEST | NLM_F_DUMP
+        for index in links:
+            msg = ifstatsmsg()
+            msg['family'] = kwarg.get('family', AF_UNSPEC)
+            msg['filter_mask'] = kwarg.get('filter_mask',
+                                           IFLA_STATS_FILTER_LINK_64)
+            if index != 'all':
+                msg['ifindex'] = index
+                msg_flags = NLM_F_REQUEST
+            result.extend(self.nlm_request(msg, RTM_GETSTATS, msg_flags))
+        return result
+
     def get_neighbors(self, family=AF_UNSPEC):
         '''
         Alias of `get_neighbours()`, deprecated.
@@ -299,10 +435,31 @@ class IPRouteMixin(object):
 
             # and filter them by a function:
             ip.get_neighbours(AF_BRIDGE, match=lambda x: x['state'] == 2)
+
+        The `ifindex` and `master` filters are passed to the kernel.
+        Since the kernel doesn't report the master for ARP records,
+        `master` is checked in Python only for records, the kernel
+        didn't filter.
         '''
+        match = match or kwarg
+        nla = {}
+        if isinstance(match, dict):
+            match = dict(match)
+            if isinstance(match.get('ifindex'), int):
+                nla['NDA_IFINDEX'] = match['ifindex']
+            if isinstance(match.get('master'), int):
+                nla['NDA_MASTER'] = master = match.pop('master')
+                pred = compile_match(match)
+
+                def match(msg):
+                    if not (msg['header']['flags'] & NLM_F_DUMP_FILTERED or
+                            msg.get_attr('NDA_MASTER') == master):
+                        return False
+                    return pred(msg)
         return self.neigh((RTM_GETNEIGH, NLM_F_REQUEST | NLM_F_DUMP),
                           family=family,
-                          match=match or kwarg)
+                          match=match,
+                          **nla)
 
     def get_ntables(self, family=AF_UNSPEC):
         '''
@@ -338,10 +495,17 @@ class IPRouteMixin(object):
         A custom predicate can be used as a filter::
 
             ip.get_addr(match=lambda x: x['index'] == 1)
+
+        The `index` filter is passed to the kernel.
         '''
+        match = match or kwarg
+        index = 0
+        if isinstance(match, dict) and isinstance(match.get('index'), int):
+            index = match['index']
         return self.addr((RTM_GETADDR, NLM_F_REQUEST | NLM_F_DUMP),
+                         index=index,
                          family=family,
-                         match=match or kwarg)
+                         match=match)
 
     def get_rules(self, family=AF_UNSPEC, match=None, **kwarg):
         '''
@@ -352,10 +516,13 @@ class IPRouteMixin(object):
             ip.get_rules() # get all the rules for all families
             ip.get_rules(family=AF_INET6)  # get only IPv6 rules
         '''
-        return self.rule((RTM_GETRULE,
-                          NLM_F_REQUEST | NLM_F_ROOT | NLM_F_ATOMIC),
-                         family=family,
-                         match=match or kwarg)
+        # the kernel with strict checks rejects rule dump requests
+        # with anything but the family, so don't use `rule()` here
+        msg = fibmsg()
+        msg['family'] = family
+        ret = self.nlm_request(msg, RTM_GETRULE,
+                               NLM_F_REQUEST | NLM_F_ROOT | NLM_F_ATOMIC)
+        return self._match(match or kwarg, ret)
 
     def get_routes(self, family=AF_UNSPEC, match=None, **kwarg):
         '''
@@ -369,21 +536,77 @@ class IPRouteMixin(object):
             ip.get_routes()  # get all the routes for all families
             ip.get_routes(family=AF_INET6)  # get only IPv6 routes
             ip.get_routes(table=254)  # get routes from 254 table
-        '''
 
-        msg_flags = NLM_F_DUMP | NLM_F_REQUEST
-        nkw = {}
+        The `table`, `proto`, `type` and `oif` filters are passed
+        to the kernel.
+
+        With `dst` specified, the kernel looks up the route to the
+        address, using `src`, `iif`, `oif`, `mark` and `table`.
+        '''
+        # the kernel with strict checks rejects requests with
+        # unexpected header fields and NLA, so the request is
+        # built here, not with `route()`
+        msg = rtmsg()
+        msg['family'] = family
+        msg['attrs'] = []
+        match = match or kwarg
 
         # get a particular route?
         if isinstance(kwarg.get('dst'), basestring):
-            dlen = 32 if family == AF_INET else \
-                128 if family == AF_INET6 else 0
             msg_flags = NLM_F_REQUEST
-            nkw['dst'] = kwarg.pop('dst')
-            nkw['dst_len'] = kwarg.pop('dst_len', dlen)
+            dst = kwarg.pop('dst')
+            kwarg.pop('dst_len', None)
+            if family == AF_UNSPEC:
+                msg['family'] = AF_INET6 if dst.find(':') >= 0 else AF_INET
+            msg['dst_len'] = 128 if msg['family'] == AF_INET6 else 32
+            msg['attrs'].append(['RTA_DST', dst])
+            for key in ('src', 'iif', 'oif', 'mark', 'table'):
+                if kwarg.get(key) is not None:
+                    msg['attrs'].append([rtmsg.name2nla(key), kwarg[key]])
+        else:
+            msg_flags = NLM_F_REQUEST | NLM_F_DUMP
+            if isinstance(match, dict):
+                for key in ('proto', 'type'):
+                    if isinstance(match.get(key), int):
+                        msg[key] = match[key]
+                for key in ('table', 'oif'):
+                    if isinstance(match.get(key), int):
+                        msg['attrs'].append([rtmsg.name2nla(key),
+                                             match[key]])
+
+        try:
+            ret = self.nlm_request(msg, RTM_GETROUTE, msg_flags)
+        except NetlinkError as e:
+            if e.code != errno.ENOENT or msg_flags == NLM_F_REQUEST:
+                raise
+            ret = []
+        if isinstance(ret, types.GeneratorType):
+            ret = _skip_enoent(ret)
+        return self._match(match, ret)
+
+    def get_routes_iter(self, family=AF_UNSPEC, match=None, **kwarg):
+        '''
+        Generator version of `get_routes()`: yield routes, as they
+        are received, not collecting the whole dump in memory.
+        Filters are applied on the fly::
+
+            for route in ip.get_routes_iter(family=AF_INET6):
+                ...
+        '''
+        return DumpStream(self).get_routes(family, match, **kwarg)
 
-        return self.route((RTM_GETROUTE, msg_flags),
-                          family=family, match=match or kwarg, **nkw)
+    def get_addr_iter(self, family=AF_UNSPEC, match=None, **kwarg):
+        '''
+        Generator version of `get_addr()`, see `get_routes_iter()`
+        '''
+        return DumpStream(self).get_addr(family, match, **kwarg)
+
+    def get_neighbours_iter(self, family=AF_UNSPEC, match=None, **kwarg):
+        '''
+        Generator version of `get_neighbours()`, see
+        `get_routes_iter()`
+        '''
+        return DumpStream(self).get_neighbours(family, match, **kwarg)
     # 8<---------------------------------------------------------------
 
     # 8<---------------------------------------------------------------
@@ -456,6 +679,11 @@ class IPRouteMixin(object):
 
         Please note, that link_lookup() returns list, not one
         value.
+
+        Lookups by `ifname` don't dump all the interfaces: the
+        kernel resolves the name itself, and with the link cache
+        on (see `set_link_cache()`) the answer is often known
+        without any request at all.
         '''
         name = tuple(kwarg.keys())[0]
         value = kwarg[name]
@@ -464,10 +692,80 @@ class IPRouteMixin(object):
         if not name.startswith('IFLA_'):
             name = 'IFLA_%s' % (name)
 
+        if name == 'IFLA_IFNAME' and isinstance(value, basestring):
+            ret = self._link_lookup_name(value)
+            if ret is not None:
+                return ret
+
+        # don't fetch statistics, unless they are the key
+        skip_stats = name != 'IFLA_AF_SPEC'
         return [k['index'] for k in
-                [i for i in self.get_links() if 'attrs' in i] if
+                [i for i in self.get_links(skip_stats=skip_stats)
+                 if 'attrs' in i] if
                 [l for l in k['attrs'] if l[0] == name and l[1] == value]]
 
+    def _link_lookup_name(self, ifname):
+        # return None, if the kernel can't resolve the name
+        cache = self.link_cache
+        if cache is not None and ifname in cache:
+            return [cache[ifname]]
+        msg = ifinfmsg()
+        msg['attrs'] = [['IFLA_IFNAME', ifname],
+                        ['IFLA_EXT_MASK', RTEXT_FILTER_SKIP_STATS]]
+        try:
+            ret = self.nlm_request(msg, RTM_GETLINK, NLM_F_REQUEST)
+        except NetlinkError as e:
+            if e.code == errno.ENODEV:
+                return []
+            # old kernels, that don't resolve names
+            return None
+        # since 5.5 the kernel resolves also alternative names,
+        # but only the main name should match
+        return [x['index'] for x in ret
+                if x.get_attr('IFLA_IFNAME') == ifname]
+
+    def set_link_cache(self, value=True):
+        '''
+        Turn on or off the interface name -> index cache, that is
+        used by `link_lookup(ifname=...)`.
+
+        The cache is filled and updated from every `RTM_NEWLINK`
+        and `RTM_DELLINK` message, that the socket receives:
+        responses as well as broadcasts. To track interfaces,
+        changed by other programs, the socket must be bound
+        with `bind()`, otherwise only the changes made through
+        this socket are seen. Returns the cache state.
+        '''
+        if value and self.link_cache is None:
+            self.link_cache = {}
+            self._link_cache_names = {}
+            self.register_callback(self._link_cache_update,
+                                   msg_types=set((RTM_NEWLINK,
+                                                  RTM_DELLINK)))
+        elif not value and self.link_cache is not None:
+            self.unregister_callback(self._link_cache_update)
+            self.link_cache = None
+        return self.link_cache is not None
+
+    def _link_cache_drop(self, index):
+        if self.link_cache is None:
+            return
+        ifname = self._link_cache_names.pop(index, None)
+        if ifname is not None and self.link_cache.get(ifname) == index:
+            del self.link_cache[ifname]
+
+    def _link_cache_update(self, msg):
+        mtype = msg['header']['type']
+        if self.link_cache is None or mtype not in (RTM_NEWLINK,
+                                                    RTM_DELLINK):
+            return
+        index = msg['index']
+        self._link_cache_drop(index)
+        ifname = msg.get_attr('IFLA_IFNAME')
+        if mtype == RTM_NEWLINK and ifname is not None:
+            self.link_cache[ifname] = index
+            self._link_cache_names[index] = ifname
+
     def flush_routes(self, *argv, **kwarg):
         '''
         Flush routes -- purge route records from a table.
@@ -697,6 +995,10 @@ class IPRouteMixin(object):
             # let the exception to be forwarded
             return True
 
+        if command != RTM_NEWLINK:
+            # without bind() there will be no event
+            self._link_cache_drop(msg['index'])
+
         return self.nlm_request(msg,
                                 msg_type=command,
                                 msg_flags=msg_flags,
@@ -1280,6 +1582,138 @@ class IPRouteMixin(object):
     # 8<---------------------------------------------------------------
 
 
+class DumpStream(IPRouteMixin):
+    '''
+    Proxy to run `IPRouteMixin` methods in the streaming mode:
+    `nlm_request()` returns a generator, see
+    `NetlinkMixin.nlm_request_iter()`, and filters are applied
+    on the fly. All other attributes are taken from the socket.
+    '''
+
+    def __init__(self, nl):
+        self.nl = nl
+
+    def __getattr__(self, key):
+        return getattr(self.nl, key)
+
+    def nlm_request(self, msg, msg_type,
+                    msg_flags=NLM_F_REQUEST | NLM_F_DUMP,
+                    terminate=None,
+                    exception_catch=Exception,
+                    exception_handler=None,
+                    projection=None):
+        return self.nl.nlm_request_iter(msg, msg_type, msg_flags,
+                                        terminate, projection)
+
+    def _match(self, match, msgs):
+        return self._filter(match, msgs)
+
+
+class StatsSampler(object):
+    '''
+    Interface counters sampler, based on `get_stats()`.
+
+    Every `sample()` call dumps `IFLA_STATS_LINK_64` for all
+    the interfaces and stores the counters in `array('d')`
+    arrays, one per field, indexed by ifindex. The arrays of
+    two last samples are preallocated and reused, so polling
+    doesn't allocate per-interface objects::
+
+        sampler = StatsSampler(ip, fields=('rx_bytes', ))
+        sampler.sample()
+        ...
+        sampler.sample()
+        sampler.delta('rx_bytes')[2]  # bytes received by ifindex 2
+        sampler.rate('rx_bytes')[2]   # bytes per second
+
+    `delta()` and `rate()` return arrays of the same size, with
+    zeros for interfaces missing in any of the samples and for
+    counters that went backwards. The arrays support the buffer
+    protocol, so they can be used with numpy without copying::
+
+        numpy.frombuffer(sampler.current['rx_bytes'])
+    '''
+
+    def __init__(self, nl, fields=None, size=256):
+        self.nl = nl
+        self.fields = tuple(fields or stats_names)
+        self.size = 0
+        self.current = {}
+        self.previous = {}
+        for field in self.fields:
+            self.current[field] = array('d')
+            self.previous[field] = array('d')
+        # 1 for interfaces present in the sample
+        self.seen = array('B')
+        self.seen_previous = array('B')
+        # to reset `seen` with a slice assignment
+        self._zero = array('B')
+        self.timestamp = None
+        self.timestamp_previous = None
+        self.grow(size)
+
+    def grow(self, size):
+        '''
+        Extend all the arrays to `size` elements.
+        '''
+        if size <= self.size:
+            return
+        tail = array('d', [0]) * (size - self.size)
+        for field in self.fields:
+            self.current[field].extend(tail)
+            self.previous[field].extend(tail)
+        tail = array('B', [0]) * (size - self.size)
+        self.seen.extend(tail)
+        self.seen_previous.extend(tail)
+        self._zero = array('B', [0]) * size
+        self.size = size
+
+    def sample(self):
+        '''
+        Dump the counters into the current arrays, while the
+        old current ones become the previous sample.
+        '''
+        msgs = self.nl.get_stats()
+        self.previous, self.current = self.current, self.previous
+        self.seen_previous, self.seen = self.seen, self.seen_previous
+        self.timestamp_previous = self.timestamp
+        self.timestamp = time.time()
+        seen = self.seen
+        seen[:] = self._zero
+        current = [(field, self.current[field]) for field in self.fields]
+        for msg in msgs:
+            stats = msg.get_attr('IFLA_STATS_LINK_64')
+            if stats is None:
+                continue
+            index = msg['ifindex']
+            if index >= self.size:
+                self.grow(max(index + 1, self.size * 2))
+                seen = self.seen
+            for (field, values) in current:
+                values[index] = stats[field]
+            seen[index] = 1
+        return self
+
+    def delta(self, field):
+        '''
+        Return counter deltas between two last samples.
+        '''
+        return array('d', [x - y if a and b and x >= y else 0
+                           for (x, y, a, b) in zip(self.current[field],
+                                                   self.previous[field],
+                                                   self.seen,
+                                                   self.seen_previous)])
+
+    def rate(self, field):
+        '''
+        Return counter rates per second between two last samples.
+        '''
+        if self.timestamp_previous is None:
+            return array('d', [0]) * self.size
+        interval = (self.timestamp - self.timestamp_previous) or 1e-9
+        return array('d', [x / interval for x in self.delta(field)])
+
+
 class IPRoute(IPRouteMixin, IPRSocket):
     '''
     Production class that provides iproute API over normal Netlink
@@ -1293,3 +1727,31 @@ class IPRoute(IPRouteMixin, IPRSocket):
 
 class RawIPRoute(IPRouteMixin, RawIPRSocket):
     pass
+
+
+class IPBatch(IPRouteMixin):
+    '''
+    Collect requests of `IPRouteMixin` methods, not sending them,
+    to run later with `nlm_request_batch()`::
+
+        batch = IPBatch()
+        for net in range(256):
+            batch.route('add', dst='10.%i.0.0' % net, mask=16,
+                        gateway='192.168.0.1')
+        ipr = IPRoute()
+        for ret in ipr.nlm_request_batch(batch.requests):
+            if isinstance(ret, NetlinkError):
+                ...
+
+    Methods, that depend on responses, like `link_lookup()`,
+    make no sense here.
+    '''
+
+    def __init__(self):
+        self.requests = []
+
+    def nlm_request(self, msg, msg_type,
+                    msg_flags=NLM_F_REQUEST | NLM_F_DUMP,
+                    *argv, **kwarg):
+        self.requests.append((msg, msg_type, msg_flags))
+        return []
@@ -324,6 +324,35 @@ If the `fields` attribute is an empty list, the step 2 will be skipped.
 The step 3 will be skipped in the case of the empty `nla_map`. If both
 attributes are empty lists, only the header will be encoded/decoded.
 
+lazy decoding
+-------------
+
+With the `lazy` mode the step 3 of the decoding only records the
+type, the offset and the length of every NLA. The NLA value gets
+decoded on the first access, e.g. with `get_attr()`, `get_attrs()`
+or by reading the `['attrs']` list items. Until then, the items of
+the NLA chain are `nla_slot` objects, that look like usual
+`['NLA_TYPE', value]` lists. Nested NLA are decoded lazily as well.
+
+The mode is off by default. It can be turned on for a socket
+marshal, so all the received messages will be decoded lazily::
+
+    ipr = IPRoute()
+    ipr.marshal.lazy = True
+    # only IFLA_IFNAME gets decoded, while IFLA_STATS64,
+    # IFLA_AF_SPEC etc. are left untouched
+    names = [x.get_attr('IFLA_IFNAME') for x in ipr.get_links()]
+
+If only several NLA are required, the other ones can be skipped
+completely with a projection, see `Marshal.parse()`::
+
+    ipr = IPRoute()
+    msg = ifinfmsg()
+    msg['family'] = AF_UNSPEC
+    links = ipr.nlm_request(msg, RTM_GETLINK,
+                            projection={ifinfmsg: set(('IFLA_IFNAME',
+                                                       'IFLA_MTU'))})
+
 create and send messages
 ------------------------
 
@@ -386,10 +415,11 @@ Please notice, that NLA list *MUST* be mutable.
 Module contents:
 '''
 
+import types
 import traceback
+import threading
 import logging
 import struct
-import types
 import sys
 import io
 import re
@@ -413,6 +443,23 @@ _fmt_letters = re.compile('[^!><@=][!><@=]')
 if sys.version[0] == '3':
     unicode = str
 
+# struct format chars, that have different size in the native
+# and in the standard mode, so such fields can not be packed
+# into one struct together with others
+_native_only = re.compile('[lLnNP]')
+
+
+def _encode_field(value):
+    '''
+    Prepare a field value to be packed with `struct`
+    '''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    elif isinstance(value, float):
+        return int(value)
+    return value
+
+
 NLMSG_MIN_TYPE = 0x10
 
 GENL_NAMSIZ = 16    # length of family name
@@ -542,6 +589,8 @@ NLM_F_REQUEST = 1    # It is request message.
 NLM_F_MULTI = 2    # Multipart message, terminated by NLMSG_DONE
 NLM_F_ACK = 4    # Reply with ack, with zero or error code
 NLM_F_ECHO = 8    # Echo this request
+NLM_F_DUMP_INTR = 0x10    # Dump was inconsistent due to sequence change
+NLM_F_DUMP_FILTERED = 0x20    # Dump was filtered as requested
 # Modifiers to GET request
 NLM_F_ROOT = 0x100    # specify tree    root
 NLM_F_MATCH = 0x200    # return all matching
@@ -594,6 +643,115 @@ NETLINK_BROADCAST_ERROR = 4
 NETLINK_NO_ENOBUFS = 5
 NETLINK_RX_RING = 6
 NETLINK_TX_RING = 7
+NETLINK_LISTEN_ALL_NSID = 8
+NETLINK_LIST_MEMBERSHIPS = 9
+NETLINK_CAP_ACK = 10
+NETLINK_EXT_ACK = 11
+NETLINK_GET_STRICT_CHK = 12
+
+
+# lazy NLA decoding seeks the shared message buffer, see `nla_slot`
+_lazy_lock = threading.RLock()
+# NLA header: length and type
+_nla_header = struct.Struct('HH')
+# get_attrs() formats: the item index in the NLA record
+_fmt_map = {'raw': 1,
+            'encoded': 2}
+
+
+class nlbuffer(io.BytesIO):
+    '''
+    The message buffer. It is a usual `io.BytesIO`, but it keeps
+    a reference to the initial data in the `data` attribute, so
+    the decoder can unpack fields right from the data with
+    `unpack_from()`, without intermediate copies.
+
+    One buffer is shared by all the messages, parsed from one
+    `recv()` chunk, and by all their NLA. Python3 `io.BytesIO`
+    doesn't copy the initial bytes until the buffer is modified.
+
+    Any write to the buffer drops the `data` reference, and
+    the decoder falls back to the usual `read()` calls.
+    '''
+
+    def __init__(self, data=b''):
+        if isinstance(data, bytearray):
+            data = bytes(data)
+        elif isinstance(data, memoryview):
+            data = data.tobytes()
+        io.BytesIO.__init__(self, data)
+        self.data = data
+
+    def write(self, data):
+        self.data = None
+        return io.BytesIO.write(self, data)
+
+
+class nla_slot(list):
+    '''
+    An item of the lazily decoded NLA chain. It looks like an
+    ordinary `['NLA_TYPE', value]` list, but keeps only the NLA
+    offset and length in the parent buffer until the value is
+    requested for the first time.
+    '''
+    __slots__ = ('owner', 'init', 'length', 'msg_type')
+
+    def __init__(self, owner, name, init, length, msg_type):
+        list.__init__(self, (name, NotInitialized))
+        self.owner = owner
+        self.init = init
+        self.length = length
+        self.msg_type = msg_type
+
+    def decode(self):
+        '''
+        Decode the NLA value, if it is not decoded yet
+        '''
+        with _lazy_lock:
+            owner = self.owner
+            if owner is None:
+                return
+            buf = owner.buf
+            save = buf.tell()
+            try:
+                item = owner.decode_nla(self.init,
+                                        self.length,
+                                        self.msg_type)
+            finally:
+                buf.seek(save)
+            if item[0] != list.__getitem__(self, 0):
+                # failed to decode, the NLA is renamed
+                owner._attrs_index = None
+            list.__setitem__(self, slice(None), item)
+            self.owner = None
+
+    def __getitem__(self, key):
+        if self.owner is not None and key != 0:
+            self.decode()
+        return list.__getitem__(self, key)
+
+    def __iter__(self):
+        if self.owner is not None:
+            self.decode()
+        return list.__iter__(self)
+
+    def __repr__(self):
+        if self.owner is not None:
+            self.decode()
+        return list.__repr__(self)
+
+    def __eq__(self, rvalue):
+        if self.owner is not None:
+            self.decode()
+        return list.__eq__(self, rvalue)
+
+    def __ne__(self, rvalue):
+        return not self.__eq__(rvalue)
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (list, (list(self), ))
 
 
 class nlmsg_base(dict):
@@ -617,6 +775,11 @@ class nlmsg_base(dict):
     nla_flags = 0                # NLA flags
     nla_init = None              # NLA initstring
     value_map = {}
+    lazy = False                 # lazy NLA decoding
+    projection = None            # NLA to decode, see `decode_nlas()`
+    _raw = None
+    _data = None
+    _attrs_index = None
 
     def msg_align(self, l):
         return (l + self.align - 1) & ~ (self.align - 1)
@@ -626,22 +789,33 @@ class nlmsg_base(dict):
                  length=None,
                  parent=None,
                  debug=False,
-                 init=None):
+                 init=None,
+                 lazy=False,
+                 projection=None):
         dict.__init__(self)
         for i in self.fields:
             self[i[0]] = 0  # FIXME: only for number values
-        self.raw = None
         self.debug = debug
         self.length = length or 0
         self.parent = parent
         self.offset = 0
         self.prefix = None
         self.nla_init = init
+        if lazy:
+            self.lazy = True
+        if projection is not None:
+            self.projection = projection
         self['attrs'] = []
         self['value'] = NotInitialized
         self.value = NotInitialized
-        self.register_nlas()
-        self.r_value_map = dict([(x[1], x[0]) for x in self.value_map.items()])
+        # compile the class schema once, see `compile()`
+        compiled = type(self).__dict__.get('_compiled')
+        if compiled is None or \
+                compiled[0] is not self.nla_map or \
+                compiled[1] is not self.value_map or \
+                compiled[2] is not self.fields or \
+                compiled[3] != self.pack:
+            self.compile()
         self.reset(buf)
         self.clean_cbs = []
         if self.header is not None:
@@ -653,21 +827,34 @@ class nlmsg_base(dict):
         correctly only if the message was encoded, or is
         received from the socket.
         '''
-        ret = type(self)(self.buf.getvalue())
+        ret = type(self)(self.raw or self.buf.getvalue())
         ret.decode()
         return ret
 
+    @property
+    def raw(self):
+        '''
+        The message binary data, including the header. For the
+        messages, decoded from the shared `nlbuffer`, the data is
+        copied from the buffer on the first access.
+        '''
+        if self._raw is None and self._data is not None:
+            self._raw = self._data[self.offset:self.offset + self.length]
+        return self._raw
+
+    @raw.setter
+    def raw(self, value):
+        self._raw = value
+        self._data = None
+
     def reset(self, buf=None):
         '''
         Reset the message buffer. Optionally, set the message
         from the `buf` parameter. This parameter can be either
         string, or io.BytesIO, or dict instance.
         '''
-        if isinstance(buf, basestring):
-            b = io.BytesIO()
-            b.write(buf)
-            b.seek(0)
-            buf = b
+        if isinstance(buf, (basestring, bytearray, memoryview)):
+            buf = nlbuffer(buf)
         if isinstance(buf, dict):
             self.setvalue(buf)
             buf = None
@@ -682,9 +869,9 @@ class nlmsg_base(dict):
             self.clean_cbs.append(cb)
 
     def _strip_one(self, name):
-        for i in tuple(self['attrs']):
-            if i[0] == name:
-                self['attrs'].remove(i)
+        attrs = self['attrs']
+        attrs[:] = [i for i in attrs if i[0] != name]
+        self._attrs_index = None
         return self
 
     def strip(self, attrs):
@@ -818,10 +1005,7 @@ class nlmsg_base(dict):
         to skip encoding of the header until some fields will
         be known.
         '''
-        size = 0
-        for i in self.fields:
-            size += struct.calcsize(i[1])
-        self.buf.seek(size, 1)
+        self.buf.seek(self._fields_size, 1)
 
     def decode(self):
         '''
@@ -841,6 +1025,7 @@ class nlmsg_base(dict):
                     ...  # do some custom data tuning
         '''
         self.offset = self.buf.tell()
+        data = getattr(self.buf, 'data', None)
         # decode the header
         if self.header is not None:
             try:
@@ -848,17 +1033,23 @@ class nlmsg_base(dict):
                 # update length from header
                 # it can not be less than 4
                 self.length = max(self['header']['length'], 4)
-                save = self.buf.tell()
-                self.buf.seek(self.offset)
-                self.raw = self.buf.read(self.length)
-                self.buf.seek(save)
+                if data is not None:
+                    # zero-copy: `raw` will be sliced from the data
+                    # only if requested
+                    self._data = data
+                else:
+                    save = self.buf.tell()
+                    self.buf.seek(self.offset)
+                    self.raw = self.buf.read(self.length)
+                    self.buf.seek(save)
             except Exception as e:
                 raise NetlinkHeaderDecodeError(e)
         # handle the array case
         if self.nla_array:
             self.setvalue([])
             while self.buf.tell() < self.offset + self.length:
-                cell = type(self)(self.buf, parent=self, debug=self.debug)
+                cell = type(self)(self.buf, parent=self, debug=self.debug,
+                                  lazy=self.lazy)
                 cell.nla_array = False
                 if cell.cell_header is not None:
                     cell.header = cell.cell_header
@@ -868,56 +1059,36 @@ class nlmsg_base(dict):
         else:
             # decode the data
             try:
-                if self.pack == 'struct':
-                    names = []
-                    formats = []
-                    for field in self.fields:
-                        names.append(field[0])
-                        formats.append(field[1])
-                    fields = ((','.join(names), ''.join(formats)), )
+                if self._fields_dynamic:
+                    self.decode_fields_dynamic()
+                elif data is not None:
+                    # zero-copy: unpack the fields right from the data
+                    pos = self.buf.tell()
+                    if self.length:
+                        limit = self.offset + self.length
+                    else:
+                        limit = len(data)
+                    for (codec, offset, names, spec) in self._fields_decoder:
+                        if pos + offset + codec.size > limit:
+                            # FIXME: log an error
+                            break
+                        values = codec.unpack_from(data, pos + offset)
+                        if names is not None:
+                            self.update(zip(names, values))
+                        else:
+                            self._set_fields(spec, values)
+                    self.buf.seek(min(pos + self._fields_dsize, len(data)))
                 else:
-                    fields = self.fields
-
-                for field in fields:
-                    name = field[0]
-                    fmt = field[1]
-
-                    # 's' and 'z' can be used only in connection with
-                    # length, encoded in the header
-                    if field[1] in ('s', 'z'):
-                        fmt = '%is' % (self.length - 4)
-
-                    size = struct.calcsize(fmt)
-                    raw = self.buf.read(size)
-                    actual_size = len(raw)
-
-                    # FIXME: adjust string size again
-                    if field[1] in ('s', 'z'):
-                        size = actual_size
-                        fmt = '%is' % (actual_size)
-                    if size == actual_size:
-                        value = struct.unpack(fmt, raw)
-                        if len(value) == 1:
-                            self[name] = value[0]
-                            # cut zero-byte from z-strings
-                            # 0x00 -- python3; '\0' -- python2
-                            if field[1] == 'z' and self[name][-1] \
-                                    in (0x00, '\0'):
-                                self[name] = self[name][:-1]
+                    raw = self.buf.read(self._fields_dsize)
+                    for (codec, offset, names, spec) in self._fields_decoder:
+                        if offset + codec.size > len(raw):
+                            # FIXME: log an error
+                            break
+                        values = codec.unpack_from(raw, offset)
+                        if names is not None:
+                            self.update(zip(names, values))
                         else:
-                            if self.pack == 'struct':
-                                names = name.split(',')
-                                values = list(value)
-                                for name in names:
-                                    if name[0] != '_':
-                                        self[name] = values.pop(0)
-                            else:
-                                self[name] = value
-
-                    else:
-                        # FIXME: log an error
-                        pass
-
+                            self._set_fields(spec, values)
             except Exception as e:
                 raise NetlinkDataDecodeError(e)
         # decode NLA
@@ -967,41 +1138,38 @@ class nlmsg_base(dict):
                 cell.setvalue(value)
                 cell.encode()
         elif self.getvalue() is not None:
-            payload = b''
-            for i in self.fields:
-                name = i[0]
-                fmt = i[1]
-                value = self[name]
-
-                if fmt == 's':
-                    length = len(value)
-                    fmt = '%is' % (length)
-                elif fmt == 'z':
-                    length = len(value) + 1
-                    fmt = '%is' % (length)
-
-                # in python3 we should force it
-                if sys.version[0] == '3':
-                    if isinstance(value, str):
-                        value = bytes(value, 'utf-8')
-                    elif isinstance(value, float):
-                        value = int(value)
-                elif sys.version[0] == '2':
-                    if isinstance(value, unicode):
-                        value = value.encode('utf-8')
-
+            if self._fields_dynamic:
+                payload = bytearray()
+            else:
+                payload = bytearray(self._fields_size)
+            for (codec, offset, names, spec) in self._fields_encoder:
+                if codec is None:
+                    # 's' and 'z' fields
+                    name, fmt = spec
+                    value = _encode_field(self[name])
+                    if fmt == 'z':
+                        value += b'\0'
+                    payload += value
+                    continue
+                args = []
+                for (name, count) in spec:
+                    if count == 0:
+                        continue
+                    value = self[name]
+                    if type(value) in (list, tuple, set):
+                        args.extend(value)
+                    else:
+                        args.append(_encode_field(value))
                 try:
-                    if fmt[-1] == 'x':
-                        payload += struct.pack(fmt)
-                    elif type(value) in (list, tuple, set):
-                        payload += struct.pack(fmt, *value)
+                    if self._fields_dynamic:
+                        payload += codec.pack(*args)
                     else:
-                        payload += struct.pack(fmt, value)
+                        codec.pack_into(payload, offset, *args)
                 except struct.error:
                     logging.error(''.join(traceback.format_stack()))
                     logging.error(traceback.format_exc())
-                    logging.error("error pack: %s %s %s" %
-                                  (fmt, value, type(value)))
+                    logging.error("error pack: %s %s" %
+                                  (codec.format, args))
                     raise
 
             diff = self.msg_align(len(payload)) - len(payload)
@@ -1015,6 +1183,42 @@ class nlmsg_base(dict):
         if self.header is not None:
             self.update_length(init, diff)
 
+    def _set_fields(self, spec, values):
+        idx = 0
+        for (name, count) in spec:
+            if name is not None:
+                if count == 1:
+                    self[name] = values[idx]
+                else:
+                    self[name] = values[idx:idx + count]
+            idx += count
+
+    def decode_fields_dynamic(self):
+        '''
+        Decode fields, if there are 's' or 'z' fields, that
+        take their length from the header.
+        '''
+        for (codec, offset, names, spec) in self._fields_decoder:
+            if codec is None:
+                # 's' and 'z' can be used only in connection with
+                # length, encoded in the header
+                name, fmt = spec
+                value = self.buf.read(max(self.length - 4, 0))
+                # cut zero-byte from z-strings
+                if fmt == 'z' and value[-1:] == b'\0':
+                    value = value[:-1]
+                self[name] = value
+                continue
+            raw = self.buf.read(codec.size)
+            if len(raw) != codec.size:
+                # FIXME: log an error
+                break
+            values = codec.unpack(raw)
+            if names is not None:
+                self.update(zip(names, values))
+            else:
+                self._set_fields(spec, values)
+
     def update_length(self, start, diff=0):
         save = self.buf.tell()
         self['header']['length'] = save - start - diff
@@ -1044,11 +1248,18 @@ class nlmsg_base(dict):
         Return the first attr by name or None
         '''
         try:
-            attrs = self.get_attrs(attr, fmt)
+            attrs = self['attrs']
+            fmt = _fmt_map[fmt]
         except KeyError:
             return default
-        if attrs:
-            return attrs[0]
+        index = self._attrs_index
+        # the index is valid while the attrs list is the same
+        # and has the same length; strip() drops the index
+        if index is None or index[0] is not attrs or index[1] != len(attrs):
+            index = self._index_attrs(attrs)
+        positions = index[2].get(attr)
+        if positions:
+            return attrs[positions[0]][fmt]
         else:
             return default
 
@@ -1056,9 +1267,27 @@ class nlmsg_base(dict):
         '''
         Return attrs by name
         '''
-        fmt_map = {'raw': 1,
-                   'encoded': 2}
-        return [i[fmt_map[fmt]] for i in self['attrs'] if i[0] == attr]
+        attrs = self['attrs']
+        index = self._attrs_index
+        if index is None or index[0] is not attrs or index[1] != len(attrs):
+            index = self._index_attrs(attrs)
+        fmt = _fmt_map[fmt]
+        return [attrs[i][fmt] for i in index[2].get(attr, ())]
+
+    def _index_attrs(self, attrs):
+        '''
+        Build the name -> positions index for the attrs list
+        '''
+        positions = {}
+        for (pos, item) in enumerate(attrs):
+            name = item[0]
+            if name in positions:
+                positions[name].append(pos)
+            else:
+                positions[name] = [pos]
+        index = (attrs, len(attrs), positions)
+        self._attrs_index = index
+        return index
 
     def getvalue(self):
         '''
@@ -1076,6 +1305,123 @@ class nlmsg_base(dict):
         return self
 
     def register_nlas(self):
+        '''
+        Force the class schema recompilation. Kept for
+        compatibility, since the schema is compiled automatically
+        on the first use, see `compile()`.
+        '''
+        type(self).compile()
+
+    @classmethod
+    def compile(cls):
+        '''
+        Compile the class schema: the NLA map, see `compile_nla()`,
+        and the fields codecs, see `compile_fields()`.
+
+        The schema is compiled once per class and is shared by all
+        the class instances. It is compiled lazily, on the first
+        class instantiation, and is recompiled if any of the class
+        `nla_map`, `value_map`, `fields` or `pack` attributes gets
+        replaced.
+        '''
+        cls.compile_nla()
+        cls.compile_fields()
+        # should be the last: mark the schema as compiled
+        cls._compiled = (cls.nla_map, cls.value_map, cls.fields, cls.pack)
+
+    @classmethod
+    def compile_fields(cls):
+        '''
+        Compile `fields` into a list of `struct.Struct` codecs.
+
+        Consecutive fields are packed into one codec, so e.g. the
+        whole `ifinfmsg` body is decoded with one `unpack_from()`
+        call. Since all the fields are parsed as if they were
+        parsed separately, i.e. without any alignment, the native
+        format is replaced with the standard one ('='). The
+        exceptions are native-only formats like 'L' -- such fields
+        get their own codecs.
+
+        With `pack = 'struct'` the decoder uses one codec for all
+        the fields with the native alignment, as the C compiler
+        does.
+
+        Each codec is described as a tuple::
+
+            (codec, offset, names, spec)
+
+        where `names` is a tuple of field names, if every field
+        of the codec maps exactly to one value; otherwise it is
+        `None`, and the `spec` contains `(name, count)` pairs.
+        For 's' and 'z' fields, that get their length from the
+        header, `codec` is `None` and `spec` is `(name, fmt)`.
+        '''
+        encoder = []
+        dynamic = False
+        offset = 0
+        group = None
+        for (name, fmt) in cls.fields:
+            if fmt in ('s', 'z'):
+                group = None
+                dynamic = True
+                encoder.append([None, offset, None, (name, fmt)])
+                continue
+            if fmt[0] in '@=<>!':
+                prefix, body = fmt[0], fmt[1:]
+                if prefix == '!':
+                    prefix = '>'
+            else:
+                prefix, body = '=', fmt
+            if prefix == '@' or _native_only.search(body):
+                prefix, body = '@', fmt.lstrip('@')
+            count = len(struct.unpack(fmt, b'\0' * struct.calcsize(fmt)))
+            if group is None or group[0] != prefix or prefix == '@':
+                group = [prefix, offset, '', []]
+                encoder.append(group)
+            group[2] += body
+            group[3].append((name, count))
+            offset += struct.calcsize(fmt)
+
+        cls._fields_size = offset
+        cls._fields_dynamic = dynamic
+        cls._fields_encoder = []
+        for (prefix, offset, body, spec) in encoder:
+            if prefix is not None:
+                fmt = body if prefix == '@' else prefix + body
+                cls._fields_encoder.append(cls._fields_codec(fmt,
+                                                             offset,
+                                                             spec))
+            else:
+                cls._fields_encoder.append((None, offset, None, spec))
+
+        if cls.pack == 'struct' and cls.fields and not dynamic:
+            fmt = ''.join([x[1] for x in cls.fields])
+            spec = []
+            for (name, fmt_) in cls.fields:
+                count = len(struct.unpack(fmt_,
+                                          b'\0' * struct.calcsize(fmt_)))
+                if name[0] == '_':
+                    name = None
+                spec.append((name, count))
+            cls._fields_decoder = [cls._fields_codec(fmt, 0, spec)]
+        else:
+            cls._fields_decoder = cls._fields_encoder
+        cls._fields_dsize = sum([x[0].size for x in cls._fields_decoder
+                                 if x[0] is not None])
+
+    @staticmethod
+    def _fields_codec(fmt, offset, spec):
+        codec = struct.Struct(fmt)
+        # padding fields produce no values, skip them
+        if all([x[1] == 0 or (x[1] == 1 and x[0] is not None)
+                for x in spec]):
+            names = tuple([x[0] for x in spec if x[1] == 1])
+        else:
+            names = None
+        return (codec, offset, names, tuple(spec))
+
+    @classmethod
+    def compile_nla(cls):
         '''
         Convert 'nla_map' tuple into two dictionaries for mapping
         and reverse mapping of NLA types.
@@ -1102,58 +1448,64 @@ class nlmsg_base(dict):
         Items in `[...]` are optional. If ID is not given, then the map will
         be autonumerated from 0. If flags are not given, they are 0 by default.
 
+        If the NLA type is not a class, but a method (like
+        `ifinfmsg.ifinfo.info_data()`), the schema contains the
+        unbound function, that will be called on the message
+        instance to get the NLA class in runtime.
         '''
-        # clean up NLA mappings
-        self.t_nla_map = {}
-        self.r_nla_map = {}
+        t_nla_map = {}
+        r_nla_map = {}
+        r_value_map = dict([(x[1], x[0]) for x in cls.value_map.items()])
 
         # work only on non-empty mappings
-        if not self.nla_map:
-            return
-
-        # fix nla flags
-        nla_map = []
-        for item in self.nla_map:
-            if not isinstance(item[-1], int):
-                item = list(item)
-                item.append(0)
-            nla_map.append(item)
-
-        # detect, whether we have pre-defined keys
-        if not isinstance(nla_map[0][0], int):
-            # create enumeration
-            nla_types = enumerate((i[0] for i in nla_map))
-            # that's a little bit tricky, but to reduce
-            # the required amount of code in modules, we have
-            # to jump over the head
-            zipped = [(k[1][0], k[0][0], k[0][1], k[0][2]) for k in
-                      zip(nla_map, nla_types)]
-        else:
-            zipped = nla_map
-
-        for (key, name, nla_class, nla_flags) in zipped:
-            # it is an array
-            if nla_class[0] == '*':
-                nla_class = nla_class[1:]
-                nla_array = True
+        if cls.nla_map:
+            # fix nla flags
+            nla_map = []
+            for item in cls.nla_map:
+                if not isinstance(item[-1], int):
+                    item = list(item)
+                    item.append(0)
+                nla_map.append(item)
+
+            # detect, whether we have pre-defined keys
+            if not isinstance(nla_map[0][0], int):
+                # create enumeration
+                nla_types = enumerate((i[0] for i in nla_map))
+                # that's a little bit tricky, but to reduce
+                # the required amount of code in modules, we have
+                # to jump over the head
+                zipped = [(k[1][0], k[0][0], k[0][1], k[0][2]) for k in
+                          zip(nla_map, nla_types)]
             else:
-                nla_array = False
-            # are there any init call in the string?
-            lb = nla_class.find('(')
-            rb = nla_class.find(')')
-            if 0 < lb < rb:
-                init = nla_class[lb + 1:rb]
-                nla_class = nla_class[:lb]
-            else:
-                init = None
-            # lookup NLA class
-            if nla_class == 'recursive':
-                nla_class = type(self)
-            else:
-                nla_class = getattr(self, nla_class)
-            # update mappings
-            self.t_nla_map[key] = (nla_class, name, nla_flags, nla_array, init)
-            self.r_nla_map[name] = (nla_class, key, nla_flags, nla_array, init)
+                zipped = nla_map
+
+            for (key, name, nla_class, nla_flags) in zipped:
+                # it is an array
+                if nla_class[0] == '*':
+                    nla_class = nla_class[1:]
+                    nla_array = True
+                else:
+                    nla_array = False
+                # are there any init call in the string?
+                lb = nla_class.find('(')
+                rb = nla_class.find(')')
+                if 0 < lb < rb:
+                    init = nla_class[lb + 1:rb]
+                    nla_class = nla_class[:lb]
+                else:
+                    init = None
+                # lookup NLA class
+                if nla_class == 'recursive':
+                    nla_class = cls
+                else:
+                    nla_class = getattr(cls, nla_class)
+                # update mappings
+                t_nla_map[key] = (nla_class, name, nla_flags, nla_array, init)
+                r_nla_map[name] = (nla_class, key, nla_flags, nla_array, init)
+
+        cls.t_nla_map = t_nla_map
+        cls.r_nla_map = r_nla_map
+        cls.r_value_map = r_value_map
 
     def encode_nlas(self):
         '''
@@ -1167,9 +1519,9 @@ class nlmsg_base(dict):
                 msg_array = self.r_nla_map[i[0]][3]
                 msg_init = self.r_nla_map[i[0]][4]
                 # is it a class or a function?
-                if isinstance(msg_class, types.MethodType):
+                if not isinstance(msg_class, type):
                     # if it is a function -- use it to get the class
-                    msg_class = msg_class()
+                    msg_class = msg_class(self)
                 # encode NLA
                 nla = msg_class(self.buf, parent=self, init=msg_init)
                 nla.nla_flags |= self.r_nla_map[i[0]][2]
@@ -1190,58 +1542,100 @@ class nlmsg_base(dict):
         '''
         Decode the NLA chain. Should not be called manually, since
         it is called from `decode()` routine.
+
+        In the `lazy` mode NLA are not decoded here, but only
+        recorded as `nla_slot` items, see `decode_nla()`.
+
+        If the `projection` is set, NLA not listed there are
+        skipped by length. The projection can be a set of NLA
+        names, or a function `f(msg, name)`, that returns True
+        for NLA to be decoded. Only the top level NLA chain is
+        filtered, the nested NLA of the decoded ones are decoded
+        as usual.
         '''
-        while self.buf.tell() < (self.offset + self.length):
-            init = self.buf.tell()
-            nla = None
+        data = getattr(self.buf, 'data', None)
+        end = self.offset + self.length
+        init = self.buf.tell()
+        projection = self.projection
+        select = None
+        if projection is not None and not callable(projection):
+            select = projection
+            projection = None
+        while init < end:
             # pick the length and the type
-            (length, msg_type) = struct.unpack('HH', self.buf.read(4))
+            if data is not None:
+                (length, msg_type) = _nla_header.unpack_from(data, init)
+            else:
+                (length, msg_type) = _nla_header.unpack(self.buf.read(4))
             # first two bits of msg_type are flags:
             msg_type = msg_type & ~(NLA_F_NESTED | NLA_F_NET_BYTEORDER)
-            # rewind to the beginning
+            length = min(max(length, 4), end - init)
+
+            if self.lazy or select is not None or projection is not None:
+                if msg_type in self.t_nla_map:
+                    msg_name = self.t_nla_map[msg_type][1]
+                else:
+                    msg_name = 'UNKNOWN'
+            if (select is not None and msg_name not in select) or \
+                    (projection is not None and
+                     not projection(self, msg_name)):
+                # skip the NLA
+                pass
+            elif self.lazy:
+                self['attrs'].append(nla_slot(self, msg_name,
+                                              init, length, msg_type))
+            else:
+                self['attrs'].append(self.decode_nla(init, length,
+                                                     msg_type))
+
+            # fix the offset
+            init += self.msg_align(length)
             self.buf.seek(init)
-            length = min(max(length, 4),
-                         (self.length - self.buf.tell() + self.offset))
 
-            # we have a mapping for this NLA
-            if msg_type in self.t_nla_map:
-                # get the class
-                msg_class = self.t_nla_map[msg_type][0]
-                # is it a class or a function?
-                if isinstance(msg_class, types.MethodType):
-                    # if it is a function -- use it to get the class
-                    msg_class = msg_class(buf=self.buf, length=length)
-                # and the name
-                msg_name = self.t_nla_map[msg_type][1]
-                # is it an array?
-                msg_array = self.t_nla_map[msg_type][3]
-                # initstring
-                msg_init = self.t_nla_map[msg_type][4]
-                # decode NLA
+    def decode_nla(self, init, length, msg_type):
+        '''
+        Decode one NLA at the `init` offset of the buffer and
+        return the `[name, value]` pair.
+        '''
+        self.buf.seek(init)
+        # we have a mapping for this NLA
+        if msg_type in self.t_nla_map:
+            # get the class
+            msg_class = self.t_nla_map[msg_type][0]
+            # is it a class or a function?
+            if not isinstance(msg_class, type):
+                # if it is a function -- use it to get the class
+                msg_class = msg_class(self, buf=self.buf, length=length)
+            # and the name
+            msg_name = self.t_nla_map[msg_type][1]
+            # is it an array?
+            msg_array = self.t_nla_map[msg_type][3]
+            # initstring
+            msg_init = self.t_nla_map[msg_type][4]
+            # decode NLA; the class schema is compiled on the
+            # first instantiation, so a bad schema fails here too
+            try:
                 nla = msg_class(self.buf, length, self,
                                 debug=self.debug,
-                                init=msg_init)
+                                init=msg_init,
+                                lazy=self.lazy)
                 nla.nla_array = msg_array
-                try:
-                    nla.decode()
-                    nla.nla_flags = msg_type & (NLA_F_NESTED |
-                                                NLA_F_NET_BYTEORDER)
-                except Exception:
-                    logging.warning("decoding %s" % (msg_name))
-                    logging.warning(traceback.format_exc())
-                    self.buf.seek(init)
-                    msg_name = 'UNDECODED'
-                    msg_value = hexdump(self.buf.read(length))
-                else:
-                    msg_value = nla.getvalue()
-            else:
-                msg_name = 'UNKNOWN'
+                nla.decode()
+                nla.nla_flags = msg_type & (NLA_F_NESTED |
+                                            NLA_F_NET_BYTEORDER)
+            except Exception:
+                logging.warning("decoding %s" % (msg_name))
+                logging.warning(traceback.format_exc())
+                self.buf.seek(init)
+                msg_name = 'UNDECODED'
                 msg_value = hexdump(self.buf.read(length))
+            else:
+                msg_value = nla.getvalue()
+        else:
+            msg_name = 'UNKNOWN'
+            msg_value = hexdump(self.buf.read(length))
 
-            self['attrs'].append([msg_name, msg_value])
-
-            # fix the offset
-            self.buf.seek(init + self.msg_align(length))
+        return [msg_name, msg_value]
 
 
 class nla_header(nlmsg_base):
@@ -1585,3 +1979,103 @@ class ctrlmsg(genlmsg):
         nla_map = (('CTRL_ATTR_MCAST_GRP_UNSPEC', 'none'),
                    ('CTRL_ATTR_MCAST_GRP_NAME', 'asciiz'),
                    ('CTRL_ATTR_MCAST_GRP_ID', 'uint32'))
+
+
+def _match_field(key, value):
+    if isinstance(value, types.FunctionType):
+        def check(msg):
+            x = msg.get(key)
+            return x is not None and value(x)
+    else:
+        def check(msg):
+            return msg.get(key) == value
+    return check
+
+
+def _match_nla(nla, value):
+    if isinstance(value, types.FunctionType):
+        def check(msg):
+            x = msg.get_attr(nla)
+            return x is not None and value(x)
+    else:
+        def check(msg):
+            return msg.get_attr(nla) == value
+    return check
+
+
+def _match_any(key, nla, value):
+    # the key can be both the field and the NLA, like `table`
+    if isinstance(value, types.FunctionType):
+        def check(msg):
+            x = msg.get(key)
+            if x is None:
+                x = msg.get_attr(nla)
+            return x is not None and value(x)
+    else:
+        def check(msg):
+            return msg.get(key) == value or msg.get_attr(nla) == value
+    return check
+
+
+def compile_match(spec):
+    '''
+    Compile a match spec into a predicate `f(msg) -> bool`.
+
+    The spec is a function, that is returned as is, or a dict
+    like `{'index': 2, 'address': lambda x: x is not None}`.
+    A message matches, if for every key the field or the NLA
+    with the corresponding name (see `name2nla()`) is equal
+    to the value, or, if the value is a function, the function
+    returns True for it.
+
+    The predicate resolves keys into fields and NLA names once
+    per message class, checks fields first, and stops on the
+    first mismatch, so it is cheap to run on big dumps. Anything
+    else but a function or a dict matches nothing.
+    '''
+    if isinstance(spec, (types.FunctionType, types.MethodType)):
+        return spec
+    if not isinstance(spec, dict):
+        return lambda msg: False
+    spec = tuple(spec.items())
+    compiled = {}
+
+    def compile_class(msg):
+        fields = set([x[0] for x in getattr(msg, 'fields', ())])
+        nla_names = getattr(msg, 'r_nla_map', {})
+        field_checks = []
+        nla_checks = []
+        for (key, value) in spec:
+            nla = msg.name2nla(key)
+            function = isinstance(value, types.FunctionType)
+            if nla not in nla_names and key in fields:
+                # `None` never matches a field, but it matches
+                # the missing NLA with the same name
+                if value is not None or function:
+                    field_checks.append(_match_field(key, value))
+            elif nla in nla_names and key not in msg:
+                # the missing key matches `None` as well
+                if value is not None or function:
+                    nla_checks.append(_match_nla(nla, value))
+            else:
+                nla_checks.append(_match_any(key, nla, value))
+        checks = tuple(field_checks + nla_checks)
+        if not checks:
+            return lambda msg: True
+        if len(checks) == 1:
+            return checks[0]
+
+        def match(msg):
+            for check in checks:
+                if not check(msg):
+                    return False
+            return True
+        return match
+
+    def match(msg):
+        try:
+            check = compiled[msg.__class__]
+        except KeyError:
+            check = compiled[msg.__class__] = compile_class(msg)
+        return check(msg)
+    return match
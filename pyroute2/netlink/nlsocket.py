@@ -31,36 +31,87 @@ the socket buffer and one gets ENOBUF on `recv()`::
     error: [Errno 105] No buffer space available
 
 One way to avoid ENOBUF, is to use async I/O. Then the
-library not only reads and buffers all the messages, but
-also re-prioritizes threads. Suppressing the parser
-activity, the library increases the response delay, but
-spares CPU to read and enqueue arriving messages as
-fast, as it is possible.
-
-With logging level DEBUG you can notice messages, that
-the library started to calm down the parser thread::
-
-    DEBUG:root:Packet burst: the reader thread priority
-        is increased, beware of delays on netlink calls
-        Counters: delta=25 qsize=25 delay=0.1
-
-This state requires no immediate action, but just some
-more attention. When the delay between messages on the
-parser thread exceeds 1 second, DEBUG messages become
-WARNING ones::
-
-    WARNING:root:Packet burst: the reader thread priority
-        is increased, beware of delays on netlink calls
-        Counters: delta=2525 qsize=213536 delay=3
-
-This state means, that almost all the CPU resources are
-dedicated to the reader thread. It doesn't mean, that
-the reader thread consumes 100% CPU -- it means, that the
-CPU is reserved for the case of more intensive bursts. The
-library will return to the normal state only when the
-broadcast storm will be over, and then the CPU will be
-100% loaded with the parser for some time, when it will
-process all the messages queued so far.
+library starts a reader thread, that only reads the data
+from the socket and puts it into the `ReceiveQueue`, and
+the data is parsed by the consumer on `get()`.
+
+The queue is bounded, so a broadcast storm doesn't eat
+all the memory. When the queue is full, the reader thread
+acts according to the queue policy:
+
+    - 'block' -- wait for the consumer; the kernel socket
+      buffer then overflows as without async I/O
+    - 'drop' -- drop the oldest data in the queue
+    - 'signal' -- drop the new data, and raise ENOBUF on
+      the next `get()`, as the kernel does
+
+The queue can be set up before `bind()`::
+
+    ipr = IPRoute()
+    ipr.buffer_queue = ReceiveQueue(maxsize=65536, policy='drop')
+    ipr.bind(async=True)
+
+The queue counters `high`, `dropped` and `overflows` show
+how close the consumer is to lose the data.
+
+demultiplexer mode
+------------------
+
+With `NetlinkSocket.bind(demux=True)` the socket launches one
+reader thread, that receives and parses all the messages. Every
+request registers a `NetlinkFuture` for its `msg_seq`, and the
+reader thread completes the future, when the response is
+collected. So concurrent `nlm_request()` calls from several
+threads do not compete for the socket, and waiting threads do
+not poll the backlog::
+
+    ipr = IPRoute()
+    ipr.bind(groups=0, demux=True)
+    # now ipr can be safely used from many threads
+
+Broadcast messages, if any, go to the zero queue as usual,
+and `get()` returns them.
+
+receive buffers
+---------------
+
+`NetlinkSocket` receives data into a preallocated `bytearray`
+arena with `recv_into()`, and copies out only the received bytes,
+see `arena_recv()`. The async reader thread uses a `BufferPool`
+instead: buffers are returned to the pool, when the data is
+copied out by the consumer. The pool can be set up before
+`bind()`::
+
+    ipr = IPRoute()
+    ipr.buffer_pool = BufferPool(bufsize=1024 * 1024, size=16)
+    ipr.bind(async=True)
+
+When all the pool buffers are in the queue, the reader falls
+back to the arena.
+
+overflow handling
+-----------------
+
+The kernel reports the overflow only once, with ENOBUFS on the
+next `recv()`, and doesn't tell how many messages are lost. The
+socket counts overflows in `overflows`, and runs the optional
+`overflow_callback(socket, error)` before the error is raised,
+so the application can resync its state, see `IPDB.resync()`.
+
+The receive buffer size is set up with `set_rcvbuf()`; with
+`force=True` and CAP_NET_ADMIN it uses SO_RCVBUFFORCE, that
+ignores the `net.core.rmem_max` limit. The attributes set before
+`bind()` survive the socket recreation::
+
+    ipr = IPRoute()
+    ipr.rcvbuf = 32 * 1024 * 1024
+    ipr.rcvbuf_force = True
+    ipr.overflow_callback = lambda sock, error: resync()
+    ipr.bind()
+
+If the application doesn't care about lost broadcasts at all,
+`set_no_enobufs()` turns on NETLINK_NO_ENOBUFS: the kernel drops
+messages silently, and `recv()` never fails with ENOBUFS.
 
 when async I/O doesn't help
 ---------------------------
@@ -71,7 +122,7 @@ performance is not enough even to read and store the raw
 data from the socket. There is no workaround for such
 cases, except of using something *not* Python-based.
 
-One can still play around with SO_RCVBUF socket option,
+One can still play around with the receive buffer size,
 but it doesn't help much. So keep it in mind, and if you
 expect massive broadcast Netlink storms, perform stress
 testing prior to deploy a solution in the production.
@@ -82,11 +133,13 @@ classes
 
 import os
 import sys
+import errno
 import time
 import select
 import struct
 import logging
 import traceback
+import collections
 import threading
 
 from socket import AF_NETLINK
@@ -100,6 +153,7 @@ from pyroute2 import config
 from pyroute2.config import SocketBase
 from pyroute2.common import AddrPool
 from pyroute2.common import DEFAULT_RCVBUF
+from pyroute2.netlink import nlbuffer
 from pyroute2.netlink import nlmsg
 from pyroute2.netlink import mtypes
 from pyroute2.netlink import NetlinkError
@@ -111,11 +165,16 @@ from pyroute2.netlink import NETLINK_GENERIC
 from pyroute2.netlink import NLM_F_DUMP
 from pyroute2.netlink import NLM_F_MULTI
 from pyroute2.netlink import NLM_F_REQUEST
+from pyroute2.netlink import NLM_F_ACK
+from pyroute2.netlink import SOL_NETLINK
+from pyroute2.netlink import NETLINK_NO_ENOBUFS
+from pyroute2.netlink import NETLINK_GET_STRICT_CHK
 
 try:
-    from Queue import Queue
+    from socket import SO_RCVBUFFORCE
 except ImportError:
-    from queue import Queue
+    # Python 2 socket module lacks the constant
+    SO_RCVBUFFORCE = 33
 
 
 class Marshal(object):
@@ -125,6 +184,7 @@ class Marshal(object):
 
     msg_map = {}
     debug = False
+    lazy = False
 
     def __init__(self):
         self.lock = threading.Lock()
@@ -133,27 +193,67 @@ class Marshal(object):
         self.msg_map = self.msg_map or {}
         self.defragmentation = {}
 
-    def parse(self, data):
+    def parse(self, data, seq=None, projection=None, select=None):
         '''
         Parse string data.
 
         At this moment all transport, except of the native
         Netlink is deprecated in this library, so we should
         not support any defragmentation on that level
+
+        The optional `projection` limits the NLA to be decoded.
+        It can be:
+
+            - a set of NLA names, for all the messages
+            - a dict `{msg_class: set of NLA names}`; messages of
+                other classes are decoded completely
+            - a function `f(msg, name)`, that returns True for NLA
+                to be decoded
+
+        Other NLA are skipped by length, see `decode_nlas()`. If
+        `seq` is given, the projection applies only to messages
+        with this sequence number.
+
+        The optional `select` function is called as
+        `select(msg_type, msg_seq)` with the values from the
+        message header, before the message gets decoded. If it
+        returns False, the message is skipped by length.
         '''
         offset = 0
         result = []
+        if isinstance(projection, (list, tuple)):
+            projection = frozenset(projection)
+        # all the messages share one buffer, that refers the data
+        # without copying, see `nlbuffer`
+        buf = nlbuffer(data)
+        data = buf.data
         while offset < len(data):
             # pick type and length
-            (length, msg_type) = struct.unpack('IH', data[offset:offset+6])
+            (length, msg_type,
+             flags, msg_seq) = struct.unpack_from('IHHI', data, offset)
+            if select is not None and not select(msg_type, msg_seq):
+                if length < 16:
+                    break
+                offset += length
+                continue
             error = None
             if msg_type == NLMSG_ERROR:
-                code = abs(struct.unpack('i', data[offset+16:offset+20])[0])
+                code = abs(struct.unpack_from('i', data, offset + 16)[0])
                 if code > 0:
                     error = NetlinkError(code)
 
             msg_class = self.msg_map.get(msg_type, nlmsg)
-            msg = msg_class(data[offset:offset+length], debug=self.debug)
+            if projection is None or (seq is not None and seq != msg_seq):
+                names = None
+            elif isinstance(projection, dict):
+                names = projection.get(msg_class, None)
+            else:
+                names = projection
+            buf.seek(offset)
+            msg = msg_class(buf,
+                            debug=self.debug,
+                            lazy=self.lazy,
+                            projection=names)
 
             try:
                 msg.decode()
@@ -255,6 +355,204 @@ class LockFactory(object):
         del self.locks[key]
 
 
+class NetlinkFuture(object):
+    '''
+    Response collector for one `msg_seq` in the demultiplexer
+    mode. The reader thread feeds messages to the future with
+    `feed()` and a requester waits for the result with `result()`.
+
+    The termination rules are the same as in `NetlinkMixin.get()`:
+    NLMSG_DONE, an error, a message without NLM_F_MULTI or the
+    `terminate()` function.
+    '''
+
+    def __init__(self, terminate=None):
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.terminate = terminate
+        self.msgs = []
+        self.error = None
+
+    def done(self):
+        return self.event.is_set()
+
+    def complete(self):
+        '''
+        Mark the future as completed. Called with the `lock`
+        acquired.
+        '''
+        self.event.set()
+
+    def set_terminate(self, terminate):
+        '''
+        Set the `terminate()` function and apply it to the
+        messages, that are already collected.
+        '''
+        with self.lock:
+            self.terminate = terminate
+            if terminate is None or self.event.is_set():
+                return
+            for (idx, msg) in enumerate(self.msgs):
+                if terminate(msg):
+                    del self.msgs[idx:]
+                    self.complete()
+                    return
+
+    def feed(self, msg):
+        '''
+        Add a message to the response. Return False, if the
+        future is already completed and the message is not
+        accepted.
+        '''
+        with self.lock:
+            if self.event.is_set():
+                return False
+            if msg['header'].get('error', None) is not None:
+                self.error = msg['header']['error']
+                self.complete()
+            elif (msg['header']['type'] == NLMSG_DONE) or \
+                    (self.terminate is not None and self.terminate(msg)):
+                self.complete()
+            else:
+                self.msgs.append(msg)
+                if not msg['header']['flags'] & NLM_F_MULTI:
+                    self.complete()
+            return True
+
+    def fail(self, error):
+        '''
+        Complete the future with an exception.
+        '''
+        with self.lock:
+            if not self.event.is_set():
+                self.error = error
+                self.complete()
+
+    def result(self, timeout=None):
+        '''
+        Wait for the response and return the messages list.
+        Raise the error, if the response is an error. If the
+        timeout expires, return None.
+        '''
+        if not self.event.wait(timeout):
+            return None
+        if self.error is not None:
+            raise self.error
+        return self.msgs
+
+
+class BufferPool(object):
+    '''
+    Pool of receive buffers for the async reader thread. The
+    reader receives data into a buffer from the pool with
+    `recv_into()`, and the consumer returns the buffer, when
+    the data is copied out, so the reader allocates nothing in
+    the steady state.
+
+    Buffers are allocated on demand, and not more than `size`
+    buffers are kept in the pool. When the pool is empty,
+    `get()` returns None.
+    '''
+
+    def __init__(self, bufsize, size=4):
+        self.bufsize = bufsize
+        self.size = size
+        self.allocated = 0
+        self.buffers = collections.deque()
+
+    def get(self):
+        try:
+            return self.buffers.pop()
+        except IndexError:
+            if self.allocated < self.size:
+                self.allocated += 1
+                return bytearray(self.bufsize)
+            return None
+
+    def put(self, buf):
+        self.buffers.append(buf)
+
+
+class ReceiveQueue(object):
+    '''
+    Bounded FIFO between the async reader thread and the
+    consumer. When the queue is full, `put()` acts according
+    to the policy, see the module documentation. `put()`
+    returns the list of dropped items, so the reader can
+    recycle their buffers.
+
+    Counters:
+
+        - high -- the highest queue length so far
+        - dropped -- the number of dropped items
+        - overflows -- the number of times, the queue was full
+    '''
+
+    policies = ('block', 'drop', 'signal')
+
+    def __init__(self, maxsize=4096, policy='block'):
+        if policy not in self.policies:
+            raise ValueError('unknown queue policy %s' % policy)
+        self.maxsize = maxsize
+        self.policy = policy
+        self.queue = collections.deque()
+        self.cond = threading.Condition(threading.Lock())
+        self.error = None
+        self.closed = False
+        self.high = 0
+        self.dropped = 0
+        self.overflows = 0
+
+    def qsize(self):
+        return len(self.queue)
+
+    def put(self, item):
+        dropped = []
+        with self.cond:
+            if len(self.queue) >= self.maxsize > 0:
+                self.overflows += 1
+                if self.policy == 'block':
+                    while len(self.queue) >= self.maxsize and \
+                            not self.closed:
+                        self.cond.wait()
+                elif self.policy == 'drop':
+                    while len(self.queue) >= self.maxsize:
+                        dropped.append(self.queue.popleft())
+                else:
+                    if self.error is None:
+                        self.error = IOError(errno.ENOBUFS,
+                                             os.strerror(errno.ENOBUFS))
+                    dropped.append(item)
+            if self.closed:
+                dropped.append(item)
+            elif not dropped or self.policy == 'drop':
+                self.queue.append(item)
+                self.high = max(self.high, len(self.queue))
+            self.dropped += len(dropped)
+            self.cond.notify_all()
+        return dropped
+
+    def get(self):
+        with self.cond:
+            while not self.queue and self.error is None:
+                self.cond.wait()
+            if self.error is not None:
+                # report the overflow first, as the kernel does
+                (item, self.error) = (self.error, None)
+            else:
+                item = self.queue.popleft()
+            self.cond.notify_all()
+            return item
+
+    def close(self):
+        '''
+        Release the reader thread, if blocked.
+        '''
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
 class NetlinkMixin(object):
     '''
     Generic netlink socket
@@ -289,7 +587,10 @@ class NetlinkMixin(object):
         self.family = family
         self._fileno = fileno
         self.backlog = {0: []}
-        self.callbacks = []     # [(predicate, callback, args), ...]
+        self.callbacks = []     # [(predicate, callback, args, types), ...]
+        self.zero_queue = None  # message types for the zero queue
+        self.futures = {}       # {msg_seq: NetlinkFuture, ...}
+        self.demux = False
         self.clean_cbs = {}     # {msg_seq: [callback, ...], ...}
         self.pthread = None
         self.closed = False
@@ -298,13 +599,22 @@ class NetlinkMixin(object):
                              'create_dummy': True,
                              'provide_master': config.kernel[0] > 2}
         self.backlog_lock = threading.Lock()
+        self.backlog_event = threading.Condition(self.backlog_lock)
         self.read_lock = threading.Lock()
         self.change_master = threading.Event()
         self.lock = LockFactory()
         self._sock = None
         self._ctrl_read, self._ctrl_write = os.pipe()
-        self.buffer_queue = Queue()
-        self.qsize = 0
+        self.buffer_queue = ReceiveQueue()
+        self.buffer_pool = None
+        self.arena = None
+        self.arena_lock = threading.Lock()
+        self.rcvbuf = 1024 * 1024
+        self.rcvbuf_force = False
+        self.no_enobufs = False
+        self.strict_check = False
+        self.overflows = 0
+        self.overflow_callback = None
         self.log = []
         self.get_timeout = 30
         self.get_timeout_exception = None
@@ -343,7 +653,8 @@ class NetlinkMixin(object):
         self.close()
 
     def register_callback(self, callback,
-                          predicate=lambda x: True, args=None):
+                          predicate=lambda x: True, args=None,
+                          msg_types=None):
         '''
         Register a callback to run on a message arrival.
 
@@ -376,10 +687,14 @@ class NetlinkMixin(object):
         Please note: you do **not** need to register the default 0 queue
         to invoke callbacks on broadcast messages. Callbacks are
         iterated **before** messages get enqueued.
+
+        The optional `msg_types` is a set of message types, the
+        callback should be invoked for. Messages of other types
+        are not decoded for this callback, see `get()`.
         '''
         if args is None:
             args = []
-        self.callbacks.append((predicate, callback, args))
+        self.callbacks.append((predicate, callback, args, msg_types))
 
     def unregister_callback(self, callback):
         '''
@@ -465,12 +780,202 @@ class NetlinkMixin(object):
 
         return ret
 
+    def parse(self, data, msg_seq=0, projection=None):
+        '''
+        Parse the data, but decode only messages to be delivered,
+        see `dispatch()`. Return the list of decoded messages and
+        the list of sequence numbers of skipped ones, to run
+        cleanup callbacks for them.
+        '''
+        dropped = []
+
+        def select(msg_type, seq):
+            if self.dispatch(msg_type, seq) is not None or \
+                    self.subscribed(msg_type):
+                return True
+            dropped.append(seq)
+            return False
+
+        msgs = self.marshal.parse(data, msg_seq, projection, select)
+        return msgs, dropped
+
+    def deliver(self, msgs, dropped=()):
+        '''
+        Run callbacks and put parsed messages into the backlog,
+        or, in the demultiplexer mode, feed them to futures.
+        Cleanup callbacks are run also for `dropped` sequence
+        numbers. Should be called with the `backlog_lock` acquired.
+        '''
+        for seq in dropped:
+            self.clean(seq)
+        for msg in msgs:
+            seq = msg['header']['sequence_number']
+            mtype = msg['header']['type']
+            self.clean(seq)
+            # The backlog could be changed after the
+            # header dispatch, so route the message again
+            seq = self.dispatch(mtype, seq)
+            if seq is None and mtype == NLMSG_ERROR:
+                # Drop orphaned NLMSG_ERROR messages
+                continue
+            # 8<-----------------------------------------------
+            # Callbacks section
+            for cr in self.callbacks:
+                if cr[3] is not None and mtype not in cr[3]:
+                    continue
+                try:
+                    if cr[0](msg):
+                        cr[1](msg, *cr[2])
+                except:
+                    logging.warning("Callback fail: %s" % (cr))
+                    logging.warning(traceback.format_exc())
+            # 8<-----------------------------------------------
+            if seq is None:
+                continue
+            if seq in self.futures:
+                if self.futures[seq].feed(msg):
+                    continue
+                # the response is already complete, so the
+                # message is orphaned
+                if mtype == NLMSG_ERROR or \
+                        self.dispatch(mtype, 0) is None:
+                    continue
+                seq = 0
+            self.backlog[seq].append(msg)
+            if seq == 0:
+                self.backlog_event.notify_all()
+
+    def wait(self, msg_seq=0, terminate=None):
+        '''
+        `get()` for the demultiplexer mode: wait for the future,
+        registered for `msg_seq`, or, if `msg_seq` is 0, for
+        messages in the zero queue.
+        '''
+        if msg_seq == 0:
+            with self.backlog_event:
+                deadline = time.time() + self.get_timeout
+                while not self.backlog[0]:
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        break
+                    self.backlog_event.wait(timeout)
+                ret = self.backlog[0]
+                self.backlog[0] = []
+            if not ret and self.get_timeout_exception:
+                raise self.get_timeout_exception()
+            return ret
+
+        with self.backlog_lock:
+            if msg_seq not in self.futures:
+                self.futures[msg_seq] = NetlinkFuture()
+            future = self.futures[msg_seq]
+        future.set_terminate(terminate)
+        try:
+            ret = future.result(self.get_timeout)
+        finally:
+            with self.backlog_lock:
+                self.futures.pop(msg_seq, None)
+        if ret is None:
+            if self.get_timeout_exception:
+                raise self.get_timeout_exception()
+            with future.lock:
+                ret = list(future.msgs)
+        return ret
+
+    def clean(self, msg_seq):
+        '''
+        Run cleanup callbacks for the `msg_seq`, if any. Should
+        be called with the `backlog_lock` acquired.
+        '''
+        for cb in self.clean_cbs.pop(msg_seq, ()):
+            try:
+                cb()
+            except:
+                logging.warning("Cleanup callback"
+                                "fail: %s" % (cb))
+                logging.warning(traceback.format_exc())
+
+    def dispatch(self, msg_type, msg_seq):
+        '''
+        Header level dispatch: return the backlog key for a
+        message with given type and sequence number, or None
+        if nobody waits for the message.
+
+        Messages with unknown `msg_seq` go to the zero queue,
+        except of orphaned NLMSG_ERROR. The zero queue accepts
+        message types from the `zero_queue` set; if it is None
+        (default), the zero queue accepts any message. So, for
+        a monitoring socket one can use::
+
+            ipr.bind()
+            ipr.zero_queue = set((RTM_NEWLINK, RTM_DELLINK))
+            # other broadcast messages are dropped before
+            # decoding
+            ipr.get()
+        '''
+        if msg_seq != 0 and (msg_seq in self.backlog or
+                             msg_seq in self.futures):
+            return msg_seq
+        if msg_seq != 0 and msg_type == NLMSG_ERROR:
+            # drop orphaned NLMSG_ERROR messages
+            return None
+        if self.zero_queue is None or msg_type in self.zero_queue:
+            return 0
+        return None
+
+    def subscribed(self, msg_type):
+        '''
+        Return True if any registered callback accepts the
+        message type.
+        '''
+        for cr in self.callbacks:
+            if cr[3] is None or msg_type in cr[3]:
+                return True
+        return False
+
     def sendto(self, *argv, **kwarg):
         return self._sendto(*argv, **kwarg)
 
     def recv(self, *argv, **kwarg):
         return self._recv(*argv, **kwarg)
 
+    def overflow(self, error):
+        '''
+        Count the receive buffer overflow and run the
+        `overflow_callback`, if any. The callback runs in the
+        thread, that reads the socket, so with async I/O or in
+        the demux mode it must not make netlink requests on the
+        same socket.
+        '''
+        self.overflows += 1
+        if self.overflow_callback is not None:
+            try:
+                self.overflow_callback(self, error)
+            except Exception:
+                logging.error('overflow callback error')
+                logging.error(traceback.format_exc())
+
+    def arena_recv(self, bufsize, flags=0):
+        '''
+        `recv()` through the receive arena: a bytearray, that is
+        allocated once and reused by all the calls. The data is
+        received with `recv_into()`, and only the received bytes
+        are copied out, so one doesn't allocate `bufsize` bytes
+        for every datagram.
+
+        The arena grows up to the biggest `bufsize` requested.
+        '''
+        with self.arena_lock:
+            if self.arena is None or len(self.arena) < bufsize:
+                self.arena = bytearray(bufsize)
+            try:
+                nbytes = self._sock.recv_into(self.arena, bufsize, flags)
+            except (IOError, OSError) as e:
+                if e.errno == errno.ENOBUFS:
+                    self.overflow(e)
+                raise
+            return memoryview(self.arena)[:nbytes].tobytes()
+
     def async_recv(self):
         poll = select.poll()
         poll.register(self._sock, select.POLLIN | select.POLLPRI)
@@ -480,13 +985,54 @@ class NetlinkMixin(object):
             events = poll.poll()
             for (fd, event) in events:
                 if fd == sockfd:
+                    buf = self.buffer_pool.get()
                     try:
-                        self.buffer_queue.put(self._sock.recv(1024 * 1024))
+                        if buf is None:
+                            # the pool is exhausted by a burst
+                            data = self.arena_recv(self.buffer_pool.bufsize)
+                        else:
+                            data = (buf, self._sock.recv_into(buf))
                     except Exception as e:
-                        self.buffer_queue.put(e)
+                        if buf is not None:
+                            self.buffer_pool.put(buf)
+                            # arena_recv() counts overflows itself
+                            if getattr(e, 'errno', None) == errno.ENOBUFS:
+                                self.overflow(e)
+                        data = e
+                    for item in self.buffer_queue.put(data):
+                        if isinstance(item, tuple):
+                            self.buffer_pool.put(item[0])
                 else:
                     return
 
+    def demux_recv(self):
+        '''
+        The reader thread of the demultiplexer mode: receive and
+        parse messages, complete futures and fill the zero queue.
+        '''
+        poll = select.poll()
+        poll.register(self._sock, select.POLLIN | select.POLLPRI)
+        poll.register(self._ctrl_read, select.POLLIN | select.POLLPRI)
+        sockfd = self._sock.fileno()
+        while True:
+            events = poll.poll()
+            for (fd, event) in events:
+                if fd != sockfd:
+                    return
+                try:
+                    data = self.recv(1024 * 1024)
+                except Exception as e:
+                    # fail all the pending requests
+                    with self.backlog_lock:
+                        for future in tuple(self.futures.values()):
+                            future.fail(e)
+                    if event & select.POLLNVAL:
+                        return
+                    continue
+                msgs, dropped = self.parse(data)
+                with self.backlog_lock:
+                    self.deliver(msgs, dropped)
+
     def put(self, msg, msg_type,
             msg_flags=NLM_F_REQUEST,
             addr=(0, 0),
@@ -519,7 +1065,10 @@ class NetlinkMixin(object):
         if msg_seq != 0:
             self.lock[msg_seq].acquire()
         try:
-            if msg_seq not in self.backlog:
+            if self.demux:
+                if msg_seq != 0 and msg_seq not in self.futures:
+                    self.futures[msg_seq] = NetlinkFuture()
+            elif msg_seq not in self.backlog:
                 self.backlog[msg_seq] = []
             if not isinstance(msg, nlmsg):
                 msg_class = self.marshal.msg_map[msg_type]
@@ -541,12 +1090,18 @@ class NetlinkMixin(object):
             if msg_seq != 0:
                 self.lock[msg_seq].release()
 
-    def get(self, bufsize=DEFAULT_RCVBUF, msg_seq=0, terminate=None):
+    def get(self, bufsize=DEFAULT_RCVBUF, msg_seq=0, terminate=None,
+            projection=None):
         '''
         Get parsed messages list. If `msg_seq` is given, return
         only messages with that `msg['header']['sequence_number']`,
         saving all other messages into `self.backlog`.
 
+        The `projection` limits the NLA to be decoded in the
+        messages with `msg_seq`, see `Marshal.parse()`. It is
+        a hint only: messages, received by other threads, are
+        decoded completely.
+
         The routine is thread-safe.
 
         The `bufsize` parameter can be:
@@ -555,6 +1110,61 @@ class NetlinkMixin(object):
                 the network data
             - 0: bufsize will be calculated from SO_RCVBUF sockopt
             - int >= 0: just a bufsize
+
+        In the demultiplexer mode the messages are received by
+        the reader thread, and `get()` just waits for them, see
+        `wait()`; the `projection` is ignored in this mode.
+        '''
+        if self.demux:
+            return self.wait(msg_seq, terminate)
+
+        ret = []
+        for chunk in self.get_chunks(bufsize, msg_seq,
+                                     terminate, projection):
+            ret.extend(chunk)
+        return ret
+
+    def get_iter(self, bufsize=DEFAULT_RCVBUF, msg_seq=0, terminate=None,
+                 projection=None):
+        '''
+        Generator version of `get()`: yield messages as soon, as
+        every received buffer is parsed, not collecting the whole
+        response. So the memory footprint doesn't depend on the
+        dump size.
+
+        If the generator is closed before the response end,
+        the rest of the response is read and dropped.
+
+        In the demultiplexer mode the messages are yielded when
+        the response is complete.
+        '''
+        if self.demux:
+            for msg in self.wait(msg_seq, terminate):
+                yield msg
+            return
+
+        chunks = self.get_chunks(bufsize, msg_seq, terminate, projection)
+        try:
+            for chunk in chunks:
+                for msg in chunk:
+                    yield msg
+        except GeneratorExit:
+            if msg_seq != 0:
+                # drop the rest of the response, so it will not
+                # go to the zero queue
+                try:
+                    for chunk in chunks:
+                        pass
+                except Exception:
+                    pass
+            raise
+
+    def get_chunks(self, bufsize=DEFAULT_RCVBUF, msg_seq=0, terminate=None,
+                   projection=None):
+        '''
+        The `get()` loop: yield lists of messages, one list for
+        every received buffer. The arguments are the same as for
+        `get()`; the demultiplexer mode is not supported.
         '''
         ctime = time.time()
 
@@ -642,6 +1252,9 @@ class NetlinkMixin(object):
 
                     # Next iteration
                     self.backlog_lock.release()
+                    if ret:
+                        yield ret
+                        ret = []
                 else:
                     # Stage 1. END
                     #
@@ -665,7 +1278,7 @@ class NetlinkMixin(object):
                         if self.get_timeout_exception:
                             raise self.get_timeout_exception()
                         else:
-                            return ret
+                            break
                     #
                     if self.read_lock.acquire(False):
                         self.change_master.clear()
@@ -674,58 +1287,23 @@ class NetlinkMixin(object):
                         #
                         # This is a time consuming process, so all the
                         # locks, except the read lock must be released
-                        data = self.recv(bufsize)
+                        try:
+                            data = self.recv(bufsize)
+                        except (IOError, OSError):
+                            # ENOBUFS and other socket errors:
+                            # let other threads read the socket
+                            self.change_master.set()
+                            self.read_lock.release()
+                            raise
                         # Parse data
-                        msgs = self.marshal.parse(data)
+                        msgs, dropped = self.parse(data, msg_seq, projection)
                         # Reset ctime -- timeout should be measured
                         # for every turn separately
                         ctime = time.time()
-                        #
-                        current = self.buffer_queue.qsize()
-                        delta = current - self.qsize
-                        if delta > 10:
-                            delay = min(3, max(0.1, float(current) / 60000))
-                            message = ("Packet burst: the reader thread "
-                                       "priority is increased, beware of "
-                                       "delays on netlink calls\n\tCounters: "
-                                       "delta=%s qsize=%s delay=%s "
-                                       % (delta, current, delay))
-                            if delay < 1:
-                                logging.debug(message)
-                            else:
-                                logging.warning(message)
-                            time.sleep(delay)
-                        self.qsize = current
 
                         # We've got the data, lock the backlog again
                         self.backlog_lock.acquire()
-                        for msg in msgs:
-                            seq = msg['header']['sequence_number']
-                            if seq in self.clean_cbs:
-                                for cb in self.clean_cbs[seq]:
-                                    try:
-                                        cb()
-                                    except:
-                                        logging.warning("Cleanup callback"
-                                                        "fail: %s" % (cb))
-                                        logging.warning(traceback.format_exc())
-                                del self.clean_cbs[seq]
-                            if seq not in self.backlog:
-                                if msg['header']['type'] == NLMSG_ERROR:
-                                    # Drop orphaned NLMSG_ERROR messages
-                                    continue
-                                seq = 0
-                            # 8<-----------------------------------------------
-                            # Callbacks section
-                            for cr in self.callbacks:
-                                try:
-                                    if cr[0](msg):
-                                        cr[1](msg, *cr[2])
-                                except:
-                                    logging.warning("Callback fail: %s" % (cr))
-                                    logging.warning(traceback.format_exc())
-                            # 8<-----------------------------------------------
-                            self.backlog[seq].append(msg)
+                        self.deliver(msgs, dropped)
                         # We finished with the backlog, so release the lock
                         self.backlog_lock.release()
 
@@ -745,13 +1323,15 @@ class NetlinkMixin(object):
                     #
                     # 8<-------------------------------------------------------
 
-            return ret
+            if ret:
+                yield ret
 
     def nlm_request(self, msg, msg_type,
                     msg_flags=NLM_F_REQUEST | NLM_F_DUMP,
                     terminate=None,
                     exception_catch=Exception,
-                    exception_handler=None):
+                    exception_handler=None,
+                    projection=None):
 
         def do_try():
             msg_seq = self.addr_pool.alloc()
@@ -759,7 +1339,9 @@ class NetlinkMixin(object):
                 try:
                     msg.reset()
                     self.put(msg, msg_type, msg_flags, msg_seq=msg_seq)
-                    ret = self.get(msg_seq=msg_seq, terminate=terminate)
+                    ret = self.get(msg_seq=msg_seq,
+                                   terminate=terminate,
+                                   projection=projection)
                     return ret
                 except Exception:
                     raise
@@ -788,6 +1370,102 @@ class NetlinkMixin(object):
             except Exception:
                 raise
 
+    def nlm_request_iter(self, msg, msg_type,
+                         msg_flags=NLM_F_REQUEST | NLM_F_DUMP,
+                         terminate=None,
+                         projection=None):
+        '''
+        Generator version of `nlm_request()`: send the request
+        and yield the response messages, as they are received,
+        see `get_iter()`. The request is sent when the first
+        message is requested::
+
+            for msg in ipr.nlm_request_iter(rtmsg(), RTM_GETROUTE):
+                ...
+        '''
+        msg_seq = self.addr_pool.alloc()
+        try:
+            with self.lock[msg_seq]:
+                msg.reset()
+                self.put(msg, msg_type, msg_flags, msg_seq=msg_seq)
+                msgs = self.get_iter(msg_seq=msg_seq,
+                                     terminate=terminate,
+                                     projection=projection)
+                try:
+                    for ret in msgs:
+                        yield ret
+                finally:
+                    # drop the rest of the response, if any, before
+                    # the msg_seq gets released
+                    msgs.close()
+        finally:
+            # see nlm_request() on the ban
+            self.addr_pool.free(msg_seq, ban=0xff)
+
+    def nlm_request_batch(self, msgs, msg_flags=NLM_F_REQUEST | NLM_F_ACK,
+                          window=256):
+        '''
+        Pipelined requests. Send messages back-to-back, not waiting
+        for the responses, and then collect the responses. Return
+        the list of results in the order of requests: for every
+        request -- the list of response messages, or the
+        `NetlinkError` exception instance, if the request failed.
+        Other exceptions are raised as is.
+
+        `msgs` is an iterable of `(msg, msg_type)` or
+        `(msg, msg_type, msg_flags)` tuples; `msg` can be a
+        message instance or a dictionary, as for `put()`. Every
+        request must have a response, so the default `msg_flags`
+        include `NLM_F_ACK`.
+
+        Not more than `window` requests are sent without a response,
+        so responses do not overflow the socket receive buffer.
+
+        Example::
+
+            ipr = IPRoute()
+            ret = ipr.nlm_request_batch([({'index': 1}, RTM_GETLINK),
+                                         ({'index': 2}, RTM_GETLINK)])
+
+        To build messages with `IPRouteMixin` methods, use `IPBatch`.
+        '''
+        ret = []
+        pending = collections.deque()
+
+        def collect():
+            msg_seq = pending[0]
+            try:
+                ret.append(self.get(msg_seq=msg_seq))
+            except NetlinkError as e:
+                ret.append(e)
+            pending.popleft()
+            # see nlm_request() on the ban
+            self.addr_pool.free(msg_seq, ban=0xff)
+
+        try:
+            for request in msgs:
+                msg, msg_type = request[:2]
+                flags = request[2] if len(request) > 2 else msg_flags
+                if isinstance(msg, nlmsg):
+                    msg.reset()
+                msg_seq = self.addr_pool.alloc()
+                pending.append(msg_seq)
+                self.put(msg, msg_type, flags, msg_seq=msg_seq)
+                if len(pending) >= window:
+                    collect()
+            while pending:
+                collect()
+        finally:
+            # cleanup requests, that are not collected
+            # because of an exception
+            with self.backlog_lock:
+                for msg_seq in pending:
+                    self.backlog.pop(msg_seq, None)
+                    self.futures.pop(msg_seq, None)
+            for msg_seq in pending:
+                self.addr_pool.free(msg_seq, ban=0xff)
+        return ret
+
 
 class NetlinkSocket(NetlinkMixin):
 
@@ -807,12 +1485,65 @@ class NetlinkSocket(NetlinkMixin):
                 setattr(self, name, getattr(self._sock, name))
 
             self._sendto = getattr(self._sock, 'sendto')
-            self._recv = getattr(self._sock, 'recv')
+            self._recv = self.arena_recv
 
             self.setsockopt(SOL_SOCKET, SO_SNDBUF, 32768)
-            self.setsockopt(SOL_SOCKET, SO_RCVBUF, 1024 * 1024)
+            self.set_rcvbuf(self.rcvbuf, self.rcvbuf_force)
+            if self.no_enobufs:
+                self.set_no_enobufs()
+            if self.strict_check:
+                self.set_strict_check()
+
+    def set_rcvbuf(self, size, force=False):
+        '''
+        Set the socket receive buffer size. With `force=True`
+        try SO_RCVBUFFORCE, that requires CAP_NET_ADMIN, and
+        fall back to SO_RCVBUF, that is limited by the
+        `net.core.rmem_max` sysctl.
+
+        The size is saved and applied also when the socket
+        is recreated.
+        '''
+        self.rcvbuf = size
+        self.rcvbuf_force = force
+        if force:
+            try:
+                self.setsockopt(SOL_SOCKET, SO_RCVBUFFORCE, size)
+                return
+            except (IOError, OSError) as e:
+                if e.errno != errno.EPERM:
+                    raise
+        self.setsockopt(SOL_SOCKET, SO_RCVBUF, size)
+
+    def set_no_enobufs(self, value=True):
+        '''
+        Turn on (or off) NETLINK_NO_ENOBUFS: on overflow the
+        kernel drops messages silently, and `recv()` doesn't
+        fail with ENOBUFS.
+        '''
+        self.no_enobufs = bool(value)
+        self.setsockopt(SOL_NETLINK, NETLINK_NO_ENOBUFS, int(value))
 
-    def bind(self, groups=0, pid=None, async=False):
+    def set_strict_check(self, value=True):
+        '''
+        Turn on (or off) NETLINK_GET_STRICT_CHK: the kernel
+        validates get and dump requests, and applies the filters
+        from the dump request header and NLA. Kernels < 4.20 don't
+        support it.
+
+        Returns the resulting state, that is saved also as
+        `strict_check`.
+        '''
+        try:
+            self.setsockopt(SOL_NETLINK, NETLINK_GET_STRICT_CHK, int(value))
+            self.strict_check = bool(value)
+        except (IOError, OSError) as e:
+            if e.errno != errno.ENOPROTOOPT:
+                raise
+            self.strict_check = False
+        return self.strict_check
+
+    def bind(self, groups=0, pid=None, async=False, demux=False):
         '''
         Bind the socket to given multicast groups, using
         given pid.
@@ -820,6 +1551,10 @@ class NetlinkSocket(NetlinkMixin):
             - If pid is None, use automatic port allocation
             - If pid == 0, use process' pid
             - If pid == <int>, use the value instead of pid
+
+        With `async=True` start the async reader thread, with
+        `demux=True` -- the demultiplexer reader thread, see the
+        module documentation.
         '''
         if pid is not None:
             self.port = 0
@@ -845,13 +1580,26 @@ class NetlinkSocket(NetlinkMixin):
             else:
                 raise KeyError('no free address available')
         # all is OK till now, so start async recv, if we need
-        if async:
+        if demux:
+            self.demux = True
+            self.pthread = threading.Thread(target=self.demux_recv)
+            self.pthread.setDaemon(True)
+            self.pthread.start()
+        elif async:
+            if self.buffer_pool is None:
+                self.buffer_pool = BufferPool(1024 * 1024)
+
             def recv_plugin(*argv, **kwarg):
                 data = self.buffer_queue.get()
                 if isinstance(data, Exception):
                     raise data
-                else:
-                    return data
+                elif isinstance(data, tuple):
+                    # copy the data out and return the buffer
+                    # to the pool
+                    (buf, nbytes) = data
+                    data = memoryview(buf)[:nbytes].tobytes()
+                    self.buffer_pool.put(buf)
+                return data
             self._recv = recv_plugin
             self.pthread = threading.Thread(target=self.async_recv)
             self.pthread.setDaemon(True)
@@ -868,6 +1616,7 @@ class NetlinkSocket(NetlinkMixin):
 
         if self.pthread:
             os.write(self._ctrl_write, b'exit')
+            self.buffer_queue.close()
             self.pthread.join()
         super(NetlinkSocket, self).close()
 
@@ -94,6 +94,8 @@ RTM_GETANYCAST = 62
 RTM_NEWNEIGHTBL = 64
 RTM_GETNEIGHTBL = 66
 RTM_SETNEIGHTBL = 67
+RTM_NEWSTATS = 92
+RTM_GETSTATS = 94
 # custom message types
 RTM_GETBRIDGE = 88
 RTM_SETBRIDGE = 89
@@ -104,6 +106,12 @@ RTM_SETBOND = 91
 TC_H_INGRESS = 0xfffffff1
 TC_H_ROOT = 0xffffffff
 
+# IFLA_EXT_MASK filters
+RTEXT_FILTER_VF = 1 << 0
+RTEXT_FILTER_BRVLAN = 1 << 1
+RTEXT_FILTER_BRVLAN_COMPRESSED = 1 << 2
+RTEXT_FILTER_SKIP_STATS = 1 << 3
+
 
 RTNL_GROUPS = RTNLGRP_IPV4_IFADDR |\
     RTNLGRP_IPV6_IFADDR |\
@@ -0,0 +1,64 @@
+from pyroute2.netlink import nlmsg
+from pyroute2.netlink import nla
+from pyroute2.netlink.rtnl.ifinfmsg import stats_names
+
+# filter_mask bits: 1 << (IFLA_STATS_* - 1)
+IFLA_STATS_FILTER_LINK_64 = 1 << 0
+IFLA_STATS_FILTER_LINK_XSTATS = 1 << 1
+IFLA_STATS_FILTER_LINK_XSTATS_SLAVE = 1 << 2
+IFLA_STATS_FILTER_LINK_OFFLOAD_XSTATS = 1 << 3
+IFLA_STATS_FILTER_AF_SPEC = 1 << 4
+
+mpls_stats_names = ('rx_packets',
+                    'tx_packets',
+                    'rx_bytes',
+                    'tx_bytes',
+                    'rx_errors',
+                    'tx_errors',
+                    'rx_dropped',
+                    'tx_dropped',
+                    'rx_noroute')
+
+
+class ifstatsmsg(nlmsg):
+    '''
+    Interface statistics message, RTM_NEWSTATS / RTM_GETSTATS
+
+    C structure::
+
+        struct if_stats_msg {
+            __u8  family;
+            __u8  pad1;
+            __u16 pad2;
+            __u32 ifindex;
+            __u32 filter_mask;
+        };
+
+    The `filter_mask` selects NLA to be sent by the kernel,
+    see `IFLA_STATS_FILTER_*` constants.
+    '''
+    fields = (('family', 'B'),
+              ('pad1', 'B'),
+              ('pad2', 'H'),
+              ('ifindex', 'I'),
+              ('filter_mask', 'I'))
+
+    nla_map = (('IFLA_STATS_UNSPEC', 'none'),
+               ('IFLA_STATS_LINK_64', 'ifstats64'),
+               ('IFLA_STATS_LINK_XSTATS', 'hex'),
+               ('IFLA_STATS_LINK_XSTATS_SLAVE', 'hex'),
+               ('IFLA_STATS_LINK_OFFLOAD_XSTATS', 'hex'),
+               ('IFLA_STATS_AF_SPEC', 'af_spec'))
+
+    class ifstats64(nla):
+        fields = [(i, 'Q') for i in stats_names]
+
+    class af_spec(nla):
+        nla_map = ((28, 'AF_MPLS', 'mpls'), )
+
+        class mpls(nla):
+            nla_map = ((0, 'MPLS_STATS_UNSPEC', 'none'),
+                       (1, 'MPLS_STATS_LINK', 'link'))
+
+            class link(nla):
+                fields = [(i, 'Q') for i in mpls_stats_names]
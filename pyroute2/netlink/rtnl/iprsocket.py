@@ -17,6 +17,7 @@ from pyroute2.netlink.rtnl.ifinfmsg import proxy_setlink
 from pyroute2.netlink.rtnl.ifinfmsg import proxy_dellink
 from pyroute2.netlink.rtnl.ifinfmsg import proxy_linkinfo
 from pyroute2.netlink.rtnl.ifaddrmsg import ifaddrmsg
+from pyroute2.netlink.rtnl.ifstatsmsg import ifstatsmsg
 
 
 class MarshalRtnl(Marshal):
@@ -47,7 +48,9 @@ class MarshalRtnl(Marshal):
                rtnl.RTM_GETTFILTER: tcmsg,
                rtnl.RTM_NEWNEIGHTBL: ndtmsg,
                rtnl.RTM_GETNEIGHTBL: ndtmsg,
-               rtnl.RTM_SETNEIGHTBL: ndtmsg}
+               rtnl.RTM_SETNEIGHTBL: ndtmsg,
+               rtnl.RTM_NEWSTATS: ifstatsmsg,
+               rtnl.RTM_GETSTATS: ifstatsmsg}
 
     def fix_message(self, msg):
         # FIXME: pls do something with it
@@ -59,9 +62,14 @@ class MarshalRtnl(Marshal):
 
 class IPRSocketMixin(object):
 
-    def __init__(self, fileno=None):
+    def __init__(self, fileno=None, strict_check=False):
         super(IPRSocketMixin, self).__init__(NETLINK_ROUTE, fileno=fileno)
         self.marshal = MarshalRtnl()
+        # let the kernel filter dumps, see IPRouteMixin.get_routes();
+        # opt-in, since the kernel treats any non-zero header
+        # field of a dump request as a filter
+        if strict_check:
+            self.set_strict_check()
         self._s_channel = None
         send_ns = Namespace(self, {'addr_pool': AddrPool(0x10000, 0x1ffff),
                                    'monitor': False})
@@ -74,8 +82,8 @@ class IPRSocketMixin(object):
         self._rproxy = NetlinkProxy(policy='forward', nl=recv_ns)
         self._rproxy.pmap = {rtnl.RTM_NEWLINK: proxy_linkinfo}
 
-    def bind(self, groups=rtnl.RTNL_GROUPS, async=False):
-        super(IPRSocketMixin, self).bind(groups, async=async)
+    def bind(self, groups=rtnl.RTNL_GROUPS, async=False, demux=False):
+        super(IPRSocketMixin, self).bind(groups, async=async, demux=demux)
 
     ##
     # proxy-ng protocol
@@ -90,6 +98,10 @@ class IPRSocketMixin(object):
                     return self._s_channel.send(ret['data'])
                 else:
                     msgs = self.marshal.parse(ret['data'])
+                    if self.demux:
+                        with self.backlog_lock:
+                            self.deliver(msgs)
+                        return len(ret['data'])
                     for msg in msgs:
                         seq = msg['header']['sequence_number']
                         if seq in self.backlog:
@@ -177,8 +189,8 @@ class RawIPRSocketMixin(object):
         super(RawIPRSocketMixin, self).__init__(NETLINK_ROUTE, fileno=fileno)
         self.marshal = MarshalRtnl()
 
-    def bind(self, groups=rtnl.RTNL_GROUPS, async=False):
-        super(RawIPRSocketMixin, self).bind(groups, async=async)
+    def bind(self, groups=rtnl.RTNL_GROUPS, async=False, demux=False):
+        super(RawIPRSocketMixin, self).bind(groups, async=async, demux=demux)
 
 
 class RawIPRSocket(RawIPRSocketMixin, NetlinkSocket):
@@ -0,0 +1,41 @@
+'''
+AddrPool benchmark: sequence number allocation rate, as it is
+used by `nlm_request()`: every freed number is banned for 0xff
+allocations. Measured with 1 number in flight, like sequential
+requests, and with many numbers in flight, like pipelined or
+async requests.
+
+Usage::
+
+    $ cd tests
+    $ PYTHONPATH=.. python benchmark/bench_addrpool.py [count]
+'''
+import sys
+import time
+import collections
+from pyroute2.common import AddrPool
+
+
+def bench(count, inflight):
+    pool = AddrPool(minaddr=0x000000ff, maxaddr=0x0000ffff)
+    queue = collections.deque()
+    t0 = time.time()
+    for _ in range(count):
+        queue.append(pool.alloc())
+        if len(queue) >= inflight:
+            pool.free(queue.popleft(), ban=0xff)
+    return time.time() - t0
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    for inflight in (1, 256, 32768):
+        elapsed = bench(count, inflight)
+        print('in flight %6i: %8i alloc/free %8.3f s %10.1f ops/s, '
+              '%6.2f usec/op' %
+              (inflight, count, elapsed, count / elapsed,
+               elapsed * 1000000 / count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+'''
+NLA lookup benchmark: parse the ifinfmsg dump sample from
+`tests/data` and look up several NLA per message, as IPDB
+does when it loads an interface.
+
+Usage::
+
+    $ cd tests
+    $ PYTHONPATH=.. python benchmark/bench_attrs.py [count [repeat]]
+
+The best result of `repeat` runs is reported.
+'''
+import os
+import sys
+import time
+from pyroute2.common import load_dump
+from pyroute2.netlink.rtnl.iprsocket import MarshalRtnl
+
+data = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                    '..', 'data')
+attrs = ('IFLA_IFNAME', 'IFLA_MTU', 'IFLA_ADDRESS', 'IFLA_BROADCAST',
+         'IFLA_OPERSTATE', 'IFLA_MASTER', 'IFLA_LINK', 'IFLA_LINKINFO',
+         'IFLA_QDISC', 'IFLA_TXQLEN', 'IFLA_GROUP', 'IFLA_PROMISCUITY')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    with open(os.path.join(data, 'ifinfmsg_dump'), 'r') as f:
+        sample = load_dump(f)
+    n = len(MarshalRtnl().parse(sample))
+    msgs = MarshalRtnl().parse(sample * max(1, count // n))
+    elapsed = None
+    for _ in range(repeat):
+        t0 = time.time()
+        for msg in msgs:
+            for attr in attrs:
+                msg.get_attr(attr)
+        t1 = time.time()
+        if elapsed is None or elapsed > t1 - t0:
+            elapsed = t1 - t0
+    lookups = len(msgs) * len(attrs)
+    print('%8i lookups %8.3f s %10.1f lookups/s' %
+          (lookups, elapsed, lookups / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+'''
+Batch benchmark: install routes one by one with `route()`, and
+pipelined with `nlm_request_batch()`, and report routes per second.
+
+The routes are installed into a separate routing table via `lo`,
+and the table is flushed after every run with `ip route flush`.
+
+Requires root permissions.
+
+Usage::
+
+    $ cd tests
+    $ sudo PYTHONPATH=.. python benchmark/bench_batch.py [count] [table]
+'''
+import sys
+import time
+import subprocess
+from pyroute2 import IPRoute
+from pyroute2 import IPBatch
+from pyroute2 import NetlinkError
+
+
+def routes(count, table):
+    for i in range(count):
+        yield {'dst': '10.%i.%i.0' % (i // 256 % 256, i % 256),
+               'mask': 24,
+               'oif': 1,
+               'table': table}
+
+
+def flush(table):
+    subprocess.check_call(['ip', 'route', 'flush', 'table', str(table)])
+
+
+def bench_single(ipr, count, table):
+    t0 = time.time()
+    for route in routes(count, table):
+        ipr.route('add', **route)
+    return time.time() - t0, 0
+
+
+def bench_batch(ipr, count, table):
+    t0 = time.time()
+    batch = IPBatch()
+    for route in routes(count, table):
+        batch.route('add', **route)
+    ret = ipr.nlm_request_batch(batch.requests)
+    errors = len([x for x in ret if isinstance(x, NetlinkError)])
+    return time.time() - t0, errors
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    table = int(sys.argv[2]) if len(sys.argv) > 2 else 242
+    ipr = IPRoute()
+    try:
+        for name, func in (('single', bench_single),
+                           ('batch', bench_batch)):
+            flush(table)
+            elapsed, errors = func(ipr, count, table)
+            print('%-8s %8i routes %8.3f s %10.1f routes/s, %i errors' %
+                  (name, count, elapsed, count / elapsed, errors))
+    finally:
+        flush(table)
+        ipr.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+'''
+IPDB post-callbacks dispatch cost for a burst of events: a
+thread per callback per event, as IPDB used to do, vs. the
+`CallbackPool`. Callbacks do nothing, so only the dispatch
+overhead is measured.
+
+Usage::
+
+    $ cd tests
+    $ PYTHONPATH=.. python benchmark/bench_callbacks.py [events]
+'''
+import sys
+import time
+import threading
+from pyroute2.ipdb.callbacks import CallbackPool
+
+CALLBACKS = 3
+
+
+def callback(ipdb, msg, action):
+    pass
+
+
+def bench_threads(events):
+    t0 = time.time()
+    threads = set()
+    for i in range(events):
+        for cb in range(CALLBACKS):
+            t = threading.Thread(target=callback,
+                                 args=(None, i, 'RTM_NEWNEIGH'))
+            t.start()
+            threads.add(t)
+        # occasionally join threads, like IPDB did
+        for t in tuple(threads):
+            t.join(0)
+            if not t.is_alive():
+                threads.remove(t)
+    for t in threads:
+        t.join()
+    return time.time() - t0
+
+
+def bench_pool(events):
+    pool = CallbackPool()
+    t0 = time.time()
+    for i in range(events):
+        for cb in range(CALLBACKS):
+            pool.submit(cb, callback, (None, i, 'RTM_NEWNEIGH'))
+    pool.join()
+    ret = time.time() - t0
+    pool.stop()
+    return ret
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    for (name, func) in (('threads', bench_threads),
+                         ('pool', bench_pool)):
+        elapsed = func(events)
+        print('%-8s %8i events  %8.3f s %10.1f events/s' %
+              (name, events, elapsed, events / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+'''
+Dump memory benchmark: install routes into a separate routing
+table, dump them with `get_routes()` and `get_routes_iter()`, and
+report the dump rate and the peak memory, traced during the dump.
+
+The routes are installed via `lo` with `nlm_request_batch()`, and
+the table is flushed with `ip route flush` in the end.
+
+Requires root permissions and Python >= 3.4, since it uses
+`tracemalloc`.
+
+Usage::
+
+    $ cd tests
+    $ sudo PYTHONPATH=.. python benchmark/bench_dump.py [count] [table]
+'''
+import gc
+import sys
+import time
+import subprocess
+import tracemalloc
+from socket import AF_INET
+from pyroute2 import IPRoute
+from pyroute2 import IPBatch
+
+
+def flush(table):
+    subprocess.check_call(['ip', 'route', 'flush', 'table', str(table)])
+
+
+def install(ipr, count, table):
+    batch = IPBatch()
+    for i in range(count):
+        batch.route('add',
+                    dst='10.%i.%i.0' % (i // 256 % 256, i % 256),
+                    mask=24,
+                    oif=1,
+                    table=table)
+    ipr.nlm_request_batch(batch.requests)
+
+
+def bench(ipr, table, stream=False):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.time()
+    if stream:
+        count = 0
+        for route in ipr.get_routes_iter(family=AF_INET, table=table):
+            count += 1
+    else:
+        count = len(ipr.get_routes(family=AF_INET, table=table))
+    elapsed = time.time() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    table = int(sys.argv[2]) if len(sys.argv) > 2 else 242
+    ipr = IPRoute()
+    try:
+        flush(table)
+        install(ipr, count, table)
+        for stream in (False, True):
+            total, elapsed, peak = bench(ipr, table, stream)
+            print('%-8s %8i routes %8.3f s %10.1f routes/s, '
+                  'peak %10.1f KiB' %
+                  ('iter' if stream else 'list', total, elapsed,
+                   total / elapsed, peak / 1024.0))
+    finally:
+        flush(table)
+        ipr.close()
+
+
+if __name__ == '__main__':
+    main()
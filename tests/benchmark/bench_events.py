@@ -0,0 +1,81 @@
+'''
+Events benchmark: flood the netlink socket with RTM_NEWNEIGH
+broadcasts and report events per second, received and parsed
+by `IPRoute` in the threadless, async and demultiplexer modes.
+
+The flood is generated with `ip -batch`, that replaces permanent
+neighbour records on a temporary bridge interface. The producer
+is faster than the parser, so the socket receive buffer is set
+with `set_rcvbuf(force=True)` big enough to hold the whole flood,
+and the benchmark measures how fast the library drains it.
+
+Requires root permissions and iproute2.
+
+Usage::
+
+    $ cd tests
+    $ sudo PYTHONPATH=.. python benchmark/bench_events.py [count]
+'''
+import sys
+import time
+import resource
+import tempfile
+import threading
+import subprocess
+from pyroute2 import IPRoute
+from pyroute2.netlink.rtnl import RTM_NEWNEIGH
+
+ifname = 'bench0'
+modes = ('default', 'async', 'demux')
+
+
+def flood(count):
+    script = tempfile.NamedTemporaryFile(mode='w')
+    for i in range(count):
+        script.write('neigh replace 10.%i.%i.%i lladdr 00:11:22:33:44:55 '
+                     'dev %s nud permanent\n' %
+                     (i >> 16 & 0xff, i >> 8 & 0xff, i & 0xff, ifname))
+    script.flush()
+    return script
+
+
+def bench(count, mode):
+    script = flood(count)
+    subprocess.check_call(['ip', 'link', 'add', ifname, 'type', 'bridge'])
+    subprocess.check_call(['ip', 'link', 'set', ifname, 'up'])
+    ipr = IPRoute()
+    if mode == 'async':
+        ipr.bind(async=True)
+    elif mode == 'demux':
+        ipr.bind(demux=True)
+    else:
+        ipr.bind()
+    ipr.set_rcvbuf(count * 2048, force=True)
+    producer = threading.Thread(target=subprocess.check_call,
+                                args=(['ip', '-batch', script.name], ))
+    events = 0
+    t0 = time.time()
+    producer.start()
+    while events < count:
+        for msg in ipr.get():
+            if msg['header']['type'] == RTM_NEWNEIGH:
+                events += 1
+    t1 = time.time()
+    producer.join()
+    ipr.close()
+    script.close()
+    subprocess.check_call(['ip', 'link', 'del', ifname])
+    return events, t1 - t0
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    for mode in modes:
+        events, elapsed = bench(count, mode)
+        print('%-8s %8i events %8.3f s %10.1f events/s' %
+              (mode, events, elapsed, events / elapsed))
+    print('maxrss %i KiB' % resource.getrusage(resource.RUSAGE_SELF)[2])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+'''
+IPDB interface views access rate: `by_name` / `by_index`
+lookups, membership tests, iteration, and `IPDB.commit()`
+without pending transactions, that scans all the interfaces.
+To get a realistic picture, create a lot of interfaces before,
+e.g. with `ip link add ... type veth`.
+
+Usage::
+
+    $ cd tests
+    $ PYTHONPATH=.. python benchmark/bench_ipdb_views.py [calls]
+'''
+import sys
+import time
+from pyroute2 import IPDB
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    with IPDB() as ip:
+        names = list(ip.by_name.keys())
+        indices = list(ip.by_index.keys())
+        print('%i interfaces' % len(names))
+
+        def get_name(i):
+            return ip.by_name[names[i % len(names)]]
+
+        def get_index(i):
+            return ip.by_index[indices[i % len(indices)]]
+
+        def contains(i):
+            return names[i % len(names)] in ip.by_name
+
+        def iterate(i):
+            return len(ip.by_index.values())
+
+        def commit(i):
+            return ip.commit()
+
+        for (name, func) in (('by_name[]', get_name),
+                             ('by_index[]', get_index),
+                             ('in', contains),
+                             ('values()', iterate),
+                             ('commit()', commit)):
+            t0 = time.time()
+            for i in range(count):
+                func(i)
+            elapsed = time.time() - t0
+            print('%-10s %8i calls   %8.3f s %10.1f ops/s' %
+                  (name, count, elapsed, count / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+'''
+Interface name lookup rate: `link_lookup(ifname=...)` with the
+old full dump scan, with the kernel-side lookup and with the link
+cache. Create a lot of interfaces before to get a realistic
+picture, e.g. with `ip link add ... type veth`.
+
+Usage::
+
+    $ cd tests
+    $ PYTHONPATH=.. python benchmark/bench_lookup.py [count]
+'''
+import sys
+import time
+from pyroute2 import IPRoute
+
+
+def bench(func, names, count):
+    t0 = time.time()
+    for i in range(count):
+        func(names[i % len(names)])
+    return time.time() - t0
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    ip = IPRoute()
+    cached = IPRoute()
+    cached.bind()
+    cached.set_link_cache()
+    try:
+        names = [x.get_attr('IFLA_IFNAME') for x in ip.get_links()]
+
+        def dump(ifname):
+            # the pre-0.3.x way
+            return [x['index'] for x in ip.get_links(skip_stats=True)
+                    if x.get_attr('IFLA_IFNAME') == ifname]
+
+        for (name, func) in (('dump', dump),
+                             ('kernel', lambda x: ip.link_lookup(ifname=x)),
+                             ('cache',
+                              lambda x: cached.link_lookup(ifname=x))):
+            elapsed = bench(func, names, count)
+            print('%-8s %6i interfaces %8i lookups %8.3f s %10.1f ops/s' %
+                  (name, len(names), count, elapsed, count / elapsed))
+    finally:
+        ip.close()
+        cached.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+'''
+Dump filters benchmark: parse the rtmsg dump sample from
+`tests/data` and filter it with `get_routes()`-like match
+specs, as `IPRoute._match()` does.
+
+Usage::
+
+    $ cd tests
+    $ PYTHONPATH=.. python benchmark/bench_match.py [count [repeat]]
+
+The best result of `repeat` runs is reported.
+'''
+import os
+import sys
+import time
+from pyroute2 import IPBatch
+from pyroute2.common import load_dump
+from pyroute2.netlink.rtnl.iprsocket import MarshalRtnl
+
+data = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                    '..', 'data')
+specs = (('table', {'table': 254}),
+         ('table + oif', {'table': 254, 'oif': 2}),
+         ('dst function', {'dst': lambda x: x is not None}),
+         ('predicate', lambda x: x['dst_len'] == 24))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    with open(os.path.join(data, 'rtmsg_dump'), 'r') as f:
+        sample = load_dump(f)
+    n = len(MarshalRtnl().parse(sample))
+    msgs = MarshalRtnl().parse(sample * max(1, count // n))
+    ipr = IPBatch()
+    for (name, spec) in specs:
+        elapsed = None
+        for _ in range(repeat):
+            t0 = time.time()
+            ipr._match(spec, msgs)
+            t1 = time.time()
+            if elapsed is None or elapsed > t1 - t0:
+                elapsed = t1 - t0
+        print('%-14s %8i messages %8.3f s %12.1f msg/s' %
+              (name, len(msgs), elapsed, len(msgs) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
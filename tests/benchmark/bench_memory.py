@@ -0,0 +1,68 @@
+'''
+Memory benchmark: parse rtnl dump samples from `tests/data`
+and report the memory allocated by the parser.
+
+For every sample and mode (eager, lazy) the script reports:
+
+* peak -- the peak memory traced during the parsing
+* retained -- the memory held by the parsed messages
+* blocks -- the number of memory blocks held by the messages
+
+Requires Python >= 3.4, since it uses `tracemalloc`.
+
+Usage::
+
+    $ cd tests
+    $ PYTHONPATH=.. python benchmark/bench_memory.py [count]
+'''
+import gc
+import os
+import sys
+import resource
+import tracemalloc
+from pyroute2.common import load_dump
+from pyroute2.netlink.rtnl.iprsocket import MarshalRtnl
+
+data = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                    '..', 'data')
+samples = ('rtmsg_dump', 'ifinfmsg_dump')
+
+
+def load(name):
+    with open(os.path.join(data, name), 'r') as f:
+        return load_dump(f)
+
+
+def bench(name, count, lazy=False):
+    sample = load(name)
+    n = len(MarshalRtnl().parse(sample))
+    buf = sample * max(1, count // n)
+    total = n * max(1, count // n)
+    marshal = MarshalRtnl()
+    marshal.lazy = lazy
+    gc.collect()
+    tracemalloc.start()
+    msgs = marshal.parse(buf)
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(msgs) == total
+    blocks = sum([x.count for x in snapshot.statistics('filename')])
+    return total, len(buf), peak, retained, blocks
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    for name in samples:
+        for lazy in (False, True):
+            total, size, peak, retained, blocks = bench(name, count, lazy)
+            print('%-16s %-6s %8i msgs %10i bytes: '
+                  'peak %8.1f KiB, retained %8.1f KiB, blocks %8i' %
+                  (name, 'lazy' if lazy else 'eager', total, size,
+                   peak / 1024.0, retained / 1024.0, blocks))
+    print('maxrss %i KiB' % resource.getrusage(resource.RUSAGE_SELF)[2])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+'''
+Parser benchmark: parse rtnl dump samples from `tests/data`
+and report messages per second.
+
+Every sample is parsed in the eager and in the lazy mode, and
+with the projection to the only NLA used. The time includes reading
+of one NLA per message, as `link_lookup()` or `get_routes()`
+filters do.
+
+Usage::
+
+    $ cd tests
+    $ PYTHONPATH=.. python benchmark/bench_parser.py [count [repeat]]
+
+The best result of `repeat` runs is reported.
+'''
+import os
+import sys
+import time
+from pyroute2.common import load_dump
+from pyroute2.netlink.rtnl.iprsocket import MarshalRtnl
+
+data = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                    '..', 'data')
+samples = (('rtmsg_dump', 'RTA_TABLE'),
+           ('ifinfmsg_dump', 'IFLA_IFNAME'))
+
+
+def load(name):
+    with open(os.path.join(data, name), 'r') as f:
+        return load_dump(f)
+
+
+def bench(name, attr, count, repeat=1, lazy=False, projection=None):
+    sample = load(name)
+    # calculate the number of messages in the sample
+    n = len(MarshalRtnl().parse(sample))
+    # replicate the sample up to `count` messages
+    buf = sample * max(1, count // n)
+    total = n * max(1, count // n)
+    marshal = MarshalRtnl()
+    marshal.lazy = lazy
+    elapsed = None
+    for _ in range(repeat):
+        t0 = time.time()
+        msgs = marshal.parse(buf, projection=projection)
+        for msg in msgs:
+            msg.get_attr(attr)
+        t1 = time.time()
+        assert len(msgs) == total
+        del msgs
+        if elapsed is None or elapsed > t1 - t0:
+            elapsed = t1 - t0
+    return total, len(buf), elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    for (name, attr) in samples:
+        for (mode, lazy, projection) in (('eager', False, None),
+                                         ('lazy', True, None),
+                                         ('proj', False, set((attr, )))):
+            total, size, elapsed = bench(name, attr, count, repeat,
+                                         lazy, projection)
+            print('%-16s %-6s %8i msgs %10i bytes %8.3f s %10.1f msgs/s' %
+                  (name, mode, total, size, elapsed, total / elapsed))
+
+
+if __name__ == '__main__':
+    main()
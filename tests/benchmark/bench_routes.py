@@ -0,0 +1,68 @@
+'''
+IPDB routing table lookups: load a synthetic IPv4 table into
+`RoutingTableSet` and measure exact lookups by `dst`, membership
+tests and longest prefix match lookups.
+
+Usage::
+
+    $ cd tests
+    $ PYTHONPATH=.. python benchmark/bench_routes.py [routes [count]]
+'''
+import sys
+import time
+import random
+from socket import AF_INET
+from pyroute2.ipdb.route import RoutingTableSet
+from pyroute2.netlink.rtnl.rtmsg import rtmsg
+
+
+def route(dst, dst_len):
+    msg = rtmsg()
+    msg['family'] = AF_INET
+    msg['dst_len'] = dst_len
+    msg['table'] = 254
+    msg['attrs'] = [['RTA_TABLE', 254],
+                    ['RTA_DST', dst],
+                    ['RTA_OIF', 2]]
+    msg['event'] = 'RTM_NEWROUTE'
+    return msg
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    random.seed(42)
+    prefixes = set()
+    while len(prefixes) < size:
+        dst_len = random.choice((16, 20, 22, 24, 24, 24))
+        net = random.getrandbits(dst_len) << (32 - dst_len)
+        prefixes.add(('%i.%i.%i.%i' % (net >> 24, (net >> 16) & 0xff,
+                                       (net >> 8) & 0xff, net & 0xff),
+                      dst_len))
+    prefixes = list(prefixes)
+    routes = RoutingTableSet(ipdb=None)
+    t0 = time.time()
+    for (dst, dst_len) in prefixes:
+        routes.load_netlink(route(dst, dst_len))
+    print('load     %8i routes  %8.3f s' % (size, time.time() - t0))
+
+    keys = ['%s/%i' % random.choice(prefixes) for _ in range(count)]
+    addrs = ['%i.%i.%i.%i' % tuple([random.randint(0, 255)
+                                    for _ in range(4)])
+             for _ in range(count)]
+    for (name, func, args) in (('get', routes.get, keys),
+                               ('contains', routes.__contains__, keys),
+                               ('lookup', routes.lookup, addrs)):
+        t0 = time.time()
+        for arg in args:
+            try:
+                func(arg)
+            except KeyError:
+                pass
+        elapsed = time.time() - t0
+        print('%-8s %8i calls   %8.3f s %10.1f ops/s' %
+              (name, count, elapsed, count / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+'''
+Interface counters polling cost: `get_links()` dumps with
+`IFLA_STATS64` lookup vs. `StatsSampler.sample()` based on
+`RTM_GETSTATS`. To get a realistic picture, create a lot of
+interfaces before, e.g. with `ip link add ... type veth`.
+Requires Linux >= 4.7.
+
+Usage::
+
+    $ cd tests
+    $ PYTHONPATH=.. python benchmark/bench_stats.py [rounds]
+'''
+import sys
+import time
+from pyroute2 import IPRoute
+from pyroute2.iproute import StatsSampler
+
+
+def bench_links(ip, rounds):
+    t0 = time.time()
+    for _ in range(rounds):
+        counters = {}
+        for link in ip.get_links():
+            stats = link.get_attr('IFLA_STATS64')
+            counters[link['index']] = (stats['rx_bytes'],
+                                       stats['tx_bytes'])
+    return time.time() - t0
+
+
+def bench_sampler(ip, rounds):
+    sampler = StatsSampler(ip, fields=('rx_bytes', 'tx_bytes'))
+    t0 = time.time()
+    for _ in range(rounds):
+        sampler.sample()
+        sampler.rate('rx_bytes')
+        sampler.rate('tx_bytes')
+    return time.time() - t0
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    ip = IPRoute()
+    try:
+        links = len(ip.get_links())
+        for (name, func) in (('get_links()', bench_links),
+                             ('StatsSampler', bench_sampler)):
+            elapsed = func(ip, rounds)
+            print('%-14s %6i interfaces %6i rounds %8.3f s '
+                  '%8.2f msec/round' %
+                  (name, links, rounds, elapsed,
+                   elapsed * 1000 / rounds))
+    finally:
+        ip.close()
+
+
+if __name__ == '__main__':
+    main()
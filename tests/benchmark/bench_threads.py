@@ -0,0 +1,64 @@
+'''
+Threads benchmark: run concurrent netlink requests on one
+`IPRoute` instance and report requests per second.
+
+Every thread runs `get_links(1)`, and the benchmark compares
+the default mode, where threads share the socket reading with
+`read_lock` and the backlog, with the demultiplexer mode, see
+`NetlinkSocket.bind(demux=True)`.
+
+Requires a working netlink, but no root permissions.
+
+Usage::
+
+    $ cd tests
+    $ PYTHONPATH=.. python benchmark/bench_threads.py [count]
+
+`count` is the total number of requests for every run.
+'''
+import sys
+import time
+import threading
+from pyroute2 import IPRoute
+
+threads = (1, 8, 64)
+
+
+def bench(count, nthreads, demux=False):
+    ipr = IPRoute()
+    if demux:
+        ipr.bind(groups=0, demux=True)
+    errors = []
+
+    def run():
+        try:
+            for _ in range(count // nthreads):
+                ipr.get_links(1)
+        except Exception as e:
+            errors.append(e)
+
+    pool = [threading.Thread(target=run) for _ in range(nthreads)]
+    t0 = time.time()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    t1 = time.time()
+    ipr.close()
+    if errors:
+        raise errors[0]
+    return (count // nthreads) * nthreads, t1 - t0
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    for demux in (False, True):
+        for nthreads in threads:
+            total, elapsed = bench(count, nthreads, demux)
+            print('%-8s %4i threads %8i requests %8.3f s %10.1f req/s' %
+                  ('demux' if demux else 'default', nthreads,
+                   total, elapsed, total / elapsed))
+
+
+if __name__ == '__main__':
+    main()
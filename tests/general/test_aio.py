@@ -0,0 +1,97 @@
+import sys
+from nose.plugins.skip import SkipTest
+from pyroute2.netlink import NetlinkError
+from pyroute2.netlink.rtnl import RTM_GETLINK
+
+
+class TestAsyncIPRoute(object):
+
+    def setup(self):
+        if sys.version_info < (3, 5):
+            raise SkipTest('asyncio support requires Python >= 3.5')
+        import asyncio
+        from pyroute2.aio import AsyncIPRoute
+        self.asyncio = asyncio
+        self.loop = asyncio.new_event_loop()
+        self.ip = AsyncIPRoute(loop=self.loop)
+
+    def teardown(self):
+        self.ip.close()
+        self.loop.close()
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_get_links(self):
+        links = self.run(self.ip.get_links())
+        assert links[0].get_attr('IFLA_IFNAME') == 'lo'
+        assert self.run(self.ip.link_lookup(ifname='lo')) == [1]
+        assert self.ip.futures == {}
+
+    def test_error(self):
+        try:
+            self.run(self.ip.get_links(0xffffff))
+        except NetlinkError as e:
+            assert e.code == 19
+        else:
+            raise AssertionError('exception expected')
+        assert self.ip.futures == {}
+
+    def test_concurrent(self):
+        coros = [self.ip.get_links(1) for _ in range(256)]
+        ret = self.run(self.asyncio.gather(*coros, loop=self.loop))
+        assert [x[0]['index'] for x in ret] == [1] * 256
+
+    def test_dumps(self):
+        # dumps on one socket are serialized
+        coros = [self.ip.get_links() for _ in range(16)]
+        ret = self.run(self.asyncio.gather(*coros, loop=self.loop))
+        assert len(set([len(x) for x in ret])) == 1
+
+    def test_events(self):
+        self.ip.add_reader()
+        # a response with msg_seq == 0 goes to the zero queue
+        self.ip.put({'index': 1}, RTM_GETLINK)
+        msg = self.run(self.ip.__anext__())
+        assert msg['index'] == 1
+
+    def test_batch(self):
+        requests = [({'index': 1}, RTM_GETLINK),
+                    ({'index': 0xffffff}, RTM_GETLINK)] * 100
+        ret = self.run(self.ip.nlm_request_batch(requests))
+        assert len(ret) == 200
+        assert [x[0]['index'] for x in ret[::2]] == [1] * 100
+        assert [x.code for x in ret[1::2]] == [19] * 100
+        assert self.ip.futures == {}
+
+    def test_replay_linear(self):
+        from pyroute2 import aio
+        runs = []
+
+        class Replay(aio.Replay):
+
+            def __init__(self, nl, responses):
+                runs.append(len(responses))
+                super(Replay, self).__init__(nl, responses)
+
+        replay = aio.Replay
+        aio.Replay = Replay
+        try:
+            links = self.run(self.ip.get_links(*[1] * 64))
+        finally:
+            aio.Replay = replay
+        assert [x['index'] for x in links] == [1] * 64
+        # two runs per request: defer, then replay
+        assert len(runs) == 128
+        assert max(runs) == 1
+
+    def test_link_cache(self):
+        assert self.run(self.ip.set_link_cache())
+        assert self.ip.link_cache == {}
+        assert self.run(self.ip.link_lookup(ifname='lo')) == [1]
+        assert self.ip.link_cache == {'lo': 1}
+        # the answer comes from the cache, not from the kernel
+        self.ip.link_cache['nosuchlink'] = 1
+        assert self.run(self.ip.link_lookup(ifname='nosuchlink')) == [1]
+        assert not self.run(self.ip.set_link_cache(False))
+        assert self.ip.link_cache is None
@@ -4,6 +4,7 @@ from pyroute2.common import hexload
 from pyroute2.common import uuid32
 from pyroute2.common import uifname
 from pyroute2.common import dqn2int
+from pyroute2.common import View
 
 
 class TestAddrPool(object):
@@ -107,6 +108,42 @@ class TestAddrPool(object):
         except KeyError:
             pass
 
+    def test_ban(self):
+
+        ap = AddrPool(minaddr=1, maxaddr=4)
+        addrs = [ap.alloc() for _ in range(4)]
+        ap.free(addrs[0], ban=2)
+        assert ap.allocated == 4
+        # the address is banned for 2 allocations
+        for _ in range(2):
+            try:
+                ap.alloc()
+            except KeyError:
+                pass
+            else:
+                raise AssertionError('exception expected')
+        assert ap.alloc() == addrs[0]
+
+    def test_reuse_order(self):
+
+        ap = AddrPool(minaddr=1, maxaddr=4)
+        addrs = [ap.alloc() for _ in range(4)]
+        assert addrs == [1, 2, 3, 4]
+        ap.free(3)
+        ap.free(1)
+        assert ap.alloc() == 3
+        assert ap.alloc() == 1
+
+    def test_release(self):
+
+        ap = AddrPool(minaddr=1, maxaddr=1024, release=4)
+        f = ap.alloc()
+        for _ in range(4):
+            assert ap.alloc() != f
+        assert ap.locate(f)[2]
+        ap.alloc()
+        assert not ap.locate(f)[2]
+
 
 class TestCommon(object):
 
@@ -147,3 +184,34 @@ class TestCommon(object):
 
         assert nA != nB
         assert int(nA[2:], 16) != int(nB[2:], 16)
+
+
+class TestView(object):
+
+    def test_facade(self):
+        src = {'a': 1, 'b': 2}
+        view = View(src=src)
+        assert view['a'] == 1
+        assert 'b' in view
+        assert len(view) == 2
+        src['c'] = 3
+        assert sorted(view.keys()) == ['a', 'b', 'c']
+        assert sorted(view.values()) == [1, 2, 3]
+        assert sorted(view.items()) == [('a', 1), ('b', 2), ('c', 3)]
+        assert sorted(view) == ['a', 'b', 'c']
+        assert view.get('d') is None
+        try:
+            view['d'] = 4
+        except NotImplementedError:
+            pass
+        else:
+            raise Exception('NotImplementedError expected')
+
+    def test_constraint(self):
+        src = {'a': 1, 2: 'b'}
+        view = View(src=src, constraint=lambda k, v: isinstance(k, int))
+        assert list(view.keys()) == [2]
+        assert view[2] == 'b'
+        assert 'a' not in view
+        assert len(view) == 1
+        assert view.get('a') is None
@@ -5,6 +5,7 @@ import json
 import time
 import uuid
 import socket
+import threading
 import subprocess
 from pyroute2 import config
 from pyroute2 import IPDB
@@ -15,6 +16,11 @@ from pyroute2.common import basestring
 from pyroute2.common import uifname
 from pyroute2.netlink import NetlinkError
 from pyroute2.ipdb.common import CreateException
+from pyroute2.ipdb.common import SYNC_TIMEOUT
+from pyroute2.ipdb import Interfaces
+from pyroute2.ipdb.callbacks import CallbackPool
+from pyroute2.ipdb.route import RoutingTableSet
+from pyroute2.netlink.rtnl.rtmsg import rtmsg
 from utils import grep
 from utils import create_link
 from utils import kernel_version_ge
@@ -1525,6 +1531,21 @@ class TestMisc(object):
             ip.interfaces[ifname].remove().commit()
             ip.release()
 
+    def test_resync(self):
+        require_user('root')
+        with IPDB() as ip:
+            lo = ip.interfaces.lo
+            routes = len(ip.routes.tables[255])
+            # inject stale records, as if some RTM_DEL* were lost
+            ip.ipaddr[1].add(('172.16.254.1', 24))
+            ip.neighbours[1].add('172.16.254.2')
+            ip.resync()
+            assert ip.interfaces.lo is lo
+            assert ('172.16.254.1', 24) not in ip.ipaddr[1]
+            assert '172.16.254.2' not in ip.neighbours[1]
+            assert ('127.0.0.1', 8) in ip.ipaddr[1]
+            assert len(ip.routes.tables[255]) == routes
+
     def test_fail_released(self):
         ip = IPDB()
         ip.release()
@@ -1639,3 +1660,382 @@ class TestMisc(object):
                 i.interfaces[self.ifname].up()
             except TypeError:
                 pass
+
+
+class TestRoutingTable(object):
+
+    def setup(self):
+        self.routes = RoutingTableSet(ipdb=None)
+
+    def load(self, dst, dst_len, oif=1, family=socket.AF_INET,
+             event='RTM_NEWROUTE', table=254, proto=0, **attrs):
+        msg = rtmsg()
+        msg['family'] = family
+        msg['dst_len'] = dst_len
+        msg['table'] = table
+        msg['proto'] = proto
+        msg['attrs'] = [['RTA_TABLE', table]]
+        if oif is not None:
+            msg['attrs'].append(['RTA_OIF', oif])
+        if dst is not None:
+            msg['attrs'].append(['RTA_DST', dst])
+        for (key, value) in attrs.items():
+            msg['attrs'].append([rtmsg.name2nla(key), value])
+        msg['event'] = event
+        self.routes.load_netlink(msg)
+
+    def test_lookup(self):
+        self.load(None, 0)
+        self.load('10.0.0.0', 8)
+        self.load('10.1.2.0', 24, oif=2)
+        self.load(None, 0, oif=3, family=socket.AF_INET6)
+        self.load('fc00::', 7, family=socket.AF_INET6)
+        assert self.routes.lookup('10.1.2.3')['dst'] == '10.1.2.0/24'
+        assert self.routes.lookup('10.1.3.1')['dst'] == '10.0.0.0/8'
+        assert self.routes.lookup('10.1.2.0/16')['dst'] == '10.0.0.0/8'
+        assert self.routes.lookup('172.16.0.1')['dst'] == 'default'
+        assert self.routes.lookup('fc00::1')['dst'] == 'fc00::/7'
+        assert self.routes.lookup('2001::1')['oif'] == 3
+        try:
+            self.routes.lookup('10.0.0.1', table=100)
+        except KeyError:
+            pass
+        else:
+            raise Exception('KeyError expected')
+
+    def test_lookup_priority(self):
+        self.load('10.1.2.0', 24, oif=2, priority=10)
+        self.load('10.1.2.0', 24, oif=3, priority=5)
+        assert self.routes.lookup('10.1.2.3')['oif'] == 3
+        self.load('10.1.2.0', 24, oif=3, event='RTM_DELROUTE')
+        assert self.routes.lookup('10.1.2.3')['oif'] == 2
+        self.load('10.1.2.0', 24, oif=2, event='RTM_DELROUTE')
+        try:
+            self.routes.lookup('10.1.2.3')
+        except KeyError:
+            pass
+        else:
+            raise Exception('KeyError expected')
+
+    def test_describe(self):
+        for net in range(256):
+            self.load('10.%i.0.0' % net, 16, oif=net)
+        assert '10.5.0.0/16' in self.routes
+        assert '10.5.0.0/24' not in self.routes
+        assert self.routes['10.7.0.0/16']['oif'] == 7
+        assert self.routes.describe({'dst': '10.7.0.0/16',
+                                     'oif': 7})['route']['oif'] == 7
+        self.load('10.7.0.0', 16, oif=7, event='RTM_DELROUTE')
+        assert '10.7.0.0/16' not in self.routes
+        table = self.routes.tables[254]
+        assert len(table.idx) == len(table.lpm.prefixes) == 255
+
+    def test_describe_order(self):
+        # a record without dst matches any dst, so records
+        # are checked in the insertion order
+        table = self.routes.tables[254]
+        table[{'oif': 2}] = {'oif': 2, 'priority': 10}
+        self.load('10.1.2.0', 24, oif=2, priority=20)
+        spec = {'dst': '10.1.2.0/24', 'oif': 2}
+        assert table.describe(dict(spec))['route']['priority'] == 10
+        # and in the reverse order
+        self.setup()
+        table = self.routes.tables[254]
+        self.load('10.1.2.0', 24, oif=2, priority=20)
+        table[{'oif': 3}] = {'oif': 2, 'priority': 10}
+        assert len(table.idx) == 2
+        assert table.describe(dict(spec))['route']['priority'] == 20
+
+    def test_filter(self):
+        for net in range(16):
+            self.load('10.%i.0.0' % net, 16, oif=net % 4,
+                      gateway='10.255.0.%i' % (net % 2),
+                      proto=12 if net < 8 else 4)
+        self.load('10.0.0.0', 8, oif=2, table=100, proto=12)
+        self.load('10.16.0.0', 16, oif=None, multipath=[
+            {'flags': 0, 'hops': 0, 'ifindex': 2,
+             'attrs': [['RTA_GATEWAY', '10.255.0.7']]},
+            {'flags': 0, 'hops': 0, 'ifindex': 7,
+             'attrs': [['RTA_GATEWAY', '10.255.0.8']]}])
+
+        def dsts(routes):
+            return sorted([x['dst'] for x in routes])
+
+        assert dsts(self.routes.filter(oif=2)) == \
+            ['10.0.0.0/8', '10.10.0.0/16', '10.14.0.0/16',
+             '10.16.0.0/16', '10.2.0.0/16', '10.6.0.0/16']
+        assert dsts(self.routes.filter(oif=2, table=254)) == \
+            ['10.10.0.0/16', '10.14.0.0/16', '10.16.0.0/16',
+             '10.2.0.0/16', '10.6.0.0/16']
+        assert dsts(self.routes.filter(oif=2, proto='RTPROT_BIRD')) == \
+            ['10.0.0.0/8', '10.2.0.0/16', '10.6.0.0/16']
+        assert dsts(self.routes.filter(gateway='10.255.0.8')) == \
+            ['10.16.0.0/16']
+        assert dsts(self.routes.filter(oif=1, gateway='10.255.0.0')) == []
+        assert len(self.routes.filter(gateway='10.255.0.1',
+                                      dst='10.3.0.0/16')) == 1
+        assert self.routes.filter(oif=2, table=200) == []
+        # the index follows updates and removals
+        self.load('10.2.0.0', 16, oif=2, event='RTM_DELROUTE')
+        self.load('10.6.0.0', 16, oif=2, priority=10)
+        assert dsts(self.routes.filter(oif=2, table=254)) == \
+            ['10.10.0.0/16', '10.14.0.0/16', '10.16.0.0/16',
+             '10.6.0.0/16']
+        assert dsts(self.routes.filter(priority=10)) == ['10.6.0.0/16']
+        assert self.routes.filter(proto=4, oif=2)[0]['dst'] == \
+            '10.10.0.0/16'
+
+    def test_ipdb(self):
+        with IPDB() as ip:
+            route = ip.routes.lookup('127.0.0.1', table=255)
+            assert route['dst'] == '127.0.0.1/32'
+            assert ip.routes.lookup('127.1.1.1', table=255)['dst'] == \
+                '127.0.0.0/8'
+            lo = ip.interfaces.lo.index
+            local = ip.routes.filter(oif=lo, proto='RTPROT_KERNEL',
+                                     table=255)
+            assert '127.0.0.1/32' in [x['dst'] for x in local]
+
+
+class TestCallbackPool(object):
+
+    def test_order(self):
+        pool = CallbackPool(workers=4)
+        ret = {1: [], 2: []}
+
+        def cb(key, value):
+            ret[key].append(value)
+
+        for i in range(1000):
+            pool.submit(1, cb, (1, i))
+            pool.submit(2, cb, (2, i))
+        assert pool.join(timeout=10)
+        pool.stop()
+        assert ret[1] == ret[2] == list(range(1000))
+        stats = pool.stats()
+        assert stats['submitted'] == stats['executed'] == 2000
+        assert stats['queued'] == 0
+        assert 1 <= stats['workers'] <= 4
+
+    def test_parallel(self):
+        pool = CallbackPool(workers=2)
+        lock = threading.Event()
+        ret = []
+        pool.submit(1, lock.wait, (10, ))
+        pool.submit(2, ret.append, (1, ))
+        # the second callback doesn't wait for the first one
+        assert pool.join(2, timeout=5)
+        assert ret == [1]
+        assert not pool.join(1, timeout=0.1)
+        lock.set()
+        assert pool.join(timeout=5)
+        pool.stop()
+
+    def test_overflow(self):
+        pool = CallbackPool(workers=1, maxsize=2, overflow='drop')
+        lock = threading.Event()
+        assert pool.submit(1, lock.wait, (10, ))
+        assert pool.submit(1, lock.wait, (10, ))
+        assert not pool.submit(1, lock.wait, (10, ))
+        lock.set()
+        assert pool.join(timeout=5)
+        pool.stop()
+        stats = pool.stats()
+        assert stats['dropped'] == 1
+        assert stats['executed'] == stats['max_queued'] == 2
+        assert not pool.submit(1, lock.wait, (10, ))
+
+    def test_block(self):
+        pool = CallbackPool(workers=1, maxsize=1, overflow='block')
+        ret = []
+
+        def cb(value):
+            time.sleep(0.01)
+            ret.append(value)
+
+        for i in range(10):
+            pool.submit(1, cb, (i, ))
+        assert pool.join(timeout=5)
+        pool.stop()
+        assert ret == list(range(10))
+        assert pool.stats()['blocked'] > 0
+
+    def test_block_timeout(self):
+        # the wait is bounded, then the event is dropped
+        pool = CallbackPool(workers=1, maxsize=1, overflow='block',
+                            timeout=0.1)
+        lock = threading.Event()
+        assert pool.submit(1, lock.wait, (10, ))
+        ts = time.time()
+        assert not pool.submit(1, lock.wait, (10, ))
+        assert time.time() - ts < 5
+        assert pool.pending(1) == pool.pending() == 1
+        lock.set()
+        assert pool.join(timeout=5)
+        pool.stop()
+        stats = pool.stats()
+        assert stats['blocked'] == stats['dropped'] == 1
+        assert pool.pending() == 0
+
+    def test_errors(self):
+        pool = CallbackPool()
+
+        def cb():
+            raise Exception('test')
+
+        pool.submit(1, cb, ())
+        pool.submit(1, cb, ())
+        assert pool.join(timeout=5)
+        pool.stop()
+        assert pool.stats()['errors'] == 2
+
+    def test_ipdb(self):
+        require_user('root')
+        ifname = uifname()
+        ret = []
+
+        def cb(ipdb, msg, action):
+            if msg.get_attr('IFLA_IFNAME') == ifname:
+                ret.append(action)
+
+        with IPDB(cb_workers=1) as ip:
+            cuid = ip.register_callback(cb)
+            try:
+                create_link(ifname, 'bridge')
+                remove_link(ifname)
+                for _ in range(50):
+                    if 'RTM_DELLINK' in ret:
+                        break
+                    time.sleep(0.1)
+            finally:
+                ip.unregister_callback(cuid)
+            assert ret[0] == 'RTM_NEWLINK'
+            assert ret[-1] == 'RTM_DELLINK'
+            assert ip.callback_stats()['workers'] == 1
+
+    def test_ipdb_commit_overflow(self):
+        # a callback commits, while the queue is full: the main
+        # loop must not wait for the callback, since the commit
+        # waits for the main loop
+        require_user('root')
+        ifname = uifname()
+        ifnew = uifname()
+        ret = []
+
+        def cb(ipdb, msg, action):
+            if msg.get_attr('IFLA_IFNAME') == ifname and not ret:
+                ret.append(None)
+                ts = time.time()
+                # events of this commit fill the queue
+                with ipdb.interfaces[ifname] as i:
+                    i.up()
+                # and this one waits for a watchdog
+                ipdb.create(kind='bridge', ifname=ifnew).commit()
+                ret[0] = time.time() - ts
+
+        with IPDB(cb_workers=1, cb_queue=1) as ip:
+            cuid = ip.register_callback(cb)
+            try:
+                create_link(ifname, 'bridge')
+                for _ in range(100):
+                    if ret and ret[0] is not None:
+                        break
+                    time.sleep(0.1)
+                assert ret[0] is not None
+                assert ret[0] < SYNC_TIMEOUT
+                assert ip.interfaces[ifname].flags & 1
+                assert ifnew in ip.interfaces
+                assert ip.callback_stats()['dropped'] > 0
+                assert ip.unregister_callback(cuid) == 0
+            finally:
+                remove_link(ifname)
+                remove_link(ifnew)
+
+
+class TestPorts(object):
+
+    def setup(self):
+        require_user('root')
+        self.ip = IPDB()
+        self.br1 = uifname()
+        self.br2 = uifname()
+        self.port = uifname()
+        for ifname in (self.br1, self.br2):
+            create_link(ifname, 'bridge')
+        subprocess.call(['ip', 'link', 'add', 'dev', self.port,
+                         'type', 'veth', 'peer', 'name', self.port + 'p'])
+
+    def teardown(self):
+        self.ip.release()
+        for ifname in (self.port, self.br1, self.br2):
+            remove_link(ifname)
+
+    def wait(self, check):
+        for _ in range(50):
+            if check():
+                return True
+            time.sleep(0.1)
+        return False
+
+    def ports(self, ifname):
+        return self.ip.interfaces[ifname]['ports']
+
+    def test_move_port(self):
+        assert self.wait(lambda: self.port in self.ip.interfaces and
+                         self.br2 in self.ip.interfaces)
+        index = self.ip.interfaces[self.port]['index']
+        # enslave, then move to another master w/o release
+        for (master, other) in ((self.br1, self.br2),
+                                (self.br2, self.br1)):
+            subprocess.call(['ip', 'link', 'set', 'dev', self.port,
+                             'master', master])
+            assert self.wait(lambda: index in self.ports(master) and
+                             index not in self.ports(other))
+            assert self.ip._port_master[index] is \
+                self.ip.interfaces[master]
+        # release
+        subprocess.call(['ip', 'link', 'set', 'dev', self.port,
+                         'nomaster'])
+        assert self.wait(lambda: index not in self.ports(self.br2))
+        assert index not in self.ip._port_master
+        # remove an enslaved port
+        subprocess.call(['ip', 'link', 'set', 'dev', self.port,
+                         'master', self.br1])
+        assert self.wait(lambda: index in self.ports(self.br1))
+        remove_link(self.port)
+        assert self.wait(lambda: index not in self.ports(self.br1))
+        assert self.wait(lambda: index not in self.ip._port_master)
+
+
+class TestInterfaces(object):
+
+    def test_maps(self):
+        interfaces = Interfaces()
+        eth0 = {'ifname': 'eth0'}
+        interfaces['eth0'] = interfaces[2] = eth0
+        interfaces.update({3: 'x', 'eth1': 'x'})
+        interfaces.setdefault(4, 'y')
+        assert interfaces._by_name == {'eth0': eth0, 'eth1': 'x'}
+        assert interfaces._by_index == {2: eth0, 3: 'x', 4: 'y'}
+        # dot access still works
+        assert interfaces.eth0 is eth0
+        # rename
+        interfaces['eth2'] = interfaces[2]
+        del interfaces['eth0']
+        assert sorted(interfaces._by_name) == ['eth1', 'eth2']
+        interfaces.pop(3)
+        interfaces.pop(5, None)
+        assert sorted(interfaces._by_index) == [2, 4]
+        interfaces.clear()
+        assert interfaces._by_name == interfaces._by_index == {}
+
+    def test_ipdb(self):
+        with IPDB() as ip:
+            assert sorted(ip.by_index.keys()) == \
+                sorted([x for x in ip.interfaces if isinstance(x, int)])
+            assert sorted(ip.by_name.keys()) == \
+                sorted([x for x in ip.interfaces
+                        if isinstance(x, basestring)])
+            assert 'lo' in ip.by_name
+            assert ip.by_index[ip.interfaces.lo.index] is ip.by_name['lo']
+            assert len(ip.by_name) == len(ip.by_index)
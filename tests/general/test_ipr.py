@@ -2,12 +2,18 @@ import os
 import errno
 import socket
 from pyroute2 import IPRoute
+from pyroute2.iproute import StatsSampler
 from pyroute2.common import uifname
 from pyroute2.common import AF_MPLS
 from pyroute2.netlink import NetlinkError
+from pyroute2.netlink import NLM_F_DUMP
+from pyroute2.netlink import NLM_F_REQUEST
 from pyroute2.netlink import nlmsg
+from pyroute2.netlink.rtnl import RTM_GETLINK
+from pyroute2.netlink.rtnl import RTM_GETROUTE
 from pyroute2.netlink.rtnl.req import IPRouteRequest
 from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
+from pyroute2.netlink.rtnl.ifstatsmsg import ifstatsmsg
 from utils import grep
 from utils import require_user
 from utils import require_kernel
@@ -112,6 +118,214 @@ class TestMisc(object):
             pass
         assert lvalue != 42
 
+    def test_dump_iter(self):
+        routes = self.ip.get_routes_iter(family=socket.AF_INET)
+        assert not isinstance(routes, list)
+        assert len(list(routes)) == \
+            len(self.ip.get_routes(family=socket.AF_INET))
+        assert [x['index'] for x in self.ip.get_addr_iter(index=1)] == \
+            [x['index'] for x in self.ip.get_addr(index=1)]
+        assert len(list(self.ip.get_neighbours_iter())) == \
+            len(self.ip.get_neighbours())
+
+    def test_dump_iter_close(self):
+        # an interrupted dump must not leave messages in the backlog
+        links = self.ip.nlm_request_iter(ifinfmsg(), RTM_GETLINK)
+        assert next(links)['index'] == 1
+        links.close()
+        assert list(self.ip.backlog.keys()) == [0]
+        assert self.ip.backlog[0] == []
+        assert self.ip.get_links()[0]['index'] == 1
+
+    def test_strict_check_default(self):
+        # strict checks are opt-in: a low-level dump request has
+        # default header values, that the kernel with strict
+        # checks would use as filters
+        assert not self.ip.strict_check
+        dump = self.ip.route((RTM_GETROUTE, NLM_F_REQUEST | NLM_F_DUMP),
+                             family=socket.AF_INET)
+        ref = self.ip.get_routes(family=socket.AF_INET)
+        assert len(dump) == len(ref)
+        assert len([x for x in dump if x['table'] == 255]) > 0
+
+    def test_strict_check_routes(self):
+        # kernel-side filters must give the same result as
+        # the plain dump filtered in the userspace
+        self.ip.close()
+        self.ip = IPRoute(strict_check=True)
+        if not self.ip.strict_check:
+            raise SkipTest('strict checks are not supported')
+        dump = self.ip.get_routes()
+        for spec in ({'table': 255},
+                     {'table': 254, 'family': socket.AF_INET},
+                     {'oif': 1},
+                     {'proto': 2}):
+            spec = dict(spec)
+            family = spec.pop('family', socket.AF_UNSPEC)
+            ret = self.ip.get_routes(family=family, **spec)
+            ref = [x for x in dump
+                   if (family in (socket.AF_UNSPEC, x['family'])) and
+                   all([(x.get_attr(x.name2nla(k)) or x.get(k)) == v
+                        for (k, v) in spec.items()])]
+            assert len(ret) == len(ref)
+
+    def test_strict_check_empty_table(self):
+        self.ip.close()
+        self.ip = IPRoute(strict_check=True)
+        assert self.ip.get_routes(family=socket.AF_INET, table=242) == []
+        assert self.ip.get_routes(table=242) == []
+
+    def test_strict_check_dumps(self):
+        self.ip.close()
+        self.ip = IPRoute(strict_check=True)
+        assert set([x['index'] for x in self.ip.get_addr(index=1)]) == \
+            set([1])
+        for x in self.ip.get_neighbours(ifindex=1):
+            assert x['ifindex'] == 1
+        assert len(self.ip.get_rules()) > 0
+        assert len(self.ip.get_routes(dst='127.0.0.1')) > 0
+
+    def test_links_skip_stats(self):
+        def inet6_attrs(link):
+            spec = link.get_attr('IFLA_AF_SPEC')
+            inet6 = spec.get_attr('AF_INET6') if spec else None
+            return [x[0] for x in inet6['attrs']] if inet6 else []
+
+        full = self.ip.get_links()
+        slim = self.ip.get_links(skip_stats=True)
+        assert [x['index'] for x in full] == [x['index'] for x in slim]
+        for link in slim:
+            assert 'IFLA_INET6_STATS' not in inet6_attrs(link)
+        assert 'IFLA_INET6_STATS' not in \
+            inet6_attrs(self.ip.get_links(1, skip_stats=True)[0])
+        if 'IFLA_INET6_STATS' in inet6_attrs(self.ip.get_links(1)[0]):
+            assert sum([x['header']['length'] for x in slim]) < \
+                sum([x['header']['length'] for x in full])
+        assert self.ip.link_lookup(ifname='lo') == [1]
+
+    @skip_if_not_supported
+    def test_get_stats(self):
+        require_kernel(4, 7)
+        stats = self.ip.get_stats()
+        assert set([x['ifindex'] for x in stats]) == \
+            set([x['index'] for x in self.ip.get_links()])
+        lo = self.ip.get_stats(1)
+        assert len(lo) == 1
+        assert lo[0]['ifindex'] == 1
+        assert lo[0].get_attr('IFLA_STATS_LINK_64')['rx_packets'] > 0
+
+    @skip_if_not_supported
+    def test_stats_sampler(self):
+        require_kernel(4, 7)
+        sampler = StatsSampler(self.ip, fields=('tx_packets', ), size=1)
+        assert sum(sampler.rate('tx_packets')) == 0
+        sampler.sample()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for _ in range(10):
+            sock.sendto(b'x', ('127.0.0.1', 9))
+        sock.close()
+        sampler.sample()
+        assert sampler.size > 1
+        assert len(sampler.delta('tx_packets')) == sampler.size
+        assert sampler.delta('tx_packets')[1] >= 10
+        assert sampler.rate('tx_packets')[1] > 0
+
+    def test_link_lookup_name(self):
+        for link in self.ip.get_links():
+            ifname = link.get_attr('IFLA_IFNAME')
+            assert self.ip.link_lookup(ifname=ifname) == [link['index']]
+        assert self.ip.link_lookup(ifname='lo') == [1]
+        assert self.ip.link_lookup(ifname=uifname()) == []
+        assert self.ip.link_lookup(ifname='x' * 64) == []
+
+    def test_link_cache(self):
+        require_user('root')
+        assert self.ip.set_link_cache()
+        assert self.ip.link_lookup(ifname='lo') == [1]
+        assert self.ip.link_cache == {'lo': 1}
+        # renamed through this socket
+        name = uifname()
+        create_link(name, 'bridge')
+        try:
+            index = self.ip.link_lookup(ifname=name)[0]
+            assert self.ip.link_cache[name] == index
+            new_name = uifname()
+            self.ip.link('set', index=index, ifname=new_name)
+            assert name not in self.ip.link_cache
+            assert self.ip.link_lookup(ifname=name) == []
+            assert self.ip.link_lookup(ifname=new_name) == [index]
+            name = new_name
+        finally:
+            remove_link(name)
+        assert not self.ip.set_link_cache(False)
+        assert self.ip.link_cache is None
+
+    def test_link_cache_events(self):
+        require_user('root')
+        ip = IPRoute()
+        ip.bind()
+        ip.set_link_cache()
+        name = uifname()
+        try:
+            create_link(name, 'bridge')
+            # any request drives the parser, so the events
+            # reach the cache
+            ip.get_links(1)
+            assert ip.link_cache[name] == \
+                self.ip.link_lookup(ifname=name)[0]
+            remove_link(name)
+            ip.get_links(1)
+            assert name not in ip.link_cache
+            assert ip.link_lookup(ifname=name) == []
+        finally:
+            remove_link(name)
+            ip.close()
+
+
+class TestStatsSampler(object):
+
+    class stats(object):
+        # fake `get_stats()` provider: {ifindex: tx_packets}
+        def __init__(self):
+            self.counters = {}
+
+        def get_stats(self):
+            ret = []
+            for (index, value) in self.counters.items():
+                msg = ifstatsmsg()
+                msg['ifindex'] = index
+                msg['attrs'] = [['IFLA_STATS_LINK_64',
+                                 {'tx_packets': value}]]
+                ret.append(msg)
+            return ret
+
+    def test_delta(self):
+        nl = self.stats()
+        sampler = StatsSampler(nl, fields=('tx_packets', ), size=4)
+        nl.counters = {1: 10, 2: 20, 3: 30}
+        sampler.sample()
+        assert list(sampler.delta('tx_packets')) == [0, 0, 0, 0]
+        # 2: counter reset, 3: removed, 4: added
+        nl.counters = {1: 15, 2: 5, 4: 40}
+        sampler.sample()
+        assert sampler.size == 8
+        assert list(sampler.delta('tx_packets')) == [0, 5, 0, 0,
+                                                     0, 0, 0, 0]
+        nl.counters = {1: 15, 2: 8, 4: 42}
+        sampler.sample()
+        assert list(sampler.delta('tx_packets')) == [0, 0, 3, 0,
+                                                     2, 0, 0, 0]
+
+    def test_rate(self):
+        nl = self.stats()
+        sampler = StatsSampler(nl, fields=('tx_packets', ))
+        nl.counters = {1: 10}
+        sampler.sample()
+        sampler.timestamp -= 2
+        nl.counters = {1: 30}
+        sampler.sample()
+        assert 9 < sampler.rate('tx_packets')[1] <= 10
+
 
 def _callback(msg, obj):
     obj.cb_counter += 1
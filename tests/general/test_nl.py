@@ -1,6 +1,29 @@
+import errno
 import socket
+import struct
+import threading
 from utils import require_user
+from pyroute2 import IPRoute
+from pyroute2 import IPBatch
+from pyroute2.common import load_dump
+from pyroute2.common import DEFAULT_RCVBUF
+from pyroute2.netlink import NetlinkError
+from pyroute2.netlink import NLMSG_DONE
+from pyroute2.netlink import NLMSG_ERROR
+from pyroute2.netlink import NLM_F_MULTI
+from pyroute2.netlink import NLM_F_REQUEST
+from pyroute2.netlink import SOL_NETLINK
+from pyroute2.netlink import NETLINK_NO_ENOBUFS
+from pyroute2.netlink.nlsocket import BufferPool
+from pyroute2.netlink.nlsocket import NetlinkFuture
 from pyroute2.netlink.nlsocket import NetlinkSocket
+from pyroute2.netlink.nlsocket import ReceiveQueue
+from pyroute2.netlink.rtnl import RTM_NEWROUTE
+from pyroute2.netlink.rtnl import RTM_NEWLINK
+from pyroute2.netlink.rtnl import RTM_GETLINK
+from pyroute2.netlink.rtnl import RTM_SETLINK
+from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
+from pyroute2.netlink.rtnl.iprsocket import IPRSocket
 
 
 class _TestNL(object):
@@ -69,3 +92,395 @@ class _TestNL(object):
             fail.close()
         except AssertionError:
             pass
+
+
+class TestDispatch(object):
+
+    def setup(self):
+        # the dump contains 10 messages with seq 256 and
+        # 10 messages with seq 257, add NLMSG_DONE for 256
+        with open('data/rtmsg_dump', 'r') as f:
+            self.data = load_dump(f)
+        self.data += struct.pack('IHHIIi', 20, NLMSG_DONE, 0, 256, 0, 0)
+        self.decoded = 0
+        self.ip = IPRSocket()
+        self.ip._recv = lambda *argv, **kwarg: self.data
+        self.ip.backlog[256] = []
+        parse = self.ip.marshal.parse
+
+        def count(*argv, **kwarg):
+            ret = parse(*argv, **kwarg)
+            self.decoded += len(ret)
+            return ret
+
+        self.ip.marshal.parse = count
+
+    def teardown(self):
+        self.ip.close()
+
+    def get(self):
+        msgs = self.ip.get(msg_seq=256)
+        assert len(msgs) == 10
+        assert set([x['header']['sequence_number'] for x in msgs]) == \
+            set((256, ))
+
+    def test_default(self):
+        self.get()
+        assert len(self.ip.backlog[0]) == 10
+        assert self.decoded == 21
+
+    def test_drop(self):
+        self.ip.zero_queue = set()
+        self.get()
+        assert self.ip.backlog[0] == []
+        # messages with seq 257 are not decoded
+        assert self.decoded == 11
+
+    def test_zero_queue(self):
+        self.ip.zero_queue = set((RTM_NEWLINK, ))
+        self.get()
+        assert self.ip.backlog[0] == []
+        assert self.decoded == 11
+
+    def test_callback(self):
+        ret = []
+        self.ip.zero_queue = set()
+        self.ip.register_callback(lambda x: ret.append(x),
+                                  msg_types=set((RTM_NEWROUTE, )))
+        self.get()
+        assert len(ret) == 20
+        assert self.ip.backlog[0] == []
+        assert self.decoded == 21
+
+    def test_callback_types(self):
+        ret = []
+        self.ip.zero_queue = set()
+        self.ip.register_callback(lambda x: ret.append(x),
+                                  msg_types=set((RTM_NEWLINK, )))
+        self.get()
+        assert ret == []
+        assert self.decoded == 11
+
+
+class TestFuture(object):
+
+    def msg(self, msg_type=RTM_NEWLINK, flags=NLM_F_MULTI, error=None):
+        msg = ifinfmsg()
+        msg['header']['type'] = msg_type
+        msg['header']['flags'] = flags
+        msg['header']['error'] = error
+        return msg
+
+    def test_done(self):
+        future = NetlinkFuture()
+        assert future.feed(self.msg())
+        assert future.feed(self.msg())
+        assert not future.done()
+        assert future.feed(self.msg(NLMSG_DONE))
+        assert future.done()
+        # the future is complete, the message is not accepted
+        assert not future.feed(self.msg())
+        assert len(future.result()) == 2
+
+    def test_single(self):
+        future = NetlinkFuture()
+        future.feed(self.msg(flags=0))
+        assert len(future.result(0)) == 1
+
+    def test_error(self):
+        future = NetlinkFuture()
+        future.feed(self.msg())
+        future.feed(self.msg(NLMSG_ERROR, error=NetlinkError(19)))
+        try:
+            future.result(0)
+        except NetlinkError as e:
+            assert e.code == 19
+        else:
+            raise AssertionError('exception expected')
+
+    def test_terminate(self):
+        future = NetlinkFuture()
+        for index in range(4):
+            msg = self.msg()
+            msg['index'] = index
+            future.feed(msg)
+        assert future.result(0) is None
+        future.set_terminate(lambda x: x['index'] == 2)
+        assert [x['index'] for x in future.result(0)] == [0, 1]
+
+
+class TestDemux(object):
+
+    def setup(self):
+        self.ip = IPRoute()
+        self.ip.bind(groups=0, demux=True)
+
+    def teardown(self):
+        self.ip.close()
+
+    def test_request(self):
+        links = self.ip.get_links()
+        assert links[0].get_attr('IFLA_IFNAME') == 'lo'
+        assert self.ip.link_lookup(ifname='lo') == [1]
+        assert self.ip.futures == {}
+
+    def test_error(self):
+        try:
+            self.ip.get_links(0xffffff)
+        except NetlinkError as e:
+            assert e.code == 19
+        else:
+            raise AssertionError('exception expected')
+        assert self.ip.futures == {}
+
+    def test_threads(self):
+        ret = []
+
+        def run():
+            for _ in range(20):
+                ret.append(self.ip.get_links(1)[0]['index'])
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert ret == [1] * 160
+        assert self.ip.futures == {}
+
+
+class TestBatch(object):
+
+    def setup(self):
+        self.ip = IPRoute()
+
+    def teardown(self):
+        self.ip.close()
+
+    def requests(self):
+        return [({'index': 1}, RTM_GETLINK),
+                ({'index': 0xffffff}, RTM_GETLINK),
+                (ifinfmsg({'index': 1}), RTM_GETLINK, NLM_F_REQUEST)]
+
+    def check(self, ret):
+        assert len(ret) == 3
+        assert ret[0][0].get_attr('IFLA_IFNAME') == 'lo'
+        assert isinstance(ret[1], NetlinkError)
+        assert ret[1].code == 19
+        assert ret[2][0]['index'] == 1
+        assert self.ip.futures == {}
+        assert list(self.ip.backlog.keys()) == [0]
+
+    def test_batch(self):
+        self.check(self.ip.nlm_request_batch(self.requests()))
+
+    def test_window(self):
+        ret = self.ip.nlm_request_batch(self.requests() * 100, window=7)
+        assert len(ret) == 300
+        for i in range(0, 300, 3):
+            self.check(ret[i:i + 3])
+
+    def test_demux(self):
+        self.ip.bind(groups=0, demux=True)
+        self.check(self.ip.nlm_request_batch(self.requests()))
+
+    def test_ipbatch(self):
+        batch = IPBatch()
+        batch.link('set', index=1, state='up')
+        batch.get_links(1)
+        assert [x[1] for x in batch.requests] == [RTM_SETLINK, RTM_GETLINK]
+        ret = self.ip.nlm_request_batch(batch.requests[1:])
+        assert ret[0][0]['index'] == 1
+
+
+class TestArena(object):
+
+    def test_arena(self):
+        ip = IPRoute()
+        try:
+            ip.get_links()
+            arena = ip.arena
+            ip.get_links()
+            assert ip.arena is arena
+            assert len(arena) == DEFAULT_RCVBUF
+        finally:
+            ip.close()
+
+    def test_pool(self):
+        pool = BufferPool(16, size=2)
+        buf1 = pool.get()
+        buf2 = pool.get()
+        assert len(buf1) == len(buf2) == 16
+        assert pool.get() is None
+        pool.put(buf2)
+        assert pool.get() is buf2
+
+    def test_async(self):
+        ip = IPRoute()
+        try:
+            ip.bind(groups=0, async=True)
+            assert ip.get_links(1)[0]['index'] == 1
+            assert ip.buffer_pool.allocated > 0
+            assert len(ip.buffer_pool.buffers) == ip.buffer_pool.allocated
+        finally:
+            ip.close()
+
+
+class TestOverflow(object):
+
+    def setup(self):
+        self.ip = IPRoute()
+        self.sock = self.ip._sock
+
+        class FakeSocket(object):
+
+            def recv_into(self, *argv, **kwarg):
+                raise socket.error(errno.ENOBUFS, 'No buffer space')
+
+        self.ip._sock = FakeSocket()
+
+    def teardown(self):
+        self.ip._sock = self.sock
+        self.ip.close()
+
+    def test_counter(self):
+        for _ in range(3):
+            try:
+                self.ip.get()
+            except socket.error as e:
+                assert e.errno == errno.ENOBUFS
+            else:
+                raise AssertionError('exception expected')
+        assert self.ip.overflows == 3
+        # the read lock must be released
+        assert self.ip.read_lock.acquire(False)
+        self.ip.read_lock.release()
+
+    def test_callback(self):
+        ret = []
+        self.ip.overflow_callback = lambda sock, error: ret.append(sock)
+        try:
+            self.ip.get()
+        except socket.error:
+            pass
+        assert ret == [self.ip]
+
+    def test_callback_fail(self):
+        def cb(sock, error):
+            raise ValueError()
+        self.ip.overflow_callback = cb
+        try:
+            self.ip.get()
+        except socket.error as e:
+            assert e.errno == errno.ENOBUFS
+        assert self.ip.overflows == 1
+
+
+class TestRcvbuf(object):
+
+    def test_rcvbuf(self):
+        ip = IPRoute()
+        try:
+            ip.set_rcvbuf(65536)
+            assert ip.getsockopt(socket.SOL_SOCKET,
+                                 socket.SO_RCVBUF) == 65536 * 2
+        finally:
+            ip.close()
+
+    def test_rcvbuf_force(self):
+        require_user('root')
+        ip = IPRoute()
+        ip.rcvbuf = 8 * 1024 * 1024
+        ip.rcvbuf_force = True
+        try:
+            # the socket is recreated, but the size is kept
+            ip.post_init()
+            assert ip.getsockopt(socket.SOL_SOCKET,
+                                 socket.SO_RCVBUF) == 16 * 1024 * 1024
+        finally:
+            ip.close()
+
+    def test_no_enobufs(self):
+        ip = IPRoute()
+        try:
+            ip.set_no_enobufs()
+            assert ip.getsockopt(SOL_NETLINK, NETLINK_NO_ENOBUFS) == 1
+            ip.post_init()
+            assert ip.getsockopt(SOL_NETLINK, NETLINK_NO_ENOBUFS) == 1
+            ip.set_no_enobufs(False)
+            assert ip.getsockopt(SOL_NETLINK, NETLINK_NO_ENOBUFS) == 0
+        finally:
+            ip.close()
+
+
+class TestReceiveQueue(object):
+
+    def test_block(self):
+        queue = ReceiveQueue(maxsize=2)
+        queue.put(1)
+        queue.put(2)
+        t = threading.Thread(target=queue.put, args=(3, ))
+        t.start()
+        t.join(0.1)
+        assert t.is_alive()
+        assert queue.get() == 1
+        t.join()
+        assert [queue.get(), queue.get()] == [2, 3]
+        assert queue.overflows == 1
+        assert queue.dropped == 0
+        assert queue.high == 2
+
+    def test_close(self):
+        queue = ReceiveQueue(maxsize=1)
+        queue.put(1)
+        ret = []
+        t = threading.Thread(target=lambda: ret.extend(queue.put(2)))
+        t.start()
+        queue.close()
+        t.join()
+        assert ret == [2]
+
+    def test_drop(self):
+        queue = ReceiveQueue(maxsize=2, policy='drop')
+        assert queue.put(1) == []
+        queue.put(2)
+        assert queue.put(3) == [1]
+        assert [queue.get(), queue.get()] == [2, 3]
+        assert queue.dropped == 1
+
+    def test_signal(self):
+        queue = ReceiveQueue(maxsize=2, policy='signal')
+        for i in range(4):
+            queue.put(i)
+        error = queue.get()
+        assert error.errno == errno.ENOBUFS
+        assert [queue.get(), queue.get()] == [0, 1]
+        assert queue.dropped == 2
+        assert queue.overflows == 2
+
+    def test_policy(self):
+        try:
+            ReceiveQueue(policy='wait')
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('exception expected')
+
+    def test_async(self):
+        ip = IPRoute()
+        try:
+            ip.buffer_queue = ReceiveQueue(maxsize=1, policy='signal')
+            ip.bind(groups=0, async=True)
+            ip.buffer_queue.put(b'')
+            ip.buffer_queue.put(b'')
+            try:
+                ip.get()
+            except IOError as e:
+                assert e.errno == errno.ENOBUFS
+            else:
+                raise AssertionError('exception expected')
+            # queue overflows are not socket overflows
+            assert ip.buffer_queue.overflows == 1
+            assert ip.overflows == 0
+        finally:
+            ip.close()
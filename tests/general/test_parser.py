@@ -1,4 +1,12 @@
+import struct
 from pyroute2.common import load_dump
+from pyroute2.netlink import nla
+from pyroute2.netlink import nlmsg
+from pyroute2.netlink import nla_slot
+from pyroute2.netlink import NotInitialized
+from pyroute2.netlink import compile_match
+from pyroute2.netlink.rtnl.rtmsg import rtmsg
+from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
 from pyroute2.netlink.rtnl.iprsocket import MarshalRtnl
 from pyroute2.netlink.nl80211 import MarshalNl80211
 
@@ -39,6 +47,353 @@ class TestRtnl(TestNL):
     def test_gre(self):
         self.load_data(fname='data/gre_01', packets=2)
 
+    def test_rtmsg_dump(self):
+        pkts, code = self.parse('data/rtmsg_dump')
+        assert len(pkts) == 20
+        for msg in pkts:
+            assert msg['event'] == 'RTM_NEWROUTE'
+            assert msg.get_attr('RTA_TABLE') == msg['table'] or \
+                msg['table'] == 252
+
+    def test_ifinfmsg_dump(self):
+        pkts, code = self.parse('data/ifinfmsg_dump')
+        assert len(pkts) == 7
+        assert pkts[0].get_attr('IFLA_IFNAME') == 'lo'
+        for msg in pkts:
+            assert msg['event'] == 'RTM_NEWLINK'
+            assert msg.get_attr('IFLA_IFNAME') is not None
+
+    def test_undecoded(self):
+        # rta_mfc_stats uses 'uint64' as the struct format, so
+        # the NLA can not be decoded -- but the rest of the
+        # message must be
+        nla = struct.pack('HH', 28, 17) + struct.pack('QQQ', 1, 2, 3)
+        body = struct.pack('BBBBBBBBI', 2, 32, 0, 0, 254, 4, 0, 1, 0)
+        hdr = struct.pack('IHHII', 16 + len(body) + len(nla), 24, 2, 1, 0)
+        msg = self.marshal().parse(hdr + body + nla)[0]
+        assert msg['header'].get('error') is None
+        assert msg['event'] == 'RTM_NEWROUTE'
+        assert msg['table'] == 254
+        assert len(msg['attrs']) == 1
+        assert msg['attrs'][0][0] == 'UNDECODED'
+        assert msg['attrs'][0][1].startswith('1c:00:11:00:01:00')
+
+
+class TestLazy(TestNL):
+
+    def marshal(self):
+        marshal = MarshalRtnl()
+        marshal.lazy = True
+        return marshal
+
+    def eager(self, fname):
+        with open(fname, 'r') as f:
+            return MarshalRtnl().parse(load_dump(f))
+
+    def test_ifinfmsg_dump(self):
+        pkts, code = self.parse('data/ifinfmsg_dump')
+        for msg in pkts:
+            assert isinstance(msg['attrs'][0], nla_slot)
+            assert msg['attrs'][0].owner is not None
+        assert pkts == self.eager('data/ifinfmsg_dump')
+
+    def test_get_attr(self):
+        pkts, code = self.parse('data/ifinfmsg_dump')
+        msg = pkts[0]
+        assert msg.get_attr('IFLA_IFNAME') == 'lo'
+        # only the requested NLA should be decoded
+        slots = [x for x in msg['attrs'] if x[0] == 'IFLA_IFNAME']
+        assert slots[0].owner is None
+        stats = [x for x in list.__iter__(msg['attrs'])
+                 if list.__getitem__(x, 0) == 'IFLA_STATS64']
+        assert stats[0].owner is not None
+        assert msg.get_attr('IFLA_STATS64')['rx_packets'] >= 0
+        assert stats[0].owner is None
+
+    def test_nested(self):
+        pkts, code = self.parse('data/ifinfmsg_dump')
+        eager = self.eager('data/ifinfmsg_dump')
+        for (lazy, msg) in zip(pkts, eager):
+            li = lazy.get_attr('IFLA_LINKINFO')
+            if li is None:
+                continue
+            assert li.get_attr('IFLA_INFO_KIND') == \
+                msg.get_attr('IFLA_LINKINFO').get_attr('IFLA_INFO_KIND')
+            assert li == msg.get_attr('IFLA_LINKINFO')
+
+    def test_rtmsg_dump(self):
+        pkts, code = self.parse('data/rtmsg_dump')
+        assert pkts == self.eager('data/rtmsg_dump')
+        for msg in pkts:
+            for (name, value) in msg['attrs']:
+                assert value is not NotInitialized
+
+
+class TestBuffer(TestNL):
+
+    marshal = MarshalRtnl
+
+    def test_shared(self):
+        with open('data/rtmsg_dump', 'r') as f:
+            data = load_dump(f)
+        pkts = self.marshal().parse(data)
+        # one buffer for all the messages, no copies
+        assert len(set([id(x.buf) for x in pkts])) == 1
+        assert pkts[0].buf.data is data
+        # raw data is sliced on demand
+        offset = 0
+        for msg in pkts:
+            assert msg.raw == data[offset:offset + msg.length]
+            offset += msg.length
+        assert offset == len(data)
+
+    def test_copy(self):
+        pkts, code = self.parse('data/ifinfmsg_dump')
+        for msg in pkts:
+            copy = msg.copy()
+            assert copy['index'] == msg['index']
+            assert copy['attrs'] == msg['attrs']
+
+    def test_write(self):
+        pkts, code = self.parse('data/rtmsg_dump')
+        msg = pkts[0]
+        msg.buf.seek(0, 2)
+        msg.buf.write(b'\0' * 4)
+        # written buffer is not used for zero-copy decoding
+        assert msg.buf.data is None
+        r = type(msg)(msg.raw)
+        r.decode()
+        assert r['attrs'] == msg['attrs']
+
+    def test_bytearray(self):
+        with open('data/rtmsg_dump', 'r') as f:
+            data = load_dump(f)
+        pkts = self.marshal().parse(bytearray(data))
+        assert pkts == self.marshal().parse(data)
+
+
+class TestProjection(object):
+
+    def setup(self):
+        with open('data/rtmsg_dump', 'r') as f:
+            self.routes = load_dump(f)
+        with open('data/ifinfmsg_dump', 'r') as f:
+            self.links = load_dump(f)
+
+    def check(self, pkts, names):
+        eager = MarshalRtnl().parse(self.links)
+        assert len(pkts) == len(eager)
+        for (msg, full) in zip(pkts, eager):
+            assert msg['index'] == full['index']
+            assert msg['attrs'] == [x for x in full['attrs']
+                                    if x[0] in names]
+
+    def test_set(self):
+        names = set(('IFLA_IFNAME', 'IFLA_MTU'))
+        self.check(MarshalRtnl().parse(self.links, projection=names),
+                   names)
+
+    def test_list(self):
+        names = ['IFLA_IFNAME', 'IFLA_LINKINFO']
+        pkts = MarshalRtnl().parse(self.links, projection=names)
+        self.check(pkts, names)
+
+    def test_callable(self):
+        names = set(('IFLA_ADDRESS', ))
+
+        def projection(msg, name):
+            assert isinstance(msg, ifinfmsg)
+            return name in names
+
+        self.check(MarshalRtnl().parse(self.links, projection=projection),
+                   names)
+
+    def test_lazy(self):
+        names = set(('IFLA_IFNAME', ))
+        marshal = MarshalRtnl()
+        marshal.lazy = True
+        pkts = marshal.parse(self.links, projection=names)
+        for msg in pkts:
+            assert len(msg['attrs']) == 1
+            assert isinstance(msg['attrs'][0], nla_slot)
+        self.check(pkts, names)
+
+    def test_class(self):
+        projection = {rtmsg: set(('RTA_TABLE', ))}
+        pkts = MarshalRtnl().parse(self.routes, projection=projection)
+        for msg in pkts:
+            assert [x[0] for x in msg['attrs']] == ['RTA_TABLE']
+        # ifinfmsg is not listed, so it should be decoded completely
+        pkts = MarshalRtnl().parse(self.links, projection=projection)
+        assert pkts == MarshalRtnl().parse(self.links)
+
+    def test_seq(self):
+        names = set(('RTA_TABLE', ))
+        pkts = MarshalRtnl().parse(self.routes)
+        seq = pkts[0]['header']['sequence_number']
+        projected = MarshalRtnl().parse(self.routes, seq, names)
+        assert len(projected) == len(pkts)
+        for (msg, full) in zip(projected, pkts):
+            if msg['header']['sequence_number'] == seq:
+                assert msg['attrs'] == [x for x in full['attrs']
+                                        if x[0] in names]
+            else:
+                # other sequence numbers are not affected
+                assert msg == full
+
+    def test_select(self):
+        pkts = MarshalRtnl().parse(self.routes)
+        seq = pkts[0]['header']['sequence_number']
+        headers = []
+
+        def select(msg_type, msg_seq):
+            headers.append((msg_type, msg_seq))
+            return msg_seq == seq
+
+        selected = MarshalRtnl().parse(self.routes, select=select)
+        assert headers == [(x['header']['type'],
+                            x['header']['sequence_number']) for x in pkts]
+        assert selected == [x for x in pkts
+                            if x['header']['sequence_number'] == seq]
+
+
+class TestAttrs(object):
+
+    def setup(self):
+        self.msg = rtmsg()
+        self.msg['attrs'] = [['RTA_DST', '10.0.0.0'],
+                             ['RTA_OIF', 1],
+                             ['RTA_GATEWAY', '10.0.0.1']]
+
+    def test_lookup(self):
+        assert self.msg.get_attr('RTA_OIF') == 1
+        assert self.msg.get_attr('RTA_TABLE') is None
+        assert self.msg.get_attr('RTA_TABLE', 254) == 254
+        assert self.msg.get_attrs('RTA_DST') == ['10.0.0.0']
+        assert self.msg.get_attrs('RTA_TABLE') == []
+
+    def test_append(self):
+        assert self.msg.get_attrs('RTA_OIF') == [1]
+        self.msg['attrs'].append(['RTA_OIF', 2])
+        assert self.msg.get_attrs('RTA_OIF') == [1, 2]
+        self.msg['attrs'].append(['RTA_TABLE', 254])
+        assert self.msg.get_attr('RTA_TABLE') == 254
+
+    def test_strip(self):
+        assert self.msg.get_attr('RTA_DST') == '10.0.0.0'
+        self.msg.strip('RTA_DST')
+        self.msg['attrs'].append(['RTA_TABLE', 254])
+        assert self.msg.get_attr('RTA_DST') is None
+        assert self.msg.get_attr('RTA_OIF') == 1
+        assert self.msg.get_attr('RTA_TABLE') == 254
+
+    def test_replace(self):
+        assert self.msg.get_attr('RTA_OIF') == 1
+        self.msg['attrs'] = [['RTA_OIF', 2]]
+        assert self.msg.get_attr('RTA_OIF') == 2
+        del self.msg['attrs']
+        assert self.msg.get_attr('RTA_OIF') is None
+
+
+class TestMatch(object):
+
+    def setup(self):
+        self.msgs = []
+        for (table, oif) in ((254, 1), (255, 2), (252, None)):
+            msg = rtmsg()
+            msg['dst_len'] = 24
+            msg['table'] = table
+            msg['attrs'] = [['RTA_DST', '10.0.%i.0' % table],
+                            ['RTA_TABLE', table if table < 255 else 1000]]
+            if oif is not None:
+                msg['attrs'].append(['RTA_OIF', oif])
+            self.msgs.append(msg)
+
+    def match(self, spec):
+        match = compile_match(spec)
+        return [x['table'] for x in self.msgs if match(x)]
+
+    def test_field(self):
+        assert self.match({'dst_len': 24}) == [254, 255, 252]
+        assert self.match({'dst_len': 32}) == []
+        assert self.match({'dst_len': lambda x: x > 8}) == [254, 255, 252]
+
+    def test_nla(self):
+        assert self.match({'oif': 2}) == [255]
+        assert self.match({'oif': lambda x: x < 3}) == [254, 255]
+        assert self.match({'dst': '10.0.252.0', 'dst_len': 24}) == [252]
+        # `None` matches anything, as before
+        assert self.match({'gateway': None}) == [254, 255, 252]
+
+    def test_field_and_nla(self):
+        # `table` is both the field and the NLA
+        assert self.match({'table': 255}) == [255]
+        assert self.match({'table': 1000}) == [255]
+        assert self.match({'table': lambda x: x == 252}) == [252]
+
+    def test_other(self):
+        assert self.match(lambda x: x['table'] == 254) == [254]
+        assert self.match({}) == [254, 255, 252]
+        assert self.match(None) == []
+
+
+class TestSchema(object):
+
+    def test_shared(self):
+        m1 = rtmsg()
+        m2 = rtmsg()
+        assert m1.t_nla_map is m2.t_nla_map
+        assert 'RTA_DST' in rtmsg.r_nla_map
+        assert rtmsg.r_nla_map['RTA_DST'][1] == 1
+
+    def test_invalidate(self):
+
+        class msg(nla):
+            nla_map = (('A_UNSPEC', 'none'),
+                       ('A_ONE', 'uint32'))
+
+        m = msg()
+        assert set(m.r_nla_map) == set(('A_UNSPEC', 'A_ONE'))
+        msg.nla_map = (('A_UNSPEC', 'none'),
+                       ('A_ONE', 'uint32'),
+                       ('A_TWO', 'asciiz'))
+        m = msg()
+        assert set(m.r_nla_map) == set(('A_UNSPEC', 'A_ONE', 'A_TWO'))
+        m['attrs'] = [['A_TWO', 'test']]
+        m.encode()
+        r = msg(m.buf.getvalue())
+        r.decode()
+        assert r.get_attr('A_TWO') == 'test'
+
+    def test_fields_codec(self):
+
+        class msg(nlmsg):
+            fields = (('family', 'B'),
+                      ('__pad', '3x'),
+                      ('index', 'i'),
+                      ('id', 'L'),
+                      ('port', '>H'),
+                      ('addr', '4B'))
+
+        m = msg()
+        # 'L' is native-only, so it gets the separate codec
+        assert [x[0].size for x in m._fields_encoder] == [8, 8, 2, 4]
+        m['family'] = 2
+        m['index'] = -1
+        m['id'] = 42
+        m['port'] = 80
+        m['addr'] = (10, 0, 0, 1)
+        m.encode()
+        data = m.buf.getvalue()
+        assert len(data) == 16 + m.get_size() + 2
+        r = msg(data)
+        r.decode()
+        assert r['family'] == 2
+        assert r['index'] == -1
+        assert r['id'] == 42
+        assert r['port'] == 80
+        assert r['addr'] == (10, 0, 0, 1)
+
 
 class TestNl80211(TestNL):
 